@@ -1,53 +1,133 @@
-from flask import Flask, request, jsonify
-import pickle #Libreria para guardar/cargar el modelo
+from flask import Flask, request, jsonify, g, Response
 import pandas as pd
 import numpy as np
 import os
+import sys
 import html
 import random
+import time
+import shutil
+import threading
+import re
+import uuid
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from modelo import Modelo, MODOS_PUNTUACION
+from motor_recomendacion import construir_indice_vecinos, compactar_corr, FORMATOS_CORR, UMBRAL_DISPERSO
+from trabajos import GestorTrabajos, bloqueo_entre_procesos
+from cache_resultados import CacheResultados
+from metricas import RegistroMetricas, Cronometro, PerfiladorMuestreo, LIMITES_ENTRENAMIENTO
+from catalogo import MUESTRA_N
+from busqueda import BUSQUEDA_N
+from entrenamiento import entrenar_sparse, pico_rss_mb, PicoRSS, SIMILITUDES, CONTRACCION, MIN_RATINGS_ANIME, MIN_PERIODS
+from modelo_disco import guardar_modelo, cargar_modelo, cargar_vecinos, cargar_contenido, cargar_corr_compacta, existe_modelo, convertir_pkl, leer_meta
+from contenido import construir_indice_contenido, CONTENIDO_K, PESO_CONTENIDO
+from actualizacion_incremental import actualizar_con_ratings
+from perfiles_usuarios import PerfilesUsuarios
 
-# Ruta unica de busqueda del modelo_corrMatrix.pkl en la misma carpeta que este .py
-MODEL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modelo_corrMatrix.pkl")
+# Raiz del proyecto en el path para el paquete Comun (pool de conexiones y logins, compartido con FrontEnd)
+CARPETA_PROYECTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CARPETA_PROYECTO not in sys.path:
+    sys.path.append(CARPETA_PROYECTO)
+# Carpeta de datos: anime.csv, rating.csv, el modelo y las caches. Por defecto la misma carpeta que este .py;
+# con la variable API_DATOS se puede apuntar a otra (por ejemplo los benchmarks con datos sinteticos)
+CARPETA_DATOS = os.environ.get("API_DATOS", os.path.dirname(os.path.abspath(__file__)))
+# Carpeta del modelo (corr.npy con mmap + metadatos por columnas)
+MODEL_DIR = os.path.join(CARPETA_DATOS, "modelo_corrMatrix")
+# Modelo antiguo en pickle, si existe y no hay carpeta se convierte una sola vez
+MODEL_FILE = os.path.join(CARPETA_DATOS, "modelo_corrMatrix.pkl")
+# Cache de entrenamiento con los ratings limpios, solo se usa al reentrenar (no forma parte del modelo servido)
+RATINGS_CACHE = os.path.join(CARPETA_DATOS, "cache_ratings.npz")
+# Estadisticos suficientes por par de animes para actualizar el modelo con /ratings sin reentrenar
+ESTADISTICAS_DIR = os.path.join(CARPETA_DATOS, "estadisticas_incrementales")
+# Cerrojo entre procesos para escribir el modelo y estado de los entrenamientos visible desde todos los workers
+MODEL_LOCK = MODEL_DIR + ".lock"
+TRABAJOS_DIR = os.path.join(CARPETA_DATOS, "trabajos")
+# Modelos con nombre (otras similitudes o umbrales) que conviven con el principal: modelos/<nombre>
+MODELOS_DIR = os.path.join(CARPETA_DATOS, "modelos")
 
 app = Flask(__name__)
 
 vers = "0.0.5"
 
-corrMatrix = None
-anime = None
-ratings = None
+# Modos de entrenamiento: "sparse" (CSR por chunks, sin pivot denso) o "pivot" (el original con pivot_table + corr)
+MODOS_ENTRENAMIENTO = ("sparse", "pivot")
+MODO_ENTRENAMIENTO = "sparse"
+NOMBRE_PRINCIPAL = "principal" # Nombre del modelo de MODEL_DIR en /modelos y en ?modelo=
+NOMBRE_VALIDO = re.compile(r"^[A-Za-z0-9_-]{1,40}$")
 
-def entrenar_modelo(force=False):
-    # Si force=False, intenta cargar desde archivo. Si no existe, entrena y guarda.
-    global corrMatrix, anime, ratings
+# Indice de vecinos: K vecinos por anime y modo de puntuacion ("completo" con la matriz o "vecinos" solo con el indice)
+VECINOS_K = int(os.environ.get("VECINOS_K", 50))
+# Estadisticos por par para /ratings: cuatro matrices animes x animes mas (varias veces corrMatrix), asi que solo
+# se calculan si se piden con /entrenar?incremental=true o con ESTADISTICAS_INCREMENTALES=1
+ESTADISTICAS_INCREMENTALES = os.environ.get("ESTADISTICAS_INCREMENTALES", "0") == "1"
+MODO_PUNTUACION = os.environ.get("MODO_PUNTUACION", "completo")
+if MODO_PUNTUACION not in MODOS_PUNTUACION:
+    raise ValueError(f"MODO_PUNTUACION debe ser uno de: {', '.join(MODOS_PUNTUACION)}")
+# Animes fuera de corrMatrix (pocas calificaciones): se puntuan por contenido con sus K vecinos por genero y tipo,
+# y cada aporte pesa CONTENIDO_PESO frente a uno por correlacion (0 desactiva la mezcla)
+CONTENIDO_VECINOS_K = int(os.environ.get("CONTENIDO_K", CONTENIDO_K))
+CONTENIDO_PESO = float(os.environ.get("CONTENIDO_PESO", PESO_CONTENIDO))
 
-    # Archivos dentro de la carpeta "RecomendacionesAnime" relativa al notebook 
-    base_path = os.path.dirname(os.path.abspath(__file__))
-    anime_file = os.path.join(base_path, "anime.csv")
-    ratings_file = os.path.join(base_path, "rating.csv")
+LOTE_MAXIMO = 10000 # Perfiles como maximo en una llamada a /recomendar/batch
+MUESTRA_MAXIMA = 1000 # Animes como maximo por pagina de /animes
+BUSQUEDA_MAXIMA = 50 # Resultados como maximo de /animes/buscar
+CONSULTA_MAXIMA = 100 # Caracteres como maximo de la consulta de /animes/buscar
 
-    # Intentar cargar modelo existente
-    if not force and os.path.exists(MODEL_FILE): # Comprobacion de existencia del .pkl y no es forzado a volver a entrenar
-        print("\033[36m### Cargando modelo entrenado desde archivo...\033[0m")
-        # Carga del archivo/modelo
-        with open(MODEL_FILE, "rb") as f:
-            data = pickle.load(f) # Lectura y deserializacion los datos guardados
-            corrMatrix = data["corrMatrix"] # Recupera si existe corrMatrix
-            anime = data["anime"] # Recupera si existe anime
-            ratings = data["ratings"] # Recupera si existe ratings
-        print("\033[32m### Modelo cargado correctamente.\033[0m")
-        return
-    
-    # Si no existe el modelo entrenar desde cero
-    print("\033[33m### Entrenando modelo desde cero...\033[0m")
+# Cache de respuestas de /recomendar: entradas como maximo (0 la desactiva) y segundos que vale cada una
+CACHE_TAM = int(os.environ.get("CACHE_TAM", 1024))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 300))
+
+# Perfiles de usuario guardados en MySQL (tabla calificaciones_usuarios) para /perfiles y /recomendar/<usuario>
+# Sin DB_USUARIO o sin API_SECRETO esos endpoints responden 503 y el resto de la API funciona igual (no hace falta MySQL)
+DB_HOST = os.environ.get("DB_HOST", "localhost")
+DB_USUARIO = os.environ.get("DB_USUARIO")
+DB_CONTRASENYA = os.environ.get("DB_CONTRASENYA", "")
+DB_NOMBRE = os.environ.get("DB_NOMBRE", "logins_api_anime")
+# Cache de perfiles en memoria: usuarios como maximo y segundos que vale cada perfil
+# (con varios workers es lo que puede tardar otro proceso en ver una calificacion nueva)
+PERFILES_CACHE_TAM = int(os.environ.get("PERFILES_CACHE_TAM", 10000))
+PERFILES_CACHE_TTL = float(os.environ.get("PERFILES_CACHE_TTL", 60))
+PERFIL_MAXIMO = 5000 # Calificaciones como maximo en una llamada a POST /perfiles/<usuario>
+USUARIO_VALIDO = re.compile(r"^\S{1,45}$") # Como la columna usuario (varchar(45))
+USUARIOS_RESERVADOS = {"batch"} # Chocarian con /recomendar/batch
+# Sesiones de los perfiles: POST /sesiones con el usuario y la contraseña de main.py (tabla usuario_contrasenyas)
+# devuelve un token firmado con API_SECRETO que caduca a los SESION_TTL segundos; /perfiles/<usuario> y
+# /recomendar/<usuario> solo atienden al dueño del token. El secreto tiene que ser el mismo en todos los workers
+API_SECRETO = os.environ.get("API_SECRETO")
+SESION_TTL = int(os.environ.get("SESION_TTL", 3600))
+SIN_PERFILES = "Los perfiles de usuario no estan configurados (faltan DB_USUARIO o API_SECRETO)"
+
+# Instrumentacion: SERVER_TIMING=1 añade la cabecera Server-Timing con los tiempos por etapa a cada respuesta
+# y PERFILADOR=<carpeta> permite perfilar una peticion con ?perfilar=1 (deja ahi su flamegraph en formato folded)
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+PERFILADOR_DIR = os.environ.get("PERFILADOR")
+
+# Modelo publicado (corrMatrix + anime + motor). Es inmutable: entrenar o actualizar construye otro
+# y lo publica cambiando esta unica referencia, asi las peticiones nunca ven un modelo a medias
+modelo = None
+modelos_nombrados = {} # nombre -> Modelo de los modelos con nombre ya cargados en este proceso (se cargan al pedirlos)
+lock_escritura = threading.Lock() # Solo un entrenamiento o actualizacion a la vez (ademas de MODEL_LOCK entre procesos)
+trabajos = GestorTrabajos(carpeta=TRABAJOS_DIR) # Entrenamientos en segundo plano lanzados desde /entrenar
+cache = CacheResultados(CACHE_TAM, CACHE_TTL) # Top de /recomendar por perfil y version del modelo
+perfiles = None # PerfilesUsuarios, se crea al primer uso (ver obtener_perfiles)
+autenticacion = None # ServicioAutenticacion de POST /sesiones, tambien al primer uso (ver obtener_autenticacion)
+lock_perfiles = threading.Lock()
+firmas_sesion = URLSafeTimedSerializer(API_SECRETO, salt="sesion-perfiles") if API_SECRETO else None
 
+# Histogramas de /metrics (de este proceso)
+metricas = RegistroMetricas()
+metrica_peticion = metricas.histograma("api_peticion_segundos", "Duracion de las peticiones por endpoint y codigo", ("endpoint", "codigo"))
+metrica_etapa = metricas.histograma("api_etapa_segundos", "Duracion de cada etapa de las peticiones", ("endpoint", "etapa"))
+metrica_entrenamiento = metricas.histograma(
+    "api_entrenamiento_etapa_segundos", "Duracion de cada fase de entrenar_modelo", ("modo", "etapa"), LIMITES_ENTRENAMIENTO
+)
+
+def cargar_anime(anime_file):
     anime_cols = ['anime_id', 'name', 'genre', 'type', 'episodes', 'rating', 'members']
-    ratings_cols = ['user_id', 'anime_id', 'rating']
 
-    # Cargar los CSVs
+    # Cargar el CSV
     # El encoding="utf-8" lo que hace es controlar los caracteres raros estilo ñ
     anime = pd.read_csv(anime_file, names=anime_cols, header=0, encoding="utf-8")
-    ratings = pd.read_csv(ratings_file, names=ratings_cols, header=0, encoding="utf-8")
 
     # El html lo que hace es por si haya algun caracter raro pues lo ponga de forma normal
     anime['name'] = anime['name'].apply(html.unescape)
@@ -60,12 +140,30 @@ def entrenar_modelo(force=False):
 
     # Eliminamos y/o tratamos los que tengan alguna columna vacia o en otras diferente (ejemplo un caso de un anime que parte de sus datos estaba en la B del csv)
     anime = anime.dropna(subset=['episodes', 'rating', 'type', 'genre'])
+
+    # Cambio de nombre para tenerlo mas claro
+    return anime.rename(columns={"rating": "anime_rating"})
+
+
+def entrenar_pivot(ratings_file, anime, min_ratings=MIN_RATINGS_ANIME, min_periods=MIN_PERIODS):
+    # Entrenamiento original: pivot denso usuarios x animes + DataFrame.corr
+    # pico_rss_mb es el de este entrenamiento (la API es un proceso de larga vida)
+    with PicoRSS() as pico:
+        return _entrenar_pivot(ratings_file, anime, min_ratings, min_periods, pico)
+
+
+def _entrenar_pivot(ratings_file, anime, min_ratings, min_periods, pico):
+    inicio = time.perf_counter()
+    etapas = {} # Segundos de cada fase, para el informe y /metrics
+    ratings_cols = ['user_id', 'anime_id', 'rating']
+    ratings = pd.read_csv(ratings_file, names=ratings_cols, header=0, encoding="utf-8")
+    etapas["lectura"], marca = round(time.perf_counter() - inicio, 3), time.perf_counter()
+
     ratings = ratings[ratings['rating'] != -1]
     ratings = ratings.dropna(subset=['user_id', 'anime_id', 'rating'])
 
     # Cambio de nombres para tenerlos mas claros
     ratings = ratings.rename(columns={"rating": "user_rating"})
-    anime = anime.rename(columns={"rating": "anime_rating"})
 
     # Estas lineas cambian el tipo de datos de las columnas introducidas a category
     # Los category ocupan menos espacio que object o int
@@ -75,8 +173,9 @@ def entrenar_modelo(force=False):
 
     # Filtrar por los animes más puntuados
     anime_counts = ratings_with_id['anime_id'].value_counts()
-    popular_animes = anime_counts[anime_counts > 300].index
+    popular_animes = anime_counts[anime_counts > min_ratings].index
     filtered = ratings_with_id[ratings_with_id['anime_id'].isin(popular_animes)]
+    etapas["limpieza"], marca = round(time.perf_counter() - marca, 3), time.perf_counter()
 
     # Creacion de tabla en donde cada fila es un usuario y cada columna es un anume, y las celdas los rating
     ratings_pivot = filtered.pivot_table(
@@ -86,100 +185,830 @@ def entrenar_modelo(force=False):
         aggfunc='mean', # Sacar promedio si hay repetidos
         observed=True # Optimizacion si hay categorias
     ).astype('float32')
+    etapas["pivot"], marca = round(time.perf_counter() - marca, 3), time.perf_counter()
+
+    corrMatrix = ratings_pivot.corr(method='pearson', min_periods=min_periods) # Minimo de usuarios que evaluaron los dos animes (250)
+    etapas["corr"] = round(time.perf_counter() - marca, 3)
+
+    informe = {
+        "modo": "pivot",
+        "similitud": "pearson",
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "pico_rss_mb": pico.valor(),
+        "pico_rss_mb_proceso": pico_rss_mb(),
+        "usuarios": ratings_pivot.shape[0],
+        "animes": ratings_pivot.shape[1],
+        "etapas": etapas,
+    }
+    return corrMatrix, informe
+
+
+def entrenar_modelo(force=False, modo=MODO_ENTRENAMIENTO, workers=None, k=None, similitud="pearson",
+                    min_ratings=MIN_RATINGS_ANIME, min_periods=MIN_PERIODS, contraccion=CONTRACCION, nombre=None,
+                    formato_corr="float32", umbral_disperso=UMBRAL_DISPERSO, incremental=None):
+    # Si force=False, intenta cargar desde archivo. Si no existe, entrena y guarda.
+    # Devuelve el informe de tiempo/memoria si entrena, o None si solo carga el modelo
+    # workers: procesos para calcular la correlacion en modo sparse (None = variable ENTRENAMIENTO_WORKERS o todos los nucleos)
+    # k: vecinos por anime del indice de vecinos (None = VECINOS_K)
+    # similitud, min_ratings, min_periods y contraccion: medida de similitud y umbrales de este entrenamiento
+    # nombre: None (o "principal") para el modelo principal, o el nombre de un modelo que convive con el en MODELOS_DIR
+    # formato_corr: como se guarda y se sirve corrMatrix (FORMATOS_CORR); umbral_disperso: |r| minimo del formato disperso
+    # incremental: guardar los estadisticos para /ratings (solo modelo principal y modo sparse; None = ESTADISTICAS_INCREMENTALES)
+    if modo not in MODOS_ENTRENAMIENTO:
+        raise ValueError(f"Modo de entrenamiento desconocido: {modo}")
+    if similitud not in SIMILITUDES:
+        raise ValueError(f"Similitud desconocida: {similitud}")
+    if modo == "pivot" and similitud != "pearson":
+        raise ValueError("El modo pivot solo calcula pearson, usa el modo sparse para otras similitudes")
+    if nombre == NOMBRE_PRINCIPAL:
+        nombre = None
+    if nombre is not None and not NOMBRE_VALIDO.match(nombre):
+        raise ValueError("El nombre del modelo solo puede tener letras, numeros, - y _ (maximo 40)")
+    if formato_corr not in FORMATOS_CORR:
+        raise ValueError(f"Formato de corrMatrix desconocido: {formato_corr}")
+
+    opciones = {"similitud": similitud, "min_ratings": min_ratings, "min_periods": min_periods, "contraccion": contraccion}
+    almacenamiento = {"formato_corr": formato_corr}
+    if formato_corr == "disperso":
+        almacenamiento["umbral_disperso"] = umbral_disperso
+    with lock_escritura, bloqueo_entre_procesos(MODEL_LOCK):
+        return _entrenar_modelo(
+            force, modo, workers, VECINOS_K if k is None else k, opciones, nombre, almacenamiento,
+            ESTADISTICAS_INCREMENTALES if incremental is None else incremental
+        )
+
+
+def publicar_modelo(nuevo, nombre=None):
+    # Cambio atomico de referencia: las peticiones en curso siguen con el modelo que ya tenian
+    global modelo
+    if nombre is not None:
+        modelos_nombrados[nombre] = nuevo # Su version es distinta, las entradas de la cache del anterior ya no coinciden
+        print(f"\033[32m### Publicado '{nombre}': {nuevo}\033[0m")
+        return
+    modelo = nuevo
+    cache.vaciar() # La version entra en la clave, pero asi no se quedan ocupando sitio las del modelo anterior
+    print(f"\033[32m### Publicado {nuevo}\033[0m")
+
+
+def carpeta_modelo(nombre=None):
+    return MODEL_DIR if nombre is None else os.path.join(MODELOS_DIR, nombre)
+
+
+def _cargar_modelo(carpeta, k):
+    # Modelo guardado en disco (corrMatrix se abre con mmap, no se lee entera a memoria)
+    # Con formato_corr compacto se puntua con los corr_*.npy y las paginas de corr.npy no se llegan a leer
+    corrMatrix, anime, meta = cargar_modelo(carpeta)
+    vecinos = cargar_vecinos(carpeta)
+    if vecinos is None: # Modelos guardados antes de existir el indice de vecinos
+        vecinos = construir_indice_vecinos(corrMatrix.to_numpy(), k)
+    contenido = cargar_contenido(carpeta)
+    if contenido is None: # Modelos guardados antes de existir el indice por contenido
+        contenido = construir_indice_contenido(anime, corrMatrix.columns, CONTENIDO_VECINOS_K)
+    return Modelo(corrMatrix, anime, meta, vecinos, MODO_PUNTUACION, cargar_corr_compacta(carpeta, meta), contenido)
+
+
+def _entrenar_modelo(force, modo, workers, k, opciones=None, nombre=None, almacenamiento=None, incremental=False):
+    opciones = opciones or {}
+    almacenamiento = almacenamiento or {"formato_corr": "float32"}
+    carpeta = carpeta_modelo(nombre)
+
+    # Archivos dentro de la carpeta de datos (por defecto la del .py)
+    base_path = CARPETA_DATOS
+    anime_file = os.path.join(base_path, "anime.csv")
+    ratings_file = os.path.join(base_path, "rating.csv")
+
+    # Si solo hay un .pkl del formato antiguo se convierte a la carpeta nueva
+    if nombre is None and not force and not existe_modelo(MODEL_DIR) and os.path.exists(MODEL_FILE):
+        print("\033[36m### Convirtiendo modelo_corrMatrix.pkl al formato de carpeta...\033[0m")
+        convertir_pkl(MODEL_FILE, MODEL_DIR, RATINGS_CACHE)
+
+    # Intentar cargar modelo existente
+    if not force and existe_modelo(carpeta): # Comprobacion de existencia del modelo y no es forzado a volver a entrenar
+        print("\033[36m### Cargando modelo entrenado desde archivo...\033[0m")
+        inicio = time.perf_counter()
+        nuevo = _cargar_modelo(carpeta, k)
+        publicar_modelo(nuevo, nombre)
+        metrica_entrenamiento.observar(time.perf_counter() - inicio, nuevo.meta.get("modo", "desconocido"), "carga")
+        print("\033[32m### Modelo cargado correctamente.\033[0m")
+        return None
+    
+    # Si no existe el modelo entrenar desde cero
+    print(f"\033[33m### Entrenando modelo {nombre or NOMBRE_PRINCIPAL} desde cero (modo {modo}, {opciones.get('similitud', 'pearson')})...\033[0m")
+
+    inicio = time.perf_counter()
+    anime = cargar_anime(anime_file)
+    segundos_anime = round(time.perf_counter() - inicio, 3)
+
+    # Solo el modelo principal guarda estadisticos para /ratings, y solo si se piden; los demas reutilizan la cache
+    # de ratings sin tocarla
+    estadisticas = ESTADISTICAS_DIR if nombre is None and incremental and modo == "sparse" else None
+    if modo == "sparse":
+        corrMatrix, informe = entrenar_sparse(
+            ratings_file, anime['anime_id'].to_numpy(), workers=workers,
+            ruta_cache=RATINGS_CACHE, carpeta_estadisticas=estadisticas, **opciones
+        )
+    else:
+        corrMatrix, informe = entrenar_pivot(
+            ratings_file, anime, opciones.get("min_ratings", MIN_RATINGS_ANIME), opciones.get("min_periods", MIN_PERIODS)
+        )
+    if nombre is None and estadisticas is None:
+        shutil.rmtree(ESTADISTICAS_DIR, ignore_errors=True) # Los estadisticos anteriores ya no corresponden a este modelo
+
+    print(f"\033[36m### Entrenamiento ({informe['modo']}): {informe['segundos']} s, pico RSS {informe['pico_rss_mb']} MB\033[0m")
+    if informe["animes"] == 0: # Con umbrales muy altos; no se guarda un modelo vacio encima del que habia
+        raise ValueError(f"Ningun anime tiene mas de {opciones.get('min_ratings', MIN_RATINGS_ANIME)} calificaciones, baja min_ratings")
 
-    corrMatrix = ratings_pivot.corr(method='pearson', min_periods=250) # Minimo 250 que evaluaron los animes
+    # Indice de los K vecinos mas correlacionados de cada anime
+    marca = time.perf_counter()
+    vecinos = construir_indice_vecinos(corrMatrix.to_numpy(), k)
+    segundos_vecinos, marca = round(time.perf_counter() - marca, 3), time.perf_counter()
+    compacta = compactar_corr(corrMatrix.to_numpy(), almacenamiento["formato_corr"], almacenamiento.get("umbral_disperso", UMBRAL_DISPERSO))
+    segundos_compactar, marca = round(time.perf_counter() - marca, 3), time.perf_counter()
+    # Vecinos por contenido (generos y tipo) de todos los animes de anime.csv, para los que no entran en corrMatrix
+    contenido = construir_indice_contenido(anime, corrMatrix.columns, CONTENIDO_VECINOS_K)
+    segundos_contenido, marca = round(time.perf_counter() - marca, 3), time.perf_counter()
 
-    # Guardar modelo
+    # Guardar modelo (con un id nuevo: los demas procesos del servidor lo ven cambiar y lo recargan)
+    # Con la similitud, los umbrales y el coste del entrenamiento, para poder comparar modelos en /modelos
     print("\033[33m###Guardando modelo entrenado en archivo...\033[0m")
-    with open(MODEL_FILE, "wb") as f: # Abre el archivo en modo escritura binaria (wb = write binary)
-        pickle.dump({ # Guardado de datos
-            "corrMatrix": corrMatrix,
-            "anime": anime,
-            "ratings": ratings
-        }, f)
-    print(f"\033[32m### Modelo guardado en {MODEL_FILE}\033[0m")
+    meta = {
+        "vers": vers, "modo": informe["modo"], "id_modelo": uuid.uuid4().hex[:12], **opciones, **almacenamiento,
+        "entrenamiento": {"segundos": informe["segundos"], "pico_rss_mb": informe["pico_rss_mb"], "animes": informe["animes"]},
+    }
+    guardar_modelo(carpeta, corrMatrix, anime, meta, vecinos, compacta, contenido)
+    print(f"\033[32m### Modelo guardado en {carpeta}\033[0m")
+
+    # Fases del entrenamiento al informe y a los histogramas de /metrics
+    informe["etapas"] = {
+        "anime": segundos_anime, **informe["etapas"], "vecinos": segundos_vecinos, "compactar": segundos_compactar,
+        "contenido": segundos_contenido,
+        "guardar": round(time.perf_counter() - marca, 3),
+    }
+    for etapa, segundos in informe["etapas"].items():
+        metrica_entrenamiento.observar(segundos, informe["modo"], etapa)
+    metrica_entrenamiento.observar(time.perf_counter() - inicio, informe["modo"], "total")
+
+    if compacta:
+        # Se sirve lo recien guardado (mmap de los corr_*.npy): asi este proceso no se queda con la corrMatrix float32
+        del corrMatrix, vecinos, compacta, contenido
+        publicar_modelo(_cargar_modelo(carpeta, k), nombre)
+    else:
+        publicar_modelo(Modelo(corrMatrix, anime, meta, vecinos, MODO_PUNTUACION, contenido=contenido), nombre)
+    return informe
+
+
+def obtener_modelo(nombre=None):
+    # Modelo para servir una peticion: el principal, o uno con nombre (si este proceso aun no lo tiene se carga
+    # de disco, lo pudo entrenar otro worker). None si no existe
+    if nombre is None or nombre == NOMBRE_PRINCIPAL:
+        return modelo
+    actual = modelos_nombrados.get(nombre)
+    if actual is None and NOMBRE_VALIDO.match(nombre) and existe_modelo(carpeta_modelo(nombre)):
+        actual = _cargar_modelo(carpeta_modelo(nombre), VECINOS_K)
+        publicar_modelo(actual, nombre)
+    return actual
+
+
+def listar_modelos():
+    # {nombre: meta} de todos los modelos guardados en disco (el principal y los que tienen nombre)
+    carpetas = {NOMBRE_PRINCIPAL: MODEL_DIR}
+    if os.path.isdir(MODELOS_DIR):
+        for nombre in sorted(os.listdir(MODELOS_DIR)):
+            if NOMBRE_VALIDO.match(nombre):
+                carpetas[nombre] = carpeta_modelo(nombre)
+    modelos = {}
+    for nombre, carpeta in carpetas.items():
+        if not existe_modelo(carpeta):
+            continue
+        try:
+            meta = leer_meta(carpeta)
+        except (OSError, ValueError): # Justo en medio de un cambio de carpeta
+            continue
+        cargado = obtener_modelo(nombre) if nombre == NOMBRE_PRINCIPAL else modelos_nombrados.get(nombre)
+        modelos[nombre] = {**meta, "cargado": cargado is not None and cargado.version == meta.get("id_modelo")}
+    return modelos
+
+
+def actualizar_modelo(usuarios, animes, valores):
+    # Incorpora ratings nuevos al modelo cargado recalculando solo las filas/columnas afectadas de corrMatrix
+    # Si hay un entrenamiento en marcha no espera (podrian ser minutos): avisa con un ValueError
+    ratings_file = os.path.join(CARPETA_DATOS, "rating.csv")
+
+    if not lock_escritura.acquire(blocking=False):
+        raise ValueError("Hay un entrenamiento en curso, vuelve a intentarlo cuando termine")
+
+    try:
+        with bloqueo_entre_procesos(MODEL_LOCK, bloqueante=False) as libre:
+            if not libre:
+                raise ValueError("Hay un entrenamiento en curso, vuelve a intentarlo cuando termine")
+            informe = _actualizar_modelo(ratings_file, usuarios, animes, valores)
+    finally:
+        lock_escritura.release()
+
+    print(f"\033[36m### Actualizacion incremental: {informe['ratings_nuevos']} ratings, {informe['animes_recalculados']} animes recalculados en {informe['segundos']} s\033[0m")
+    return informe
+
+
+def _actualizar_modelo(ratings_file, usuarios, animes, valores):
+    if not existe_modelo(ESTADISTICAS_DIR):
+        raise ValueError("No hay estadisticos incrementales, entrena primero en modo sparse con /entrenar?force=true&incremental=true")
+
+    # Si otro proceso del servidor cambio el modelo en disco y este aun no lo ha recargado, se recarga antes
+    if modelo is None or leer_meta(MODEL_DIR).get("id_modelo") != modelo.meta.get("id_modelo"):
+        _entrenar_modelo(False, MODO_ENTRENAMIENTO, None, VECINOS_K)
+
+    actual = modelo
+    corrMatrix, informe = actualizar_con_ratings(
+        ESTADISTICAS_DIR, actual.corrMatrix, RATINGS_CACHE, ratings_file,
+        actual.anime['anime_id'].to_numpy(), usuarios, animes, valores
+    )
+    # Las columnas recalculadas pueden cambiar los vecinos de cualquier anime, el indice se rehace entero
+    k = actual.vecinos[0].shape[1] if actual.vecinos is not None else VECINOS_K
+    vecinos = construir_indice_vecinos(corrMatrix.to_numpy(), k)
+    # Se mantiene la similitud y los umbrales con los que se entreno (los estadisticos se calcularon con ellos)
+    meta = {**actual.meta, "vers": vers, "modo": informe["modo"], "id_modelo": uuid.uuid4().hex[:12]}
+    # Y el mismo formato de corrMatrix, compactado de nuevo desde la corrMatrix float32 actualizada
+    formato_corr = meta.get("formato_corr", "float32")
+    compacta = compactar_corr(corrMatrix.to_numpy(), formato_corr, meta.get("umbral_disperso", UMBRAL_DISPERSO))
+    # El contenido no depende de los ratings: se reutiliza el indice si las columnas del modelo son las mismas
+    if actual.contenido is not None and actual.corrMatrix.columns.equals(corrMatrix.columns):
+        contenido = (actual.contenido.ids, actual.contenido.vecinos, actual.contenido.pesos)
+    else:
+        contenido = construir_indice_contenido(actual.anime, corrMatrix.columns, CONTENIDO_VECINOS_K)
+    guardar_modelo(MODEL_DIR, corrMatrix, actual.anime, meta, vecinos, compacta, contenido)
+    if compacta:
+        del corrMatrix, vecinos, compacta, contenido
+        publicar_modelo(_cargar_modelo(MODEL_DIR, k))
+    else:
+        publicar_modelo(Modelo(corrMatrix, actual.anime, meta, vecinos, MODO_PUNTUACION, contenido=contenido))
+    return informe
+
+
+def recargar_si_cambio():
+    # Con varios procesos (servidor.py) cada uno tiene su propio modelo publicado: si otro proceso entreno
+    # o actualizo el modelo en disco (id_modelo distinto) este lo recarga. Devuelve True si recargo
+    _recargar_nombrados()
+    if not existe_modelo(MODEL_DIR):
+        return False
+    try:
+        id_disco = leer_meta(MODEL_DIR).get("id_modelo")
+    except (OSError, ValueError): # Justo en medio de un cambio de carpeta, se mira en la siguiente vuelta
+        return False
+    if modelo is not None and id_disco == modelo.meta.get("id_modelo"):
+        return False
+
+    # Si aqui mismo hay un entrenamiento en marcha no se espera: al terminar ya publica el modelo nuevo
+    if not lock_escritura.acquire(blocking=False):
+        return False
+    try:
+        with bloqueo_entre_procesos(MODEL_LOCK, bloqueante=False) as libre:
+            if not libre:
+                return False
+            _entrenar_modelo(False, MODO_ENTRENAMIENTO, None, VECINOS_K)
+            return True
+    finally:
+        lock_escritura.release()
+
+
+def _recargar_nombrados():
+    # Lo mismo para los modelos con nombre que ya tiene cargados este proceso (los demas se cargan al pedirlos)
+    # Estos se leen sin cerrojo: guardar_modelo cambia la carpeta entera de una vez y si se pilla en medio
+    # falla la lectura y se vuelve a mirar en la siguiente vuelta
+    for nombre, actual in list(modelos_nombrados.items()):
+        carpeta = carpeta_modelo(nombre)
+        try:
+            if not existe_modelo(carpeta):
+                modelos_nombrados.pop(nombre, None)
+            elif leer_meta(carpeta).get("id_modelo") != actual.version:
+                publicar_modelo(_cargar_modelo(carpeta, VECINOS_K), nombre)
+        except (OSError, ValueError):
+            pass
+
+
+def vigilar_modelo(intervalo=5):
+    # Hilo que cada `intervalo` segundos comprueba si el modelo en disco cambio (ver recargar_si_cambio)
+    def bucle():
+        while True:
+            time.sleep(intervalo)
+            try:
+                recargar_si_cambio()
+            except Exception:
+                import traceback
+                traceback.print_exc()
+
+    hilo = threading.Thread(target=bucle, name="vigilar_modelo", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def obtener_perfiles():
+    # PerfilesUsuarios de este proceso (el pool de conexiones se abre al primer uso, no al importar la API)
+    # None si no estan configurados la base de datos y el secreto de las sesiones
+    global perfiles
+    if perfiles is None and DB_USUARIO and firmas_sesion:
+        with lock_perfiles:
+            if perfiles is None:
+                from DAO_Calificaciones import DAO_Calificaciones # mysql.connector solo hace falta si se usan perfiles
+                dao = DAO_Calificaciones(DB_USUARIO, DB_CONTRASENYA, DB_HOST, DB_NOMBRE)
+                perfiles = PerfilesUsuarios(dao, CacheResultados(PERFILES_CACHE_TAM, PERFILES_CACHE_TTL))
+    return perfiles
+
+
+def obtener_autenticacion():
+    # ServicioAutenticacion de este proceso sobre la tabla de logins (la misma base de datos que los perfiles)
+    # None si los perfiles no estan configurados; si no se puede conectar lanza el error y se reintenta en la siguiente
+    global autenticacion
+    if autenticacion is None and DB_USUARIO and firmas_sesion:
+        with lock_perfiles:
+            if autenticacion is None:
+                from Comun.DAO_Logins import DAO_Logins
+                from Comun.servicio_autenticacion import ServicioAutenticacion
+                dao = DAO_Logins(DB_USUARIO, DB_CONTRASENYA, DB_HOST, DB_NOMBRE)
+                dao.conectar()
+                if not dao.get_conexion():
+                    raise dao.last_error
+                autenticacion = ServicioAutenticacion(dao)
+    return autenticacion
+
+
+def validar_usuario(usuario):
+    # Mensaje de error si el nombre no vale para /perfiles/<usuario> y /recomendar/<usuario>, o None
+    if not USUARIO_VALIDO.match(usuario):
+        return "Nombre de usuario no valido"
+    if usuario in USUARIOS_RESERVADOS:
+        return "Nombre de usuario reservado"
+    return None
+
+
+def crear_token(usuario):
+    return firmas_sesion.dumps({"usuario": usuario})
+
+
+def autorizar(usuario):
+    # None si la peticion trae (Authorization: Bearer <token>) un token de sesion valido de `usuario`
+    # Si no, la respuesta de error: 401 sin token, con uno falso o caducado y 403 si el token es de otro usuario
+    cabecera = request.headers.get("Authorization", "")
+    if not cabecera.startswith("Bearer "):
+        return jsonify({"error": "Falta el token de sesion (POST /sesiones)"}), 401, {"WWW-Authenticate": "Bearer"}
+    try:
+        sesion = firmas_sesion.loads(cabecera[len("Bearer "):].strip(), max_age=SESION_TTL)
+    except SignatureExpired:
+        return jsonify({"error": "La sesion ha caducado, inicia sesion otra vez"}), 401, {"WWW-Authenticate": "Bearer"}
+    except BadSignature:
+        return jsonify({"error": "Token de sesion no valido"}), 401, {"WWW-Authenticate": "Bearer"}
+    if sesion.get("usuario") != usuario:
+        return jsonify({"error": "El token de sesion es de otro usuario"}), 403
+    return None
+
+
+def validar_calificaciones(calificaciones):
+    # {anime_id: calificacion} de POST /perfiles/<usuario> (y de /recomendar) con enteros del 1 al 10, o (None, mensaje de error)
+    if not calificaciones or not isinstance(calificaciones, dict):
+        return None, "Debes enviar un JSON con las calificaciones del usuario (anime_id: rating)"
+    if len(calificaciones) > PERFIL_MAXIMO:
+        return None, f"Como maximo {PERFIL_MAXIMO} calificaciones por llamada"
+    validas = {}
+    for aid, valor in calificaciones.items():
+        try:
+            anime_id, nota = int(aid), float(valor)
+        except (TypeError, ValueError):
+            return None, "Los anime_id y las calificaciones deben ser numericos"
+        if not (nota.is_integer() and 1 <= nota <= 10):
+            return None, "Las calificaciones deben ser numeros enteros del 1 al 10"
+        validas[anime_id] = int(nota)
+    return validas, None
+
+
+def recomendar_perfil(actual, user_ratings, crono=None):
+    # Todo el trabajo de /recomendar para un perfil {anime_id: calificación}: validar, filtrar y puntuar (o cache)
+    # Devuelve (respuesta, codigo http). Lo comparten la vista de Flask y la variante asincrona (api_async.py)
+    # crono: Cronometro de la peticion donde anotar el tiempo de cada etapa
+    motor = actual.motor
+    crono = Cronometro() if crono is None else crono
+    with crono.etapa("filtrar"):
+        # Las mismas reglas que POST /perfiles/<usuario>: anime_id numericos y notas enteras del 1 al 10
+        # (asi un valor malo es un 400 y no un error al hacer int() o float() mas abajo)
+        _, error = validar_calificaciones(user_ratings)
+        if error:
+            return {"error": error}, 400
+
+        # Filtrar solo animes conocidos, con las notas tal cual llegaron (se devuelven en usuario_ratings)
+        myRatings = {int(aid): valor for aid, valor in user_ratings.items() if motor.contiene(aid)} # Diccionario {anime_id: calificacion} solo con los IDs validos
+        # Los que no estan en corrMatrix pero si en anime.csv se puntuan por contenido (solo si hay alguno)
+        frios = {}
+        if len(myRatings) < len(user_ratings):
+            frios = _animes_frios(actual, user_ratings)
+        if not myRatings and not frios:
+            return {"error": "Ninguno de los animes enviados está en el modelo"}, 400
+
+    # Perfiles repetidos (mismos animes y notas con el mismo modelo) salen de la cache
+    # La clave normaliza el perfil (orden de los animes, 9 frente a 9.0), asi que solo se guarda lo que no depende
+    # de como llego: el top 10. usuario_ratings se monta siempre con lo que envio esta peticion, tal cual
+    with crono.etapa("cache"):
+        clave = cache.clave({**myRatings, **frios}, actual.version)
+        top = cache.obtener(clave)
+    if top is None:
+        top = _top_perfil(motor, actual.catalogo, myRatings, crono, actual.contenido, frios)
+        cache.guardar(clave, top)
+    with crono.etapa("respuesta"):
+        respuesta = _respuesta_perfil(actual, user_ratings, myRatings, frios, top)
+    return respuesta, 200
+
+
+def _animes_frios(actual, user_ratings):
+    # {anime_id: calificacion} de los animes del perfil que no estan en corrMatrix pero tienen vecinos por contenido
+    contenido, motor = actual.contenido, actual.motor
+    if contenido is None or CONTENIDO_PESO <= 0:
+        return {}
+    return {
+        int(aid): float(valor) for aid, valor in user_ratings.items()
+        if not motor.contiene(aid) and contenido.contiene(aid)
+    }
+
+
+def _top_perfil(motor, catalogo, myRatings, crono, contenido=None, frios=None):
+    # recomendaciones_top_10 de un perfil ya filtrado (lo que se guarda en la cache)
+    # Puntuar todo el perfil de una vez (producto matriz-vector + seleccion parcial del top 10)
+    # frios: animes del perfil fuera de corrMatrix; sus aportes por contenido se suman en la misma pasada
+    with crono.etapa("puntuar"):
+        extra = contenido.aportes(frios, CONTENIDO_PESO) if frios else None
+        top = motor.puntuar(myRatings, extra=extra)
+
+    # Nombres sacados del catalogo del modelo (array por posicion de columna), sin DataFrames ni merge
+    with crono.etapa("nombres"):
+        nombres, indice = catalogo.nombres, catalogo.indice
+        return [{"anime_id": aid, "name": nombres[indice[aid]], "puntaje": puntaje} for aid, puntaje in top]
+
+
+def _respuesta_perfil(actual, user_ratings, myRatings, frios, top):
+    # Respuesta de /recomendar: las calificaciones de esta peticion (con sus valores y orden originales) y el top
+    nombres, indice = actual.catalogo.nombres, actual.catalogo.indice
+    respuesta = {
+        "usuario_ratings": [
+            {"anime_id": aid, "name": nombres[indice[aid]], "rating": valor} for aid, valor in myRatings.items()
+        ],
+        "recomendaciones_top_10": top,
+    }
+    if frios:
+        respuesta["usuario_ratings"] += [
+            {"anime_id": int(aid), "name": actual.contenido.nombre(aid), "rating": valor, "por_contenido": True}
+            for aid, valor in user_ratings.items() if int(aid) in frios
+        ]
+    return respuesta
+
+def registrar_etapas(endpoint, crono):
+    # Vuelca los tiempos por etapa de una peticion a los histogramas de /metrics
+    for etapa, segundos in crono.etapas:
+        metrica_etapa.observar(segundos, endpoint, etapa)
+
+
+@app.before_request
+def iniciar_cronometro():
+    # Cada peticion lleva su Cronometro en g; las vistas anotan sus etapas en el
+    g.crono = Cronometro()
+    if PERFILADOR_DIR and request.args.get("perfilar") == "1":
+        g.perfilador = PerfiladorMuestreo().iniciar()
+
+
+@app.after_request
+def publicar_tiempos(respuesta):
+    crono = getattr(g, "crono", None)
+    if crono is None:
+        return respuesta
+    endpoint = request.endpoint or "desconocido"
+    registrar_etapas(endpoint, crono)
+    metrica_peticion.observar(crono.total(), endpoint, str(respuesta.status_code))
+    if SERVER_TIMING:
+        respuesta.headers["Server-Timing"] = crono.server_timing()
+
+    perfilador = g.pop("perfilador", None)
+    if perfilador is not None:
+        ruta = os.path.join(PERFILADOR_DIR, f"{endpoint}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}.folded")
+        respuesta.headers["X-Perfil"] = perfilador.parar().guardar(ruta)
+    return respuesta
+
 
 ###     EndPoints
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    # Histogramas en formato de texto de Prometheus
+    return Response(metricas.texto(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/version", methods=["GET"])
 def version():
     return jsonify({"version": vers}), 200
 
 
+@app.route("/listo", methods=["GET"])
+def listo():
+    # Readiness: 200 solo cuando este proceso tiene un modelo publicado y puede responder a /recomendar
+    actual = modelo
+    if actual is None:
+        return jsonify({"listo": False, "pid": os.getpid(), "mensaje": "El modelo no está cargado. Llama primero a /entrenar"}), 503
+    return jsonify({
+        "listo": True,
+        "pid": os.getpid(),
+        "modelo": actual.version,
+        "animes": len(actual.corrMatrix.columns),
+        "puntuacion": actual.modo_puntuacion,
+    }), 200
+
+
 @app.route("/entrenar", methods=["POST"])
 def entrenar():
     try:
         force = request.args.get("force", "false").lower() == "true"
-        entrenar_modelo(force=force)
-        return jsonify({"mensaje": "Modelo cargado o entrenado correctamente"}), 200
+        modo = request.args.get("modo", MODO_ENTRENAMIENTO).lower()
+        if modo not in MODOS_ENTRENAMIENTO:
+            return jsonify({"error": f"Modo de entrenamiento no valido, usa uno de: {', '.join(MODOS_ENTRENAMIENTO)}"}), 400
+
+        # Parametros enteros opcionales (si no se mandan se usan los valores por defecto):
+        # workers: procesos para la correlacion (ENTRENAMIENTO_WORKERS), k: vecinos por anime del indice (VECINOS_K),
+        # min_ratings: calificaciones para que un anime entre al modelo (300), min_periods: usuarios en comun por par (250)
+        parametros = {}
+        for nombre, minimo in (("workers", 1), ("k", 1), ("min_ratings", 0), ("min_periods", 1)):
+            valor = request.args.get(nombre)
+            if valor is None:
+                continue
+            if not valor.isdigit() or int(valor) < minimo:
+                return jsonify({"error": f"{nombre} debe ser un numero entero mayor o igual que {minimo}"}), 400
+            parametros[nombre] = int(valor)
+
+        # Medida de similitud (pearson por defecto) y contraccion de pearson_contraida
+        similitud = request.args.get("similitud", "pearson").lower()
+        if similitud not in SIMILITUDES:
+            return jsonify({"error": f"Similitud no valida, usa una de: {', '.join(SIMILITUDES)}"}), 400
+        if modo == "pivot" and similitud != "pearson":
+            return jsonify({"error": "El modo pivot solo calcula pearson, usa modo=sparse para otras similitudes"}), 400
+        try:
+            contraccion = float(request.args.get("contraccion", CONTRACCION))
+        except ValueError:
+            contraccion = -1
+        if not contraccion >= 0:
+            return jsonify({"error": "contraccion debe ser un numero mayor o igual que 0"}), 400
+
+        # Formato en que se guarda y se sirve corrMatrix (float32 por defecto) y |r| minimo del formato disperso
+        formato_corr = request.args.get("formato", "float32").lower()
+        if formato_corr not in FORMATOS_CORR:
+            return jsonify({"error": f"Formato no valido, usa uno de: {', '.join(FORMATOS_CORR)}"}), 400
+        try:
+            umbral_disperso = float(request.args.get("umbral", UMBRAL_DISPERSO))
+        except ValueError:
+            umbral_disperso = -1
+        if not 0 <= umbral_disperso <= 1:
+            return jsonify({"error": "umbral debe ser un numero entre 0 y 1"}), 400
+
+        # Con nombre se entrena un modelo aparte que convive con el principal (se usa con ?modelo=<nombre>)
+        nombre = request.args.get("nombre")
+        if nombre is not None and not NOMBRE_VALIDO.match(nombre):
+            return jsonify({"error": "El nombre del modelo solo puede tener letras, numeros, - y _ (maximo 40)"}), 400
+
+        # incremental=true guarda tambien los estadisticos por par que necesita /ratings (por defecto ESTADISTICAS_INCREMENTALES)
+        incremental = request.args.get("incremental")
+        if incremental is not None:
+            if incremental.lower() not in ("true", "false"):
+                return jsonify({"error": "incremental debe ser true o false"}), 400
+            incremental = incremental.lower() == "true"
+        if incremental and (modo != "sparse" or nombre not in (None, NOMBRE_PRINCIPAL)):
+            return jsonify({"error": "incremental=true solo vale para el modelo principal en modo sparse"}), 400
+
+        # El entrenamiento corre en segundo plano, se devuelve enseguida el id del trabajo
+        job_id = trabajos.lanzar(
+            entrenar_modelo, force=force, modo=modo, similitud=similitud, contraccion=contraccion, nombre=nombre,
+            formato_corr=formato_corr, umbral_disperso=umbral_disperso, incremental=incremental, **parametros
+        )
+        return jsonify({
+            "mensaje": "Entrenamiento lanzado en segundo plano",
+            "job_id": job_id,
+            "estado": f"/entrenar/{job_id}"
+        }), 202
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Error durante el entrenamiento: {str(e)}"}), 500
 
 
+@app.route("/entrenar/<job_id>", methods=["GET"])
+def estado_entrenamiento(job_id):
+    trabajo = trabajos.estado(job_id)
+    if trabajo is None:
+        return jsonify({"error": "No existe ningun entrenamiento con ese id"}), 404
+
+    # Informe de tiempo y memoria si termino entrenando (None si solo cargo el modelo)
+    if "resultado" in trabajo:
+        trabajo["informe"] = trabajo.pop("resultado")
+    return jsonify(trabajo), 200
+
+
+@app.route("/ratings", methods=["POST"])
+def anyadir_ratings():
+    if modelo is None:
+        return jsonify({"error": "El modelo no está entrenado. Llama primero a /entrenar"}), 400
+
+    try:
+        nuevos = request.json # Lista de {"user_id": ..., "anime_id": ..., "rating": ...}
+        if not nuevos or not isinstance(nuevos, list):
+            return jsonify({"error": "Debes enviar una lista JSON de ratings con user_id, anime_id y rating"}), 400
+
+        try:
+            usuarios = [int(r["user_id"]) for r in nuevos]
+            animes = [int(r["anime_id"]) for r in nuevos]
+            valores = [float(r["rating"]) for r in nuevos]
+        except (KeyError, TypeError, ValueError):
+            return jsonify({"error": "Cada rating debe tener user_id, anime_id y rating numericos"}), 400
+
+        informe = actualizar_modelo(usuarios, animes, valores)
+        return jsonify({"mensaje": "Modelo actualizado correctamente", "informe": informe}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Error actualizando el modelo: {str(e)}"}), 500
+
+
 @app.route("/recomendar", methods=["POST"])
 def recomendar():
-    global corrMatrix, anime
+    # Con ?modelo=<nombre> se usa un modelo con nombre en vez del principal
+    nombre = request.args.get("modelo")
+    actual = obtener_modelo(nombre) # Se coge una sola vez: toda la peticion usa el mismo modelo aunque se publique otro
+    if actual is None:
+        if nombre not in (None, NOMBRE_PRINCIPAL):
+            return jsonify({"error": f"No existe ningun modelo llamado {nombre}"}), 404
+        return jsonify({"error": "El modelo no está entrenado. Llama primero a /entrenar"}), 400
+
+    try:
+        with g.crono.etapa("json"):
+            user_ratings = request.json # Diccionario enviado desde consola {anime_id: calificación}
+        respuesta, codigo = recomendar_perfil(actual, user_ratings, g.crono)
+        with g.crono.etapa("serializar"):
+            return jsonify(respuesta), codigo
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Error generando recomendaciones: {str(e)}"}), 500
+
 
-    if corrMatrix is None:
+@app.route("/recomendar/<usuario>", methods=["GET"])
+def recomendar_usuario(usuario):
+    # Como /recomendar pero con el perfil guardado del usuario (POST /perfiles/<usuario>): no hace falta reenviarlo
+    # Necesita el token de sesion del propio usuario (POST /sesiones)
+    if usuario in USUARIOS_RESERVADOS:
+        # GET /recomendar/batch acaba aqui porque /recomendar/batch solo tiene POST
+        return jsonify({"error": f"/recomendar/{usuario} solo acepta POST"}), 405, {"Allow": "POST"}
+    actual_perfiles = obtener_perfiles()
+    if actual_perfiles is None:
+        return jsonify({"error": SIN_PERFILES}), 503
+    error = validar_usuario(usuario)
+    if error:
+        return jsonify({"error": error}), 400
+    no_autorizado = autorizar(usuario)
+    if no_autorizado:
+        return no_autorizado
+    nombre = request.args.get("modelo")
+    actual = obtener_modelo(nombre)
+    if actual is None:
+        if nombre not in (None, NOMBRE_PRINCIPAL):
+            return jsonify({"error": f"No existe ningun modelo llamado {nombre}"}), 404
         return jsonify({"error": "El modelo no está entrenado. Llama primero a /entrenar"}), 400
 
     try:
-        user_ratings = request.json  # Diccionario enviado desde consola {anime_id: calificación}
+        with g.crono.etapa("perfil"):
+            user_ratings = actual_perfiles.obtener(usuario)
         if not user_ratings:
-            return jsonify({"error": "Debes enviar un JSON con las calificaciones del usuario (anime_id: rating)"}), 400
-
-        # Filtrar solo animes conocidos
-        available_ids = [int(aid) for aid in user_ratings.keys() if int(aid) in corrMatrix.columns] # El .key agarra las claves/id del diccioanrio, el int(aid) los transforma a int si son string y el final lo que hace es quedarse con los animes en las columnas del modelo  
-        if not available_ids:
-            return jsonify({"error": "Ninguno de los animes enviados está en el modelo"}), 400
-
-        myRatings = pd.Series({int(aid): user_ratings[str(aid)] for aid in available_ids}) #Construyendo un pd.Series a partir de los IDs validos del usuario y sus puntuaciones
-
-        simCandidates = pd.Series(dtype='float64') # Creacion de serie vacia
-        for anime_id, rating_value in myRatings.items():
-            # Recuperar las similitudes del anime actual
-            sims = corrMatrix[anime_id].dropna()
-            # Escalar la similaridad multiplicando la correlación por la calificación de la persona
-            sims = sims.map(lambda x: x * rating_value)
-            # Agregar al conjunto de candidatos
-            simCandidates = pd.concat([simCandidates, sims])
-
-        # Agrupar y ordenar resultados
-        simCandidates = simCandidates.groupby(simCandidates.index).sum() # Agrupamos para sumar puntaje por que salen repetidos
-        simCandidates.sort_values(inplace=True, ascending=False)
-        filteredSims = simCandidates.drop(myRatings.index, errors='ignore')
-
-        # Convertir a DataFrame para mantener orden y serializar
-        top_recommendations = (
-            filteredSims
-            .head(10)
-            .reset_index()
-            .rename(columns={"index": "anime_id", 0: "puntaje"})
-        )
+            return jsonify({"error": "El usuario no tiene calificaciones guardadas"}), 404
+        respuesta, codigo = recomendar_perfil(actual, user_ratings, g.crono)
+        with g.crono.etapa("serializar"):
+            return jsonify(respuesta), codigo
 
-        # Agregar nombres a las recomendaciones
-        top_recommendations = top_recommendations.merge(
-            anime[['anime_id', 'name']], on='anime_id', how='left'
-        )
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Error generando recomendaciones: {str(e)}"}), 500
 
-        # Agregar nombres a los animes del usuario
-        user_data = (
-            pd.DataFrame({
-                "anime_id": list(map(int, myRatings.index)),
-                "rating": list(myRatings.values)
-            })
-            .merge(anime[['anime_id', 'name']], on='anime_id', how='left')
-        )
 
-        # El .to_dict convierte un DataFrame de Pandas en una lista de diccionarios
-        usuario_ratings_list = user_data.to_dict(orient='records')
-        recomendaciones_list = top_recommendations.to_dict(orient='records')
+@app.route("/perfiles/<usuario>", methods=["GET", "POST", "DELETE"])
+def perfil_usuario(usuario):
+    # GET: calificaciones guardadas del usuario | POST: añade o cambia las que se envian ({anime_id: rating})
+    # DELETE: borra todas. Las que no se envian en un POST se quedan como estaban
+    # Solo con el token de sesion del propio usuario (POST /sesiones)
+    actual_perfiles = obtener_perfiles()
+    if actual_perfiles is None:
+        return jsonify({"error": SIN_PERFILES}), 503
+    error = validar_usuario(usuario)
+    if error:
+        return jsonify({"error": error}), 400
+    no_autorizado = autorizar(usuario)
+    if no_autorizado:
+        return no_autorizado
 
-        return jsonify({
-            "usuario_ratings": usuario_ratings_list,
-            "recomendaciones_top_10": recomendaciones_list
-        }), 200
+    try:
+        if request.method == "GET":
+            return jsonify({"usuario": usuario, "calificaciones": actual_perfiles.obtener(usuario)}), 200
+        if request.method == "DELETE":
+            return jsonify({"usuario": usuario, "borradas": actual_perfiles.borrar(usuario)}), 200
+
+        calificaciones, error = validar_calificaciones(request.get_json(silent=True))
+        if error:
+            return jsonify({"error": error}), 400
+        guardadas = actual_perfiles.guardar(usuario, calificaciones)
+        return jsonify({"mensaje": "Calificaciones guardadas", "usuario": usuario, "guardadas": guardadas}), 200
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"No se pudo acceder al perfil: {str(e)}"}), 500
+
+
+@app.route("/sesiones", methods=["POST"])
+def crear_sesion():
+    # {"usuario": ..., "contrasenya": ...} con los logins de main.py -> token para /perfiles y /recomendar/<usuario>
+    if obtener_perfiles() is None:
+        return jsonify({"error": SIN_PERFILES}), 503
+    datos = request.get_json(silent=True)
+    if not isinstance(datos, dict) or not all(isinstance(datos.get(campo), str) for campo in ("usuario", "contrasenya")):
+        return jsonify({"error": "Debes enviar un JSON con el usuario y la contrasenya"}), 400
+    usuario = datos["usuario"]
+    if validar_usuario(usuario):
+        return jsonify({"error": "Usuario o contraseña incorrectos"}), 401
+
+    try:
+        from Comun.Usuario_Contrasenya import Usuario_Contrasenya
+        with g.crono.etapa("login"):
+            correcto = obtener_autenticacion().iniciar_sesion(Usuario_Contrasenya(usuario, datos["contrasenya"]))
+        if not correcto:
+            return jsonify({"error": "Usuario o contraseña incorrectos"}), 401
+        return jsonify({"usuario": usuario, "token": crear_token(usuario), "caduca_en": SESION_TTL}), 200
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"No se pudo iniciar sesion: {str(e)}"}), 500
+
+
+@app.route("/recomendar/batch", methods=["POST"])
+def recomendar_lote():
+    nombre = request.args.get("modelo")
+    actual = obtener_modelo(nombre)
+    if actual is None:
+        if nombre not in (None, NOMBRE_PRINCIPAL):
+            return jsonify({"error": f"No existe ningun modelo llamado {nombre}"}), 404
+        return jsonify({"error": "El modelo no está entrenado. Llama primero a /entrenar"}), 400
+    motor, catalogo = actual.motor, actual.catalogo
+
+    try:
+        crono = g.crono
+        with crono.etapa("json"):
+            perfiles = request.json # Lista de diccionarios {anime_id: calificación}, uno por usuario
+        if not perfiles or not isinstance(perfiles, list):
+            return jsonify({"error": "Debes enviar una lista JSON con un diccionario (anime_id: rating) por usuario"}), 400
+        if len(perfiles) > LOTE_MAXIMO:
+            return jsonify({"error": f"Como maximo {LOTE_MAXIMO} perfiles por llamada"}), 400
+
+        # Cada perfil se valida por separado: uno malo no tumba el lote, su resultado lleva el error
+        resultados = [None] * len(perfiles)
+        validos, posiciones, con_frios = [], [], []
+        with crono.etapa("filtrar"):
+            for i, perfil in enumerate(perfiles):
+                if not isinstance(perfil, dict):
+                    resultados[i] = {"error": "El perfil debe ser un diccionario (anime_id: rating)"}
+                    continue
+                calificaciones, error = validar_calificaciones(perfil) # Las mismas reglas que /recomendar
+                if error:
+                    resultados[i] = {"error": error}
+                    continue
+                myRatings = {aid: nota for aid, nota in calificaciones.items() if motor.contiene(aid)}
+                frios = _animes_frios(actual, calificaciones) if len(myRatings) < len(calificaciones) else {}
+                if not myRatings and not frios:
+                    resultados[i] = {"error": "Ninguno de los animes enviados está en el modelo"}
+                    continue
+                if frios:
+                    con_frios.append((i, myRatings, frios))
+                    continue
+                validos.append(myRatings)
+                posiciones.append(i)
+
+        # Todos los perfiles validos se puntuan juntos (matriz dispersa perfiles x animes por corrMatrix)
+        # Los que traen animes fuera de corrMatrix (pocos) se puntuan uno a uno con sus aportes por contenido
+        with crono.etapa("puntuar"):
+            tops = motor.puntuar_lote(validos)
+            for i, myRatings, frios in con_frios:
+                posiciones.append(i)
+                tops.append(motor.puntuar(myRatings, extra=actual.contenido.aportes(frios, CONTENIDO_PESO)))
+        with crono.etapa("nombres"):
+            nombres, indice = catalogo.nombres, catalogo.indice
+            for i, top in zip(posiciones, tops):
+                resultados[i] = {
+                    "recomendaciones_top_10": [
+                        {"anime_id": aid, "name": nombres[indice[aid]], "puntaje": puntaje} for aid, puntaje in top
+                    ]
+                }
+
+        with crono.etapa("serializar"):
+            return jsonify({"resultados": resultados}), 200
 
     except Exception as e:
         import traceback
@@ -187,21 +1016,46 @@ def recomendar():
         return jsonify({"error": f"Error generando recomendaciones: {str(e)}"}), 500
 
 
+@app.route("/modelos", methods=["GET"])
+def obtener_modelos():
+    # Modelos guardados (principal y con nombre) con su similitud, umbrales y coste de entrenamiento
+    return jsonify(listar_modelos()), 200
+
+
+@app.route("/cache", methods=["GET"])
+def estado_cache():
+    # Contadores de la cache de /recomendar (aciertos, fallos, expulsiones por tamaño y caducadas)
+    return jsonify(cache.estadisticas()), 200
+
+
 @app.route("/animes", methods=["GET"])
 def obtener_animes():
-    global anime, corrMatrix
-
-    if anime is None or corrMatrix is None:
+    actual = modelo
+    if actual is None:
         return jsonify({"error": "Los datos no están cargados. Llama primero a /entrenar"}), 400
 
     try:
-        # Filtrar solo los animes que están en la matriz de correlación
-        disponibles = anime[anime['anime_id'].isin(corrMatrix.columns)]
-        sample = disponibles.sample(n=min(100, len(disponibles)), random_state=random.randint(0, 9999)) # Seleccionar aleatoriamente 100 entre todos
-        
-        # Convertir en lista para enviarlo por json
-        lista = sample[['anime_id', 'name']].values.tolist()
-        return jsonify({"animes": lista}), 200
+        # Parametros opcionales: n por pagina, seed para repetir el mismo orden, pagina, genero y tipo
+        parametros = {}
+        for nombre, minimo, por_defecto in (("n", 1, MUESTRA_N), ("seed", 0, None), ("pagina", 0, 0)):
+            valor = request.args.get(nombre)
+            if valor is None:
+                parametros[nombre] = por_defecto
+            elif not valor.isdigit() or int(valor) < minimo:
+                return jsonify({"error": f"{nombre} debe ser un numero entero mayor o igual que {minimo}"}), 400
+            else:
+                parametros[nombre] = int(valor)
+        n = min(parametros["n"], MUESTRA_MAXIMA)
+        # Sin seed se elige una al azar y se devuelve, para poder pedir las paginas siguientes con el mismo orden
+        seed = random.randint(0, 2**31 - 1) if parametros["seed"] is None else parametros["seed"]
+
+        # Sorteo de posiciones sobre el catalogo ya preparado al cargar el modelo
+        with g.crono.etapa("muestra"):
+            lista, total = actual.catalogo.muestra(
+                n, seed, request.args.get("genero"), request.args.get("tipo"), parametros["pagina"]
+            )
+        with g.crono.etapa("serializar"):
+            return jsonify({"animes": lista, "seed": seed, "pagina": parametros["pagina"], "total": total}), 200
 
     except Exception as e:
         import traceback
@@ -209,5 +1063,31 @@ def obtener_animes():
         return jsonify({"error": f"No se pudieron obtener los animes: {str(e)}"}), 500
 
 
+@app.route("/animes/buscar", methods=["GET"])
+def buscar_animes():
+    # Animes del modelo por nombre: ?q=<texto> (prefijo del nombre o de una palabra, y si no llegan, con erratas)
+    actual = modelo
+    if actual is None:
+        return jsonify({"error": "Los datos no están cargados. Llama primero a /entrenar"}), 400
+
+    consulta = request.args.get("q", "").strip()
+    if not consulta or len(consulta) > CONSULTA_MAXIMA:
+        return jsonify({"error": f"Debes enviar q con el nombre a buscar (maximo {CONSULTA_MAXIMA} caracteres)"}), 400
+    n = request.args.get("n", str(BUSQUEDA_N))
+    if not n.isdigit() or int(n) < 1:
+        return jsonify({"error": "n debe ser un numero entero mayor o igual que 1"}), 400
+
+    try:
+        with g.crono.etapa("buscar"):
+            resultados = actual.catalogo.buscar(consulta, min(int(n), BUSQUEDA_MAXIMA))
+        with g.crono.etapa("serializar"):
+            return jsonify({"q": consulta, "resultados": resultados}), 200
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"No se pudieron buscar los animes: {str(e)}"}), 500
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,109 @@
+import mysql.connector
+from mysql.connector import InterfaceError, OperationalError
+from Comun.pool_conexiones import PoolConexiones, POOL_TAM, POOL_TIMEOUT, POOL_VERIFICAR # El mismo que DAO_Logins
+
+ERRORES_CONEXION = (OperationalError, InterfaceError)
+INTENTOS = 2 # Veces que se intenta cada consulta (la segunda ya con una conexion nueva)
+LOTE_UPSERT = 500 # Filas por INSERT ... ON DUPLICATE KEY UPDATE (un solo viaje al servidor por lote)
+
+
+class DAO_Calificaciones():
+    # DAO de la tabla calificaciones_usuarios (usuario, anime_id, calificacion) sobre un pool de conexiones
+    # La clave primaria es (usuario, anime_id): InnoDB guarda juntas las filas de cada usuario,
+    # asi leer un perfil entero es una sola consulta por rango de indice
+    # crear_conexion: funcion que abre una conexion (por defecto mysql.connector.connect con los datos de abajo)
+    def __init__(self, user_input: str, password_input: str, host="localhost", database="logins_api_anime",
+                 tam_pool=POOL_TAM, timeout_pool=POOL_TIMEOUT, verificar_cada=POOL_VERIFICAR, crear_conexion=None):
+
+        self.__host = host
+        self.__user = user_input
+        self.__password = password_input
+        self.__database = database
+        self.__crear_conexion = crear_conexion or self.__nueva_conexion
+        self.__pool = PoolConexiones(self.__crear_conexion, tam_pool, timeout_pool, verificar_cada, ERRORES_CONEXION)
+
+    def __nueva_conexion(self):
+        return mysql.connector.connect(
+            host=self.__host,
+            user=self.__user,
+            password=self.__password,
+            database=self.__database,
+            autocommit=True
+        )
+
+    def get_pool(self):
+        return self.__pool
+
+    def close(self):
+        self.__pool.cerrar()
+
+    def __consultar(self, sql, valores=()):
+        # Igual que en DAO_Logins: conexion del pool, cursor propio con sentencia preparada y un reintento si se cayo
+        for intento in range(INTENTOS):
+            try:
+                with self.__pool.conexion() as conexion:
+                    cursor = conexion.cursor(prepared=True)
+                    try:
+                        cursor.execute(sql, valores)
+                        return cursor.fetchall()
+                    finally:
+                        cursor.close()
+            except ERRORES_CONEXION:
+                if intento == INTENTOS - 1:
+                    raise
+
+    def __escribir(self, sentencias):
+        # Ejecuta las sentencias [(sql, valores), ...] en una sola transaccion y devuelve las filas afectadas
+        # Si falla una se deshacen todas (el pool hace rollback al devolver la conexion, o la descarta si se cayo)
+        # Como en DAO_Logins, solo se repite si la conexion se cayo antes de mandar el commit (el servidor
+        # deshace la transaccion a medias). Si se cae despues no se sabe si se confirmo: se lanza el error
+        for intento in range(INTENTOS):
+            enviada = False
+            try:
+                with self.__pool.conexion() as conexion:
+                    cursor = conexion.cursor(prepared=True)
+                    try:
+                        conexion.start_transaction()
+                        filas = 0
+                        for sql, valores in sentencias:
+                            cursor.execute(sql, valores)
+                            filas += cursor.rowcount
+                        enviada = True
+                        conexion.commit()
+                        return filas
+                    finally:
+                        cursor.close()
+            except ERRORES_CONEXION:
+                if intento == INTENTOS - 1 or enviada:
+                    raise
+
+    def obtener_calificaciones(self, usuario):
+        # Perfil guardado del usuario {anime_id: calificacion} (vacio si no tiene ninguna), en una consulta
+        sql = "SELECT anime_id, calificacion FROM calificaciones_usuarios WHERE usuario = %s"
+        return {int(anime_id): int(calificacion) for anime_id, calificacion in self.__consultar(sql, (usuario, ))}
+
+    def guardar_calificaciones(self, usuario, calificaciones):
+        # Inserta o actualiza varias calificaciones {anime_id: calificacion} del usuario de una vez
+        # Cada lote de LOTE_UPSERT es un solo INSERT de varias filas y todos van en la misma transaccion:
+        # o se guardan todas o ninguna. VALUES(calificacion) vale en cualquier MySQL (desde 8.0.20 da un aviso de obsoleto)
+        filas = list(calificaciones.items())
+        sentencias = []
+        for inicio in range(0, len(filas), LOTE_UPSERT):
+            lote = filas[inicio:inicio + LOTE_UPSERT]
+            sql = (
+                "INSERT INTO calificaciones_usuarios (usuario, anime_id, calificacion) VALUES "
+                + ", ".join(["(%s, %s, %s)"] * len(lote))
+                + " ON DUPLICATE KEY UPDATE calificacion = VALUES(calificacion)"
+            )
+            valores = [valor for anime_id, calificacion in lote for valor in (usuario, int(anime_id), int(calificacion))]
+            sentencias.append((sql, valores))
+        if sentencias:
+            self.__escribir(sentencias)
+        return len(filas)
+
+    def borrar_calificaciones(self, usuario):
+        sql = "DELETE FROM calificaciones_usuarios WHERE usuario = %s"
+        return self.__escribir([(sql, (usuario, ))])
+
+    def __str__(self):
+        return "DAO de Calificaciones"
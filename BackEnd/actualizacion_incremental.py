@@ -0,0 +1,212 @@
+# Actualizacion incremental de corrMatrix con ratings nuevos, sin reentrenar desde cero
+# El entrenamiento sparse guarda por cada par de animes populares los estadisticos suficientes
+# (N usuarios en comun, SX suma de notas, SXX suma de cuadrados y SXY productos cruzados).
+# Con ratings nuevos solo cambian las filas/columnas de los animes que tocan esos usuarios,
+# y los animes que pasan a superar el umbral de popularidad se calculan enteros.
+# Uso con un archivo por lotes (mismas columnas que rating.csv): python actualizacion_incremental.py ratings_nuevos.csv
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from entrenamiento import csr_medias, preparar_matrices, corr_desde_estadisticas, pico_rss_mb, PicoRSS, CONTRACCION
+from modelo_disco import cargar_estadisticas, guardar_estadisticas, cargar_cache_ratings, guardar_cache_ratings, cache_ratings_valida
+
+
+def _estadisticas_densas(matriz):
+    # Estadisticos de todos los pares de columnas de una matriz usuarios x animes pequeña
+    X, B, X2 = preparar_matrices(matriz)
+    return {
+        "N": (B.T @ B).toarray(),
+        "SX": (X.T @ B).toarray(),
+        "SXX": (X2.T @ B).toarray(),
+        "SXY": (X.T @ X).toarray(),
+    }
+
+
+def _posiciones(ids, valores):
+    # Posicion de cada valor dentro de ids (ordenado) y mascara de los que estan
+    if len(ids) == 0:
+        return np.zeros(len(valores), dtype=np.intp), np.zeros(len(valores), dtype=bool)
+    pos = np.searchsorted(ids, valores)
+    dentro = ids[np.minimum(pos, len(ids) - 1)] == valores
+    return pos, dentro
+
+
+def actualizar_con_ratings(carpeta_estadisticas, corrMatrix, ruta_cache, ratings_file, anime_ids_validos, usuarios_nuevos, animes_nuevos, valores_nuevos):
+    # Aplica los ratings nuevos a los estadisticos y recalcula solo las filas/columnas afectadas de corrMatrix
+    # Los ratings nuevos se añaden tambien a la cache de entrenamiento y al rating.csv, para que un
+    # reentrenamiento completo use los mismos datos (y de el mismo resultado)
+    # Devuelve la nueva corrMatrix y un informe (pico_rss_mb es el de esta actualizacion)
+    with PicoRSS() as pico:
+        return _actualizar_con_ratings(
+            carpeta_estadisticas, corrMatrix, ruta_cache, ratings_file, anime_ids_validos,
+            usuarios_nuevos, animes_nuevos, valores_nuevos, pico
+        )
+
+
+def _actualizar_con_ratings(carpeta_estadisticas, corrMatrix, ruta_cache, ratings_file, anime_ids_validos, usuarios_nuevos, animes_nuevos, valores_nuevos, pico):
+    inicio = time.perf_counter()
+
+    if not cache_ratings_valida(ruta_cache, ratings_file, anime_ids_validos):
+        raise ValueError("La cache de entrenamiento no existe o el rating.csv ha cambiado, reentrena con /entrenar?force=true")
+
+    ids, estadisticas, conteo_ids, conteos, meta = cargar_estadisticas(carpeta_estadisticas)
+    if not np.array_equal(np.asarray(corrMatrix.columns, dtype=np.int64), ids):
+        raise ValueError("Los estadisticos no corresponden al modelo cargado, reentrena con /entrenar?force=true")
+    min_ratings, min_periods = meta["min_ratings"], meta["min_periods"]
+    # Misma medida de similitud que el entrenamiento (los estadisticos de antes de existir la opcion son de pearson)
+    opciones = {"similitud": meta.get("similitud", "pearson"), "contraccion": meta.get("contraccion", CONTRACCION)}
+
+    # Limpieza igual que en el entrenamiento: fuera los -1
+    usuarios_nuevos = np.asarray(usuarios_nuevos, dtype=np.int32)
+    animes_nuevos = np.asarray(animes_nuevos, dtype=np.int32)
+    valores_nuevos = np.asarray(valores_nuevos, dtype=np.float32)
+    limpios = valores_nuevos != -1
+    usuarios_nuevos, animes_nuevos, valores_nuevos = usuarios_nuevos[limpios], animes_nuevos[limpios], valores_nuevos[limpios]
+
+    usuarios, animes, valores = cargar_cache_ratings(ruta_cache)
+
+    # Solo cuentan para el modelo los animes que existen en anime.csv
+    conocidos = np.isin(animes_nuevos, anime_ids_validos)
+    u_n, a_n, v_n = usuarios_nuevos[conocidos], animes_nuevos[conocidos], valores_nuevos[conocidos].astype(np.float64)
+
+    # 1) Conteos de calificaciones y nuevo conjunto de animes populares
+    todos_ids = np.union1d(conteo_ids, a_n)
+    todos_conteos = np.zeros(len(todos_ids), dtype=np.int64)
+    todos_conteos[np.searchsorted(todos_ids, conteo_ids)] = conteos
+    np.add.at(todos_conteos, np.searchsorted(todos_ids, a_n), 1)
+    ids_nuevos = todos_ids[todos_conteos > min_ratings]
+    n = len(ids_nuevos)
+
+    # 2) Si hay animes que acaban de pasar el umbral se hace sitio para ellos
+    pos_viejos = np.searchsorted(ids_nuevos, ids)
+    recien_populares = np.setdiff1d(np.arange(n), pos_viejos)
+    corr = np.array(corrMatrix.to_numpy(dtype=np.float32))
+    if len(recien_populares):
+        malla = np.ix_(pos_viejos, pos_viejos)
+        for nombre, matriz in estadisticas.items():
+            ampliada = np.zeros((n, n), dtype=matriz.dtype)
+            ampliada[malla] = matriz
+            estadisticas[nombre] = ampliada
+        ampliada = np.full((n, n), np.nan, dtype=np.float32)
+        ampliada[malla] = corr
+        corr = ampliada
+
+    # 3) Usuarios afectados: se quita su aportacion vieja y se suma la nueva (solo en los animes que han visto)
+    afectados = np.unique(u_n)
+    viejos = np.isin(usuarios, afectados)
+    u_v, a_v, v_v = usuarios[viejos], animes[viejos], valores[viejos].astype(np.float64)
+
+    col_v, pop_v = _posiciones(ids_nuevos, a_v)
+    col_n, pop_n = _posiciones(ids_nuevos, a_n)
+    tocados = np.unique(np.concatenate([col_v[pop_v], col_n[pop_n]]))
+
+    if len(tocados):
+        forma = (len(afectados), len(tocados))
+        filas_v, filas_n = np.searchsorted(afectados, u_v[pop_v]), np.searchsorted(afectados, u_n[pop_n])
+        locales_v, locales_n = np.searchsorted(tocados, col_v[pop_v]), np.searchsorted(tocados, col_n[pop_n])
+
+        antes = _estadisticas_densas(csr_medias(filas_v, locales_v, v_v[pop_v], forma))
+        despues = _estadisticas_densas(csr_medias(
+            np.concatenate([filas_v, filas_n]), np.concatenate([locales_v, locales_n]),
+            np.concatenate([v_v[pop_v], v_n[pop_n]]), forma
+        ))
+        malla = np.ix_(tocados, tocados)
+        for nombre in estadisticas:
+            # N es int32 (ver TIPOS_ESTADISTICAS): sus diferencias son conteos enteros aunque salgan en float64
+            estadisticas[nombre][malla] += (despues[nombre] - antes[nombre]).astype(estadisticas[nombre].dtype)
+
+    # 4) Animes recien populares: sus filas y columnas se calculan enteras con todos los usuarios que los vieron
+    if len(recien_populares):
+        todos_u = np.concatenate([usuarios, u_n])
+        todos_a = np.concatenate([animes, a_n])
+        todos_v = np.concatenate([valores.astype(np.float64), v_n])
+
+        vistos = np.unique(todos_u[np.isin(todos_a, ids_nuevos[recien_populares])])
+        columnas, populares = _posiciones(ids_nuevos, todos_a)
+        seleccion = populares & np.isin(todos_u, vistos)
+        X, B, X2 = preparar_matrices(csr_medias(
+            np.searchsorted(vistos, todos_u[seleccion]), columnas[seleccion], todos_v[seleccion], (len(vistos), n)
+        ))
+        K = recien_populares
+        N, SX, SXX, SXY = (estadisticas[nombre] for nombre in ("N", "SX", "SXX", "SXY"))
+        N[:, K] = (B.T @ B[:, K]).toarray()
+        N[K, :] = N[:, K].T
+        SX[:, K] = (X.T @ B[:, K]).toarray()
+        SX[K, :] = (X[:, K].T @ B).toarray()
+        SXX[:, K] = (X2.T @ B[:, K]).toarray()
+        SXX[K, :] = (X2[:, K].T @ B).toarray()
+        SXY[:, K] = (X.T @ X[:, K]).toarray()
+        SXY[K, :] = SXY[:, K].T
+
+    # 5) Recalcular solo las filas/columnas afectadas (la matriz es simetrica)
+    recalcular = np.union1d(tocados, recien_populares).astype(np.intp)
+    if len(recalcular):
+        N, SX, SXX, SXY = (estadisticas[nombre] for nombre in ("N", "SX", "SXX", "SXY"))
+        if opciones["similitud"] == "coseno_ajustado":
+            # La media de cada anime sale de la diagonal: N[i, i] son sus usuarios y SX[i, i] la suma de sus notas
+            # Cambia con los ratings nuevos, pero solo en los animes tocados, que son los que se recalculan
+            with np.errstate(divide='ignore', invalid='ignore'):
+                medias = np.diagonal(SX) / np.diagonal(N)
+            opciones["medias_x"], opciones["medias_y"] = medias[recalcular], medias
+        filas = corr_desde_estadisticas(
+            N[recalcular], SX[recalcular], SX[:, recalcular].T,
+            SXX[recalcular], SXX[:, recalcular].T, SXY[recalcular], min_periods, **opciones
+        )
+        corr[recalcular, :] = filas
+        corr[:, recalcular] = filas.T
+
+    # 6) Guardar: primero el CSV y despues la cache (que apunta a la nueva version del CSV) y los estadisticos
+    # En la cache solo entran los animes conocidos, igual que al leer el CSV
+    if os.path.exists(ratings_file):
+        _anyadir_a_csv(ratings_file, usuarios_nuevos, animes_nuevos, valores_nuevos)
+    guardar_cache_ratings(
+        ruta_cache,
+        np.concatenate([usuarios, u_n]), np.concatenate([animes, a_n]),
+        np.concatenate([valores, valores_nuevos[conocidos]]), ratings_file, anime_ids_validos
+    )
+    guardar_estadisticas(carpeta_estadisticas, ids_nuevos, estadisticas, todos_ids, todos_conteos, meta)
+
+    columnas = pd.Index(ids_nuevos.astype(np.int64), name='anime_id')
+    nueva_corrMatrix = pd.DataFrame(corr, index=columnas, columns=columnas)
+
+    informe = {
+        "modo": "incremental",
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "pico_rss_mb": pico.valor(),
+        "pico_rss_mb_proceso": pico_rss_mb(),
+        "ratings_nuevos": int(len(usuarios_nuevos)),
+        "usuarios_afectados": int(len(afectados)),
+        "animes_recalculados": int(len(recalcular)),
+        "animes_nuevos_en_modelo": [int(aid) for aid in ids_nuevos[recien_populares]],
+        "animes": n,
+    }
+    return nueva_corrMatrix, informe
+
+
+def _anyadir_a_csv(ratings_file, usuarios, animes, valores):
+    # Añade las filas al final de rating.csv (con salto de linea si el archivo no terminaba en uno)
+    with open(ratings_file, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    valores = valores.astype(np.int64) if np.all(valores == np.round(valores)) else valores
+    pd.DataFrame({"user_id": usuarios, "anime_id": animes, "rating": valores}).to_csv(ratings_file, mode="a", header=False, index=False)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python actualizacion_incremental.py ratings_nuevos.csv")
+        sys.exit(1)
+
+    import API_RecomendacionesAnimes as api
+
+    lote = pd.read_csv(sys.argv[1], names=['user_id', 'anime_id', 'rating'], header=0, encoding="utf-8").dropna()
+    api.entrenar_modelo()
+    informe = api.actualizar_modelo(lote['user_id'].to_numpy(), lote['anime_id'].to_numpy(), lote['rating'].to_numpy())
+    print(f"\033[32m### Modelo actualizado: {informe}\033[0m")
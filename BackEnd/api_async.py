@@ -0,0 +1,171 @@
+# Variante asincrona (ASGI) de /recomendar sobre el mismo modelo publicado que la API de Flask
+# Las peticiones se aceptan en el event loop (un cliente lento no ocupa ningun hilo mientras manda el cuerpo)
+# y la puntuacion se pasa a un pool de hilos acotado. Con control de admision: si ya hay demasiadas
+# peticiones en marcha se responde 503 al momento en vez de dejarlas en una cola sin limite, y cada
+# peticion tiene un tiempo maximo (504 si no termina a tiempo). Asi la latencia de cola se mantiene
+# estable con sobrecarga. Rutas: POST /recomendar, GET /listo, GET /version y GET /metrics
+# Configuracion con variables de entorno:
+#   API_HOST / API_PORT (como servidor.py), ASYNC_HILOS (nucleos), ASYNC_MAX_EN_CURSO (4 x hilos),
+#   ASYNC_TIMEOUT (2 segundos), ASYNC_WORKERS (1 proceso)
+# Uso (desde la carpeta BackEnd): python api_async.py   o   uvicorn api_async:app --port 5000
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import API_RecomendacionesAnimes as api
+from metricas import Cronometro
+from servidor import HOST, PUERTO, INTERVALO_RECARGA, precargar_modelo
+
+HILOS = int(os.environ.get("ASYNC_HILOS", os.cpu_count() or 1)) # Hilos que puntuan
+MAX_EN_CURSO = int(os.environ.get("ASYNC_MAX_EN_CURSO", 4 * HILOS)) # Peticiones puntuando o esperando hilo, el resto 503
+TIMEOUT = float(os.environ.get("ASYNC_TIMEOUT", 2)) # Segundos maximos para leer el cuerpo y para puntuar
+WORKERS = int(os.environ.get("ASYNC_WORKERS", 1)) # Procesos de uvicorn (el modelo va con mmap, lo comparten)
+MAX_CUERPO = 1024 * 1024 # Bytes como maximo del JSON de entrada
+
+pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="puntuacion")
+en_curso = 0 # Peticiones admitidas que aun ocupan hueco (solo se toca desde el event loop, no necesita lock)
+rechazadas = 0
+caducadas = 0
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _ciclo_de_vida(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    ruta, metodo = scope["path"], scope["method"]
+    cabeceras = []
+    if ruta == "/recomendar" and metodo == "POST":
+        # Las etapas van a los mismos histogramas que la API de Flask (el tiempo en cola entra en el total)
+        crono = Cronometro()
+        codigo, cuerpo, cabeceras = await recomendar(receive, crono)
+        api.registrar_etapas("recomendar", crono)
+        api.metrica_peticion.observar(crono.total(), "recomendar", str(codigo))
+        if api.SERVER_TIMING:
+            cabeceras.append((b"server-timing", crono.server_timing().encode()))
+    elif ruta == "/metrics" and metodo == "GET":
+        codigo, cuerpo = 200, api.metricas.texto()
+    elif ruta == "/listo" and metodo == "GET":
+        codigo, cuerpo = _listo()
+    elif ruta == "/version" and metodo == "GET":
+        codigo, cuerpo = 200, {"version": api.vers}
+    else:
+        codigo, cuerpo = 404, {"error": "Ruta no encontrada"}
+    await _responder(send, codigo, cuerpo, cabeceras)
+
+
+async def recomendar(receive, crono):
+    # Devuelve (codigo, cuerpo, cabeceras extra)
+    global en_curso, rechazadas, caducadas
+    actual = api.modelo
+    if actual is None:
+        return 400, {"error": "El modelo no está entrenado. Llama primero a /entrenar"}, []
+
+    # Control de admision antes de leer nada: con el pool lleno se rechaza enseguida
+    # El hueco se ocupa desde aqui hasta que el hilo termina de verdad (aunque la peticion ya haya caducado),
+    # asi el pool nunca acumula mas de MAX_EN_CURSO trabajos
+    if en_curso >= MAX_EN_CURSO:
+        rechazadas += 1
+        return 503, {"error": "Servidor ocupado, vuelve a intentarlo"}, [(b"retry-after", b"1")]
+    en_curso += 1
+
+    try:
+        with crono.etapa("json"):
+            cuerpo = await asyncio.wait_for(_leer_cuerpo(receive), TIMEOUT)
+    except asyncio.TimeoutError:
+        en_curso -= 1
+        return 408, {"error": "El cuerpo de la peticion tardo demasiado"}, []
+    except ValueError as e:
+        en_curso -= 1
+        return 400, {"error": str(e)}, []
+
+    tarea = asyncio.get_running_loop().run_in_executor(pool, api.recomendar_perfil, actual, cuerpo, crono)
+    tarea.add_done_callback(_liberar)
+    try:
+        respuesta, codigo = await asyncio.wait_for(asyncio.shield(tarea), TIMEOUT)
+        return codigo, respuesta, []
+    except asyncio.TimeoutError:
+        caducadas += 1
+        return 504, {"error": f"La recomendacion tardo mas de {TIMEOUT} s"}, []
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return 500, {"error": f"Error generando recomendaciones: {str(e)}"}, []
+
+
+def _liberar(tarea):
+    global en_curso
+    en_curso -= 1
+
+
+def _listo():
+    actual = api.modelo
+    estado = {"pid": os.getpid(), "en_curso": en_curso, "max_en_curso": MAX_EN_CURSO, "rechazadas": rechazadas, "caducadas": caducadas}
+    if actual is None:
+        return 503, {"listo": False, **estado}
+    return 200, {"listo": True, "modelo": actual.version, "animes": len(actual.corrMatrix.columns), **estado}
+
+
+async def _leer_cuerpo(receive):
+    partes, total = [], 0
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "http.disconnect":
+            raise ValueError("El cliente cerro la conexion")
+        parte = mensaje.get("body", b"")
+        total += len(parte)
+        if total > MAX_CUERPO:
+            raise ValueError(f"El cuerpo no puede pasar de {MAX_CUERPO} bytes")
+        partes.append(parte)
+        if not mensaje.get("more_body", False):
+            break
+    try:
+        return json.loads(b"".join(partes))
+    except ValueError:
+        raise ValueError("El cuerpo debe ser un JSON valido")
+
+
+async def _responder(send, codigo, cuerpo, cabeceras=()):
+    # Los str se mandan tal cual como texto (/metrics), el resto como JSON
+    if isinstance(cuerpo, str):
+        datos, tipo = cuerpo.encode("utf-8"), b"text/plain; version=0.0.4"
+    else:
+        datos, tipo = json.dumps(cuerpo, default=_a_json).encode("utf-8"), b"application/json"
+    await send({
+        "type": "http.response.start",
+        "status": codigo,
+        "headers": [(b"content-type", tipo), (b"content-length", str(len(datos)).encode()), *cabeceras],
+    })
+    await send({"type": "http.response.body", "body": datos})
+
+
+def _a_json(valor):
+    # Escalares de numpy que puedan venir en la respuesta
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"No se puede convertir {type(valor).__name__} a JSON")
+
+
+async def _ciclo_de_vida(receive, send):
+    # Al arrancar se carga el modelo (fuera del event loop) y se vigila por si otro proceso lo reentrena
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            await asyncio.get_running_loop().run_in_executor(None, precargar_modelo)
+            api.vigilar_modelo(INTERVALO_RECARGA)
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+if __name__ == "__main__":
+    import uvicorn
+    print(f"\033[32m### Sirviendo (asincrono) en http://{HOST}:{PUERTO}\033[0m")
+    uvicorn.run("api_async:app", host=HOST, port=PUERTO, workers=WORKERS, log_level="warning")
@@ -0,0 +1,2 @@
+# Benchmarks de la API. Cada bench_*.py se lanza como script desde la carpeta BackEnd;
+# suite.py junta los principales sobre datos sinteticos (sintetico.py) y guarda los resultados por version
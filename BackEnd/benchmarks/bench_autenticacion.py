@@ -0,0 +1,125 @@
+# Logins por segundo (y por nucleo) del servicio de autenticacion (Comun/servicio_autenticacion.py)
+# frente al login de antes (comprobar_usuario + comprobar_login: dos consultas y bcrypt en el hilo que llama)
+# Para cada coste de bcrypt se mide primero el presupuesto: logins/s que da un nucleo solo con checkpw,
+# el techo de cualquier login; luego cada variante con --hilos clientes a la vez y --workers hilos de bcrypt
+# Tambien se comprueba el rehash: los usuarios se crean con un coste distinto y tras el primer login correcto
+# cada uno debe quedar guardado con el coste del servicio
+# Usa el mismo sustituto de MySQL que bench_logins.py (SQLite + --latencia ms por viaje)
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_autenticacion.py --costes 8 10 12 --workers 1 2 4 --segundos 3
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import bcrypt
+
+CARPETA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, CARPETA_BENCHMARKS)
+from bench_logins import ConexionSimulada, crear_base_simulada, medir, CONTRASENYA
+from Comun.DAO_Logins import DAO_Logins # bench_logins ya añade la raiz del proyecto al path
+from Comun.Usuario_Contrasenya import Usuario_Contrasenya
+from Comun.servicio_autenticacion import ServicioAutenticacion, COSTE_HASH
+
+
+class LoginAntes():
+    # El login de main.py antes del servicio: comprobar_usuario y luego comprobar_login (otra consulta + bcrypt)
+    def __init__(self, dao):
+        self.__dao = dao
+
+    def login(self, login):
+        return self.__dao.comprobar_usuario(login) and self.__dao.comprobar_login(login)
+
+
+class LoginServicio():
+    def __init__(self, servicio):
+        self.__servicio = servicio
+
+    def login(self, login):
+        return self.__servicio.iniciar_sesion(login)
+
+
+def presupuesto(coste, repeticiones=5):
+    # Logins/s de un nucleo haciendo solo bcrypt.checkpw con este coste
+    hash_ = bcrypt.hashpw(CONTRASENYA.encode(), bcrypt.gensalt(coste))
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        bcrypt.checkpw(CONTRASENYA.encode(), hash_)
+    return repeticiones / (time.perf_counter() - inicio)
+
+
+def costes_guardados(ruta):
+    db = sqlite3.connect(ruta)
+    costes = {int(COSTE_HASH.match(h).group(1)) for (h, ) in db.execute("SELECT contrasenya FROM usuario_contrasenyas")}
+    db.close()
+    return costes
+
+
+def comprobar_rehash(crear, ruta, usuarios, coste):
+    # Login de todos los usuarios con un servicio de otro coste: deben quedar todos con ese coste
+    dao = DAO_Logins("", "", crear_conexion=crear)
+    dao.conectar()
+    servicio = ServicioAutenticacion(dao, coste=coste)
+    correctos = sum(servicio.iniciar_sesion(Usuario_Contrasenya(f"usuario{i}", CONTRASENYA)) for i in range(usuarios))
+    servicio.cerrar() # Espera a los rehash pendientes
+    antes = servicio.rehashes
+    # Segunda vuelta: ya no debe rehacer ninguno
+    servicio = ServicioAutenticacion(dao, coste=coste)
+    correctos += sum(servicio.iniciar_sesion(Usuario_Contrasenya(f"usuario{i}", CONTRASENYA)) for i in range(usuarios))
+    falso = servicio.iniciar_sesion(Usuario_Contrasenya("no_existe", CONTRASENYA))
+    incorrecto = servicio.iniciar_sesion(Usuario_Contrasenya("usuario0", "otra"))
+    servicio.cerrar()
+    dao.close()
+    return correctos, antes, servicio.rehashes, costes_guardados(ruta), falso or incorrecto
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--costes", type=int, nargs="+", default=[8, 10, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--hilos", type=int, default=16, help="Clientes haciendo login a la vez")
+    parser.add_argument("--segundos", type=float, default=3)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--latencia", type=float, default=0.5, help="ms por viaje al servidor en el sustituto de MySQL")
+    args = parser.parse_args()
+
+    nucleos = os.cpu_count() or 1
+    print(f"{nucleos} nucleos | {args.hilos} clientes | sustituto de MySQL con {args.latencia} ms por viaje")
+    with tempfile.TemporaryDirectory() as carpeta:
+        for coste in args.costes:
+            ruta = os.path.join(carpeta, f"logins_{coste}.sqlite")
+            crear_base_simulada(ruta, args.usuarios, coste)
+            crear = lambda: ConexionSimulada(ruta, args.latencia / 1000)
+            techo = presupuesto(coste)
+            print(f"\ncoste {coste}: presupuesto {techo:.1f} logins/s por nucleo (solo checkpw)")
+            print(f"{'variante':>22} {'logins/s':>10} {'/s/nucleo':>10} {'del presupuesto':>16} {'fallos':>7}")
+
+            dao = DAO_Logins("", "", tam_pool=args.hilos, crear_conexion=crear)
+            dao.conectar()
+            variantes = [("antes (2 consultas)", LoginAntes(dao), nucleos)]
+            servicios = []
+            for workers in args.workers:
+                servicio = ServicioAutenticacion(dao, coste=coste, workers=workers)
+                servicios.append(servicio)
+                variantes.append((f"servicio {workers} workers", LoginServicio(servicio), min(workers, nucleos)))
+            for nombre, variante, usados in variantes:
+                por_segundo, fallos = medir(variante, "login", args.hilos, args.segundos, args.usuarios)
+                por_nucleo = por_segundo / usados
+                print(f"{nombre:>22} {por_segundo:10.1f} {por_nucleo:10.1f} {por_nucleo / techo:16.0%} {fallos:>7}")
+            for servicio in servicios:
+                servicio.cerrar()
+            dao.close()
+
+        # Rehash transparente: usuarios con coste 4 y servicio con coste 5
+        ruta = os.path.join(carpeta, "logins_rehash.sqlite")
+        usuarios = min(args.usuarios, 200)
+        crear_base_simulada(ruta, usuarios, 4)
+        correctos, primera, segunda, costes, alguno_falso = comprobar_rehash(lambda: ConexionSimulada(ruta, 0), ruta, usuarios, 5)
+        print(f"\nrehash 4 -> 5: {correctos}/{2 * usuarios} logins correctos | rehechos {primera} en la primera vuelta, "
+              f"{segunda} en la segunda | costes guardados {sorted(costes)} | "
+              f"usuario inexistente o contraseña mala aceptados: {alguno_falso}")
+
+
+if __name__ == "__main__":
+    main()
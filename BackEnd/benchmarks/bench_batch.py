@@ -0,0 +1,69 @@
+# Rendimiento de /recomendar/batch frente a llamar a /recomendar una vez por usuario
+# Usa una matriz sintetica publicada en la API y el cliente de pruebas de Flask (sin red, asi que el bucle
+# por usuario sale incluso mejor parado que por HTTP real). Tambien compara el motor solo: puntuar vs puntuar_lote
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_batch.py --animes 3000 --usuarios 2000 --perfil 20
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import API_RecomendacionesAnimes as api
+from modelo import Modelo
+from bench_recomendar import corr_sintetica
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--animes", type=int, default=3000)
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--perfil", type=int, default=20)
+    args = parser.parse_args()
+
+    corrMatrix = corr_sintetica(args.animes)
+    ids = np.asarray(corrMatrix.columns, dtype=np.int64)
+    anime = pd.DataFrame({"anime_id": ids, "name": [f"Anime {aid}" for aid in ids]})
+    api.publicar_modelo(Modelo(corrMatrix, anime))
+    motor = api.modelo.motor
+    cliente = api.app.test_client()
+
+    rng = np.random.default_rng(1)
+    perfiles = [
+        {str(aid): int(rng.integers(1, 11)) for aid in rng.choice(ids, args.perfil, replace=False)}
+        for _ in range(args.usuarios)
+    ]
+    print(f"animes={args.animes} usuarios={args.usuarios} perfil={args.perfil}")
+
+    # Motor solo
+    perfiles_motor = [{int(aid): valor for aid, valor in p.items()} for p in perfiles]
+    inicio = time.perf_counter()
+    uno_a_uno = [motor.puntuar(p) for p in perfiles_motor]
+    t_uno = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    lote = motor.puntuar_lote(perfiles_motor)
+    t_lote = time.perf_counter() - inicio
+    iguales = all([a for a, _ in x] == [a for a, _ in y] for x, y in zip(uno_a_uno, lote))
+    print(f"motor puntuar:       {args.usuarios / t_uno:9.0f} usuarios/s")
+    print(f"motor puntuar_lote:  {args.usuarios / t_lote:9.0f} usuarios/s ({t_uno / t_lote:.1f}x) | mismos top 10: {iguales}")
+
+    # Endpoints completos (JSON de entrada y salida incluidos)
+    inicio = time.perf_counter()
+    for p in perfiles:
+        respuesta = cliente.post("/recomendar", json=p)
+        assert respuesta.status_code == 200, respuesta.json
+    t_bucle = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    respuesta = cliente.post("/recomendar/batch", json=perfiles)
+    t_batch = time.perf_counter() - inicio
+    assert respuesta.status_code == 200, respuesta.json
+
+    print(f"bucle /recomendar:   {args.usuarios / t_bucle:9.0f} usuarios/s")
+    print(f"/recomendar/batch:   {args.usuarios / t_batch:9.0f} usuarios/s ({t_bucle / t_batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Busqueda por nombre de /animes/buscar (busqueda.py): cuanto tarda construir el indice y cada consulta,
+# frente a recorrer la tabla con anime['name'].str.contains como se haria sin indice
+# Consultas de cuatro tipos sacadas de nombres reales de anime.csv: prefijo (las primeras letras del nombre),
+# palabra (el principio de una palabra del medio), erratas (el nombre con una o dos letras cambiadas, quitadas
+# o repetidas) y ausente (texto que no esta en ningun nombre). Para cada tipo: p50/p99 en microsegundos y fraccion
+# de consultas en las que el anime del que salio la consulta esta entre los resultados
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_busqueda.py --animes 3000 --consultas 2000
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+import numpy as np
+
+CARPETA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(CARPETA_BENCHMARKS))
+from catalogo import Catalogo
+from busqueda import BUSQUEDA_N
+
+
+def con_erratas(nombre, rng, erratas):
+    letras = list(nombre)
+    for _ in range(erratas):
+        i = rng.randrange(len(letras))
+        cambio = rng.choice(("cambiar", "quitar", "repetir"))
+        if cambio == "cambiar":
+            letras[i] = rng.choice(string.ascii_lowercase)
+        elif cambio == "quitar" and len(letras) > 4:
+            del letras[i]
+        else:
+            letras.insert(i, letras[i])
+    return "".join(letras)
+
+
+def consultas(catalogo, cantidad, semilla):
+    # {tipo: [(consulta, anime_id esperado o None)]}
+    rng = random.Random(semilla)
+    posiciones = catalogo.disponibles.tolist()
+    tipos = {"prefijo": [], "palabra": [], "erratas": [], "ausente": []}
+    while min(len(lista) for lista in tipos.values()) < cantidad:
+        pos = rng.choice(posiciones)
+        nombre, anime_id = catalogo.nombres[pos], int(catalogo.ids[pos])
+        palabras = nombre.split()
+        tipos["prefijo"].append((nombre[:rng.randint(2, 8)], anime_id))
+        if len(palabras) > 1:
+            palabra = rng.choice(palabras[1:])
+            tipos["palabra"].append((palabra[:max(3, len(palabra) // 2)], anime_id))
+        if len(nombre) >= 8:
+            tipos["erratas"].append((con_erratas(nombre[:24], rng, rng.randint(1, 2)), anime_id))
+        tipos["ausente"].append(("".join(rng.choice("qxzjkvw") for _ in range(rng.randint(4, 10))), None))
+    return {tipo: lista[:cantidad] for tipo, lista in tipos.items()}
+
+
+def medir(buscar, lista):
+    # (tiempos en segundos, fraccion de consultas con el anime esperado entre los resultados)
+    tiempos, encontrados = np.empty(len(lista)), 0
+    for i, (consulta, esperado) in enumerate(lista):
+        inicio = time.perf_counter()
+        resultados = buscar(consulta)
+        tiempos[i] = time.perf_counter() - inicio
+        encontrados += esperado is None or esperado in resultados
+    return tiempos, encontrados / len(lista)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--animes", type=int, default=None, help="Solo los N animes con mas miembros (como las columnas de corrMatrix); por defecto todos")
+    parser.add_argument("--consultas", type=int, default=2000, help="Consultas por tipo")
+    parser.add_argument("--n", type=int, default=BUSQUEDA_N)
+    parser.add_argument("--sin-recorrido", action="store_true", help="No medir str.contains (es lento)")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    from API_RecomendacionesAnimes import cargar_anime
+    anime = cargar_anime(os.path.join(os.path.dirname(CARPETA_BENCHMARKS), "anime.csv"))
+    anime = anime.sort_values("members", ascending=False)
+    if args.animes:
+        anime = anime.head(args.animes)
+
+    inicio = time.perf_counter()
+    catalogo = Catalogo(anime, anime["anime_id"].unique())
+    print(f"{len(catalogo)} animes | catalogo + indice en {time.perf_counter() - inicio:.3f} s | {catalogo.busqueda}")
+
+    nombres = anime.drop_duplicates("anime_id")[["anime_id", "name"]]
+
+    def recorrido(consulta):
+        # Lo que habria que hacer sin indice: recorrer todos los nombres (y aun asi no encuentra erratas)
+        encontrados = nombres[nombres["name"].str.contains(consulta, case=False, regex=False)]
+        return encontrados["anime_id"].head(args.n).tolist()
+
+    def indice(consulta):
+        return [r["anime_id"] for r in catalogo.buscar(consulta, args.n)]
+
+    print(f"{'consulta':>9} {'indice p50':>11} {'p99':>8} {'encontrado':>11} {'contains p50':>13} {'encontrado':>11} {'x':>6}")
+    for tipo, lista in consultas(catalogo, args.consultas, args.semilla).items():
+        t_indice, e_indice = medir(indice, lista)
+        fila = f"{tipo:>9} {np.median(t_indice) * 1e6:9.0f}us {np.percentile(t_indice, 99) * 1e6:6.0f}us {e_indice:11.1%}"
+        if not args.sin_recorrido:
+            t_recorrido, e_recorrido = medir(recorrido, lista[:200])
+            fila += f" {np.median(t_recorrido) * 1e6:11.0f}us {e_recorrido:11.1%} {np.median(t_recorrido) / np.median(t_indice):5.0f}x"
+        print(fila)
+
+
+if __name__ == "__main__":
+    main()
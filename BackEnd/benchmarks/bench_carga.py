@@ -0,0 +1,98 @@
+# Prueba de carga contra la API ya arrancada (python servidor.py o flask run): latencias p50/p90/p99 y peticiones/s
+# Cada hilo cliente abre su propia conexion keep-alive y manda perfiles aleatorios con animes del modelo
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_carga.py --url http://127.0.0.1:5000 --clientes 16 --segundos 20
+import argparse
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+def percentil(latencias, p):
+    return float(np.percentile(latencias, p)) * 1000 if latencias else float("nan")
+
+
+def cliente(url, endpoint, perfiles, fin, latencias, errores, semilla):
+    partes = urlsplit(url)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+    rng = np.random.default_rng(semilla)
+    cabeceras = {"Content-Type": "application/json"}
+    while time.perf_counter() < fin:
+        if endpoint == "animes":
+            metodo, ruta, cuerpo = "GET", "/animes", None
+        else:
+            metodo, ruta, cuerpo = "POST", "/recomendar", json.dumps(perfiles[rng.integers(len(perfiles))])
+        inicio = time.perf_counter()
+        try:
+            conexion.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+            respuesta = conexion.getresponse()
+            respuesta.read()
+            if respuesta.status == 200:
+                latencias.append(time.perf_counter() - inicio)
+            else:
+                errores.append(respuesta.status)
+        except (OSError, http.client.HTTPException) as e:
+            errores.append(type(e).__name__)
+            conexion.close()
+            conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+    conexion.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--endpoint", choices=["recomendar", "animes"], default="recomendar")
+    parser.add_argument("--clientes", type=int, default=16)
+    parser.add_argument("--segundos", type=float, default=20)
+    parser.add_argument("--perfil", type=int, default=10, help="Animes por perfil")
+    parser.add_argument("--perfiles", type=int, default=1000, help="Perfiles distintos (menos perfiles = mas aciertos de cache)")
+    parser.add_argument("--url-animes", help="API de donde sacar los anime_id para los perfiles (por defecto --url)")
+    args = parser.parse_args()
+
+    partes = urlsplit(args.url)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+    conexion.request("GET", "/listo")
+    respuesta = conexion.getresponse()
+    estado = json.loads(respuesta.read())
+    if respuesta.status != 200:
+        raise SystemExit(f"La API no esta lista: {estado}")
+    conexion.close()
+
+    # api_async.py solo tiene /recomendar: los ids se pueden pedir a la API de Flask con --url-animes
+    partes = urlsplit(args.url_animes or args.url)
+    conexion = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+    conexion.request("GET", "/animes?n=1000&seed=0")
+    ids = [aid for aid, _ in json.loads(conexion.getresponse().read())["animes"]]
+    conexion.close()
+
+    rng = np.random.default_rng(0)
+    perfiles = [
+        {str(aid): int(rng.integers(1, 11)) for aid in rng.choice(ids, min(args.perfil, len(ids)), replace=False)}
+        for _ in range(args.perfiles)
+    ]
+
+    latencias, errores = [], []
+    fin = time.perf_counter() + args.segundos
+    hilos = [
+        threading.Thread(target=cliente, args=(args.url, args.endpoint, perfiles, fin, latencias, errores, i))
+        for i in range(args.clientes)
+    ]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+
+    print(f"modelo {estado['modelo']} ({estado['animes']} animes) | /{args.endpoint} | {args.clientes} clientes, {duracion:.1f} s")
+    # Los 503 de api_async.py son rechazos del control de admision, no fallos del servidor
+    print(f"peticiones: {len(latencias)} correctas, {len(errores)} errores {dict(Counter(errores))} | {len(latencias) / duracion:.1f} peticiones/s")
+    print(f"latencia: p50 {percentil(latencias, 50):.2f} ms | p90 {percentil(latencias, 90):.2f} ms | p99 {percentil(latencias, 99):.2f} ms | max {percentil(latencias, 100):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
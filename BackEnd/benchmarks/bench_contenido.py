@@ -0,0 +1,103 @@
+# Puntuacion por contenido de los animes que no estan en corrMatrix (contenido.py)
+# Cuanto cuesta construir el indice de vecinos por contenido de todos los animes de anime.csv y cuanto ocupa,
+# y la latencia de recomendar_perfil (sin cache) en tres casos: perfiles normales (todos los animes en corrMatrix)
+# con y sin el indice cargado, para comprobar que el camino de siempre no se entera; perfiles solo con animes
+# fuera de corrMatrix (antes respondian 400) y perfiles mezclados
+# La corrMatrix sale de entrenar con ratings sinteticos; anime.csv es el de verdad
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_contenido.py --usuarios 50000 --animes 2000 --densidad 0.02
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CARPETA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(CARPETA_BENCHMARKS))
+import API_RecomendacionesAnimes as api
+from cache_resultados import CacheResultados
+from contenido import construir_indice_contenido, CONTENIDO_K
+from entrenamiento import entrenar_sparse
+from modelo import Modelo
+from sintetico import escribir_rating_csv, anime_ids_por_popularidad
+
+
+def latencias(modelos, perfiles, repeticiones):
+    # Mejor de varias pasadas de la latencia de cada perfil con cada modelo, en segundos
+    # Los modelos se alternan perfil a perfil para que los dos sufran igual el ruido de la maquina
+    mejores = np.full((len(modelos), len(perfiles)), np.inf)
+    for _ in range(repeticiones):
+        for i, perfil in enumerate(perfiles):
+            for m, modelo in enumerate(modelos):
+                inicio = time.perf_counter()
+                respuesta, codigo = api.recomendar_perfil(modelo, perfil)
+                mejores[m, i] = min(mejores[m, i], time.perf_counter() - inicio)
+                if codigo != 200:
+                    raise SystemExit(f"El perfil {perfil} respondio {codigo}: {respuesta}")
+    return mejores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=50000)
+    parser.add_argument("--animes", type=int, default=2000)
+    parser.add_argument("--densidad", type=float, default=0.02)
+    parser.add_argument("--min-ratings", type=int, default=300)
+    parser.add_argument("--min-periods", type=int, default=250)
+    parser.add_argument("--k", type=int, default=CONTENIDO_K)
+    parser.add_argument("--perfil", type=int, default=20)
+    parser.add_argument("--perfiles", type=int, default=300)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    anime = api.cargar_anime(os.path.join(os.path.dirname(CARPETA_BENCHMARKS), "anime.csv"))
+    with tempfile.TemporaryDirectory() as carpeta:
+        ratings_file = os.path.join(carpeta, "rating.csv")
+        escribir_rating_csv(ratings_file, args.usuarios, args.animes, args.densidad)
+        corrMatrix, informe = entrenar_sparse(ratings_file, anime_ids_por_popularidad(), args.min_ratings, args.min_periods)
+
+    inicio = time.perf_counter()
+    contenido = construir_indice_contenido(anime, corrMatrix.columns, args.k)
+    segundos = time.perf_counter() - inicio
+    megas = sum(a.nbytes for a in contenido) / 2**20
+    print(f"corrMatrix {informe['animes']} animes | indice por contenido de {len(contenido[0])} animes (k={args.k}) "
+          f"en {segundos:.2f} s, {megas:.1f} MB")
+
+    api.cache = CacheResultados(0) # Sin cache: se mide la puntuacion de verdad
+    con = Modelo(corrMatrix, anime, contenido=contenido)
+    sin = Modelo(corrMatrix, anime)
+
+    rng = np.random.default_rng(1)
+    columnas = np.asarray(corrMatrix.columns)
+    frios = np.setdiff1d(contenido[0], columnas)
+    tam = min(args.perfil, len(columnas))
+
+    def perfiles(de_modelo, fuera):
+        return [
+            {str(aid): int(rng.integers(1, 11)) for aid in np.concatenate([
+                rng.choice(columnas, de_modelo, replace=False), rng.choice(frios, fuera, replace=False)
+            ])}
+            for _ in range(args.perfiles)
+        ]
+
+    normales = perfiles(tam, 0)
+    casos = [
+        (("normal, sin indice", "normal, con indice"), (sin, con), normales),
+        (("solo fuera del modelo",), (con,), perfiles(0, tam)),
+        (("mezcla (mitad y mitad)",), (con,), perfiles(tam // 2, tam - tam // 2)),
+    ]
+    for _, modelos, lista in casos: # Calentamiento, para que el primer caso no pague las caches frias
+        latencias(modelos, lista, 1)
+    print(f"{'perfil':>24} {'p50':>9} {'p90':>9} {'p99':>9}")
+    resultados = {}
+    for nombres, modelos, lista in casos:
+        for nombre, t in zip(nombres, latencias(modelos, lista, args.repeticiones)):
+            resultados[nombre] = t
+            print(f"{nombre:>24} {np.median(t) * 1e6:7.0f}us {np.percentile(t, 90) * 1e6:7.0f}us {np.percentile(t, 99) * 1e6:7.0f}us")
+    diferencia = np.median(resultados["normal, con indice"]) / np.median(resultados["normal, sin indice"]) - 1
+    print(f"Camino normal con el indice cargado: {diferencia:+.1%} en p50")
+
+
+if __name__ == "__main__":
+    main()
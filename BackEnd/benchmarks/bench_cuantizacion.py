@@ -0,0 +1,88 @@
+# corrMatrix en float32 frente a los formatos compactos (float16, int8 con escala por columna, disperso con |r| >= umbral)
+# Para cada formato: bytes de la matriz que se sirve, latencia de puntuar, perfiles/s de puntuar_lote
+# y cuanto se parece el top 10 al de float32 (fraccion de animes en comun y perfiles con el mismo top en el mismo orden)
+# La corrMatrix sale de entrenar de verdad con ratings sinteticos, asi tiene los NaN y la forma de una real
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_cuantizacion.py --usuarios 50000 --animes 2000 --densidad 0.02
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CARPETA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(CARPETA_BENCHMARKS))
+from entrenamiento import entrenar_sparse
+from motor_recomendacion import compactar_corr, crear_motor, FORMATOS_CORR, UMBRAL_DISPERSO
+from sintetico import escribir_rating_csv, anime_ids_por_popularidad
+
+
+def medir(funcion, repeticiones=3):
+    # Mejor de varias pasadas, en segundos
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def parecido(tops, referencia):
+    # (media de |top ∩ top de referencia| / |top de referencia|, fraccion de perfiles con exactamente el mismo top)
+    comun = [len({a for a, _ in t} & {a for a, _ in r}) / max(len(r), 1) for t, r in zip(tops, referencia)]
+    iguales = [[a for a, _ in t] == [a for a, _ in r] for t, r in zip(tops, referencia)]
+    return float(np.mean(comun)), float(np.mean(iguales))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=50000)
+    parser.add_argument("--animes", type=int, default=2000)
+    parser.add_argument("--densidad", type=float, default=0.02)
+    parser.add_argument("--min-ratings", type=int, default=300)
+    parser.add_argument("--min-periods", type=int, default=250)
+    parser.add_argument("--umbral", type=float, nargs="+", default=[UMBRAL_DISPERSO, 0.1, 0.2], help="Umbrales del formato disperso")
+    parser.add_argument("--perfil", type=int, default=20)
+    parser.add_argument("--perfiles", type=int, default=500)
+    args = parser.parse_args()
+
+    anime_ids = anime_ids_por_popularidad()
+    with tempfile.TemporaryDirectory() as carpeta:
+        ratings_file = os.path.join(carpeta, "rating.csv")
+        escribir_rating_csv(ratings_file, args.usuarios, args.animes, args.densidad)
+        corrMatrix, informe = entrenar_sparse(ratings_file, anime_ids, args.min_ratings, args.min_periods)
+    corr = corrMatrix.to_numpy()
+    validos = np.count_nonzero(~np.isnan(corr)) / corr.size
+    print(f"{informe['animes']} animes, {informe['usuarios']} usuarios | pares validos {validos:.1%} | entrenamiento {informe['segundos']} s")
+
+    rng = np.random.default_rng(1)
+    ids = np.asarray(corrMatrix.columns)
+    perfiles = [
+        {int(aid): int(rng.integers(1, 11)) for aid in rng.choice(ids, min(args.perfil, len(ids)), replace=False)}
+        for _ in range(args.perfiles)
+    ]
+
+    variantes = [(formato, None) for formato in FORMATOS_CORR if formato != "disperso"]
+    variantes += [("disperso", umbral) for umbral in args.umbral]
+    referencia = None
+    print(f"{'formato':>16} {'MB':>8} {'compactar':>10} {'puntuar':>10} {'lote':>12} {'top10 comun':>12} {'mismo top':>10}")
+    for formato, umbral in variantes:
+        inicio = time.perf_counter()
+        compacta = compactar_corr(corr, formato, UMBRAL_DISPERSO if umbral is None else umbral)
+        segundos_compactar = time.perf_counter() - inicio
+        motor = crear_motor(corrMatrix, formato, compacta)
+        megas = (sum(a.nbytes for a in compacta.values()) if compacta else motor.matriz.nbytes) / 2**20
+
+        t_puntuar, tops = medir(lambda: [motor.puntuar(perfil) for perfil in perfiles])
+        t_lote, _ = medir(lambda: motor.puntuar_lote(perfiles))
+        if referencia is None:
+            referencia = tops
+        comun, iguales = parecido(tops, referencia)
+        nombre = formato if umbral is None else f"disperso >={umbral}"
+        print(f"{nombre:>16} {megas:8.1f} {segundos_compactar:9.2f}s {t_puntuar / len(perfiles) * 1000:8.3f}ms "
+              f"{len(perfiles) / t_lote:8.0f} p/s {comun:12.1%} {iguales:10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Compara el entrenamiento original (pivot denso + corr) con el modo disperso por chunks
+# Cada modo corre en su propio proceso para que el pico de RSS sea el de ese modo y no el del otro
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_entrenamiento.py --ratings rating.csv
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CARPETA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARPETA_BACKEND)
+
+
+def entrenar_un_modo(modo, anime_file, ratings_file, salida):
+    from API_RecomendacionesAnimes import cargar_anime, entrenar_pivot
+    from entrenamiento import entrenar_sparse
+
+    anime = cargar_anime(anime_file)
+    if modo == "sparse":
+        corrMatrix, informe = entrenar_sparse(ratings_file, anime['anime_id'].to_numpy())
+    else:
+        corrMatrix, informe = entrenar_pivot(ratings_file, anime)
+
+    corrMatrix.to_pickle(salida)
+    print(json.dumps(informe))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--anime", default=os.path.join(CARPETA_BACKEND, "anime.csv"))
+    parser.add_argument("--ratings", default=os.path.join(CARPETA_BACKEND, "rating.csv"))
+    parser.add_argument("--tolerancia", type=float, default=1e-5)
+    parser.add_argument("--solo", choices=["sparse", "pivot"], help=argparse.SUPPRESS)
+    parser.add_argument("--salida", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo:
+        entrenar_un_modo(args.solo, args.anime, args.ratings, args.salida)
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        informes, matrices = {}, {}
+        for modo in ("pivot", "sparse"):
+            salida = os.path.join(carpeta, f"{modo}.pkl")
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--solo", modo, "--anime", args.anime, "--ratings", args.ratings, "--salida", salida],
+                capture_output=True, text=True, check=True
+            )
+            informes[modo] = json.loads(proceso.stdout.strip().splitlines()[-1])
+            matrices[modo] = pd.read_pickle(salida)
+
+    pivot, disperso = matrices["pivot"], matrices["sparse"]
+    ids = [int(c) for c in pivot.columns]
+    mismos_ids = ids == [int(c) for c in disperso.columns]
+    iguales = mismos_ids and np.allclose(pivot.to_numpy(), disperso.to_numpy(), atol=args.tolerancia, equal_nan=True)
+
+    for modo, informe in informes.items():
+        print(f"{modo:>6}: {informe['segundos']:.3f} s | pico RSS {informe['pico_rss_mb']} MB | {informe['usuarios']} usuarios x {informe['animes']} animes")
+    print(f"mismos animes: {mismos_ids} | corrMatrix igual (atol={args.tolerancia}): {iguales}")
+
+
+if __name__ == "__main__":
+    main()
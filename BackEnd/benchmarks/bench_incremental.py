@@ -0,0 +1,86 @@
+# Actualizacion incremental frente a reentrenar desde cero con los mismos datos
+# Entrena con un rating.csv sintetico, añade un lote de ratings nuevos (usuarios existentes, usuarios nuevos
+# y un anime que cruza el umbral de popularidad) y comprueba que corrMatrix sale identica a un reentrenamiento
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_incremental.py --usuarios 8000 --lote 500 [--similitud coseno_ajustado]
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from entrenamiento import entrenar_sparse, MIN_RATINGS_ANIME, SIMILITUDES
+from actualizacion_incremental import actualizar_con_ratings
+
+
+def ratings_sinteticos(n_usuarios, n_animes, por_usuario, rng):
+    usuarios = np.repeat(np.arange(1, n_usuarios + 1), por_usuario)
+    animes = np.concatenate([rng.choice(n_animes, por_usuario, replace=False) for _ in range(n_usuarios)]) + 1
+    valores = rng.integers(1, 11, len(usuarios))
+    valores[rng.random(len(usuarios)) < 0.05] = -1
+    return pd.DataFrame({"user_id": usuarios, "anime_id": animes, "rating": valores})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=8000)
+    parser.add_argument("--animes", type=int, default=150)
+    parser.add_argument("--por-usuario", type=int, default=40)
+    parser.add_argument("--lote", type=int, default=500)
+    parser.add_argument("--similitud", choices=SIMILITUDES, default="pearson")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = ratings_sinteticos(args.usuarios, args.animes, args.por_usuario, rng)
+
+    # Un anime justo en el umbral de popularidad, que el lote hara cruzar
+    frontera = args.animes + 1
+    base = pd.concat([base, pd.DataFrame({
+        "user_id": rng.choice(args.usuarios, MIN_RATINGS_ANIME, replace=False) + 1,
+        "anime_id": frontera,
+        "rating": rng.integers(1, 11, MIN_RATINGS_ANIME),
+    })])
+    anime_ids = np.arange(1, args.animes + 2)
+
+    # Lote: usuarios existentes y nuevos, algun repetido y algun -1
+    lote = pd.DataFrame({
+        "user_id": rng.integers(1, args.usuarios + 50, args.lote),
+        "anime_id": rng.integers(1, args.animes + 1, args.lote),
+        "rating": rng.integers(1, 11, args.lote),
+    })
+    lote.iloc[: args.lote // 10, 1] = frontera
+    lote.iloc[-1, 2] = -1
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ratings_file = os.path.join(carpeta, "rating.csv")
+        cache = os.path.join(carpeta, "cache_ratings.npz")
+        estadisticas = os.path.join(carpeta, "estadisticas")
+        base.to_csv(ratings_file, index=False)
+
+        corr_base, _ = entrenar_sparse(ratings_file, anime_ids, workers=1, ruta_cache=cache, carpeta_estadisticas=estadisticas, similitud=args.similitud)
+
+        inicio = time.perf_counter()
+        corr_inc, informe = actualizar_con_ratings(
+            estadisticas, corr_base, cache, ratings_file, anime_ids,
+            lote["user_id"].to_numpy(), lote["anime_id"].to_numpy(), lote["rating"].to_numpy()
+        )
+        t_inc = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        corr_total, _ = entrenar_sparse(ratings_file, anime_ids, workers=1, similitud=args.similitud)
+        t_total = time.perf_counter() - inicio
+
+    mismos_ids = list(corr_inc.columns) == list(corr_total.columns)
+    identica = mismos_ids and np.array_equal(corr_inc.to_numpy().view(np.uint32), corr_total.to_numpy().view(np.uint32))
+
+    print(f"animes en el modelo: {len(corr_base.columns)} -> {len(corr_inc.columns)} (nuevos: {informe['animes_nuevos_en_modelo']})")
+    print(f"incremental: {t_inc:.3f} s ({informe['animes_recalculados']} animes recalculados, {informe['usuarios_afectados']} usuarios)")
+    print(f"reentrenar:  {t_total:.3f} s")
+    print(f"corrMatrix identica bit a bit: {identica}")
+
+
+if __name__ == "__main__":
+    main()
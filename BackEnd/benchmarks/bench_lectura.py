@@ -0,0 +1,101 @@
+# Lectura de rating.csv: pipeline original de pandas (read_csv sin tipos + filtro + dropna + rename + merge + category)
+# frente al lector por chunks con tipos compactos, y frente a cargar la cache binaria que este deja
+# Cada caso corre en su propio proceso para que el pico de RSS sea solo el suyo
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_lectura.py --ratings rating.csv
+#                             o con un CSV sintetico: python benchmarks/bench_lectura.py --sintetico 7800000
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+CARPETA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARPETA_BACKEND)
+
+CASOS = ("pandas", "chunks", "cache")
+
+
+def leer_un_caso(caso, anime_file, ratings_file, cache):
+    from API_RecomendacionesAnimes import cargar_anime
+    from entrenamiento import cargar_ratings, pico_rss_mb
+
+    anime = cargar_anime(anime_file)
+    inicio = time.perf_counter()
+
+    if caso == "pandas":
+        # Los mismos pasos que entrenar_pivot hasta tener los ratings limpios
+        ratings = pd.read_csv(ratings_file, names=['user_id', 'anime_id', 'rating'], header=0, encoding="utf-8")
+        ratings = ratings[ratings['rating'] != -1]
+        ratings = ratings.dropna(subset=['user_id', 'anime_id', 'rating'])
+        ratings = ratings.rename(columns={"rating": "user_rating"})
+        ratings = ratings.merge(anime[['anime_id', 'name']], on='anime_id', how='inner')
+        ratings['anime_id'] = ratings['anime_id'].astype('category')
+        ratings['user_id'] = ratings['user_id'].astype('category')
+        filas, bytes_datos = len(ratings), int(ratings.memory_usage(deep=True).sum())
+    else:
+        # "chunks" lee el CSV y escribe la cache, "cache" la encuentra ya hecha
+        usuarios, animes, valores, desde_cache = cargar_ratings(ratings_file, cache, anime_ids_validos=anime['anime_id'].to_numpy())
+        assert desde_cache == (caso == "cache")
+        filas, bytes_datos = len(valores), usuarios.nbytes + animes.nbytes + valores.nbytes
+
+    print(json.dumps({
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "pico_rss_mb": pico_rss_mb(),
+        "filas": filas,
+        "mb_datos": round(bytes_datos / (1024 * 1024), 1),
+    }))
+
+
+def csv_sintetico(ruta, filas, anime_ids, semilla=0):
+    # Mismas columnas y rangos que rating.csv (~8% de -1), escrito por trozos
+    rng = np.random.default_rng(semilla)
+    usuarios = np.sort(rng.integers(1, 73517, filas))
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write("user_id,anime_id,rating\n")
+        for inicio in range(0, filas, 1_000_000):
+            n = min(1_000_000, filas - inicio)
+            valores = rng.integers(1, 11, n)
+            valores[rng.random(n) < 0.08] = -1
+            pd.DataFrame({
+                "user_id": usuarios[inicio:inicio + n], "anime_id": rng.choice(anime_ids, n), "rating": valores
+            }).to_csv(f, header=False, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--anime", default=os.path.join(CARPETA_BACKEND, "anime.csv"))
+    parser.add_argument("--ratings", default=os.path.join(CARPETA_BACKEND, "rating.csv"))
+    parser.add_argument("--sintetico", type=int, help="Filas de un rating.csv sintetico en vez de --ratings")
+    parser.add_argument("--solo", choices=CASOS, help=argparse.SUPPRESS)
+    parser.add_argument("--cache", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo:
+        leer_un_caso(args.solo, args.anime, args.ratings, args.cache)
+        return
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ratings_file = args.ratings
+        if args.sintetico:
+            ratings_file = os.path.join(carpeta, "rating.csv")
+            anime_ids = pd.read_csv(args.anime, usecols=[0]).iloc[:, 0].to_numpy()
+            csv_sintetico(ratings_file, args.sintetico, anime_ids)
+        cache = os.path.join(carpeta, "cache_ratings.npz")
+
+        print(f"{ratings_file}: {os.path.getsize(ratings_file) / (1024 * 1024):.0f} MB")
+        for caso in CASOS:
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--solo", caso, "--anime", args.anime, "--ratings", ratings_file, "--cache", cache],
+                capture_output=True, text=True, check=True
+            )
+            informe = json.loads(proceso.stdout.strip().splitlines()[-1])
+            print(f"{caso:>6}: {informe['segundos']:.3f} s | pico RSS {informe['pico_rss_mb']} MB | {informe['filas']} ratings en {informe['mb_datos']} MB")
+
+
+if __name__ == "__main__":
+    main()
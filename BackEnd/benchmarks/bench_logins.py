@@ -0,0 +1,195 @@
+# Concurrencia del DAO de logins (Comun/DAO_Logins.py): comprobaciones por segundo con 1 a 64 hilos a la vez,
+# con el DAO con pool frente a una sola conexion y un solo cursor compartidos (lo de antes, con un lock para poder
+# usarlo desde varios hilos). Se mide comprobar_usuario (solo la consulta) y comprobar_login (consulta + bcrypt)
+# Sin --mysql-host se usa un sustituto local de MySQL: SQLite detras de la misma interfaz que mysql.connector
+# (cursor preparado, %s, ping, commit...) y una espera de --latencia ms por cada viaje al servidor, como la red
+# Con --caidas se corta al azar esa fraccion de consultas para ver que el DAO se reconecta solo
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_logins.py --hilos 1 2 4 8 16 32 64 --segundos 3
+#   o contra un MySQL de verdad con la tabla usuario_contrasenyas: --mysql-host localhost --mysql-user root --mysql-password ...
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import bcrypt
+from mysql.connector import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))) # Raiz, por Comun
+from Comun.DAO_Logins import DAO_Logins
+from Comun.Usuario_Contrasenya import Usuario_Contrasenya
+
+CONTRASENYA = "Prueba#123"
+
+
+class ConexionSimulada():
+    # Lo que usa DAO_Logins de una conexion de mysql.connector, sobre un archivo SQLite
+    # Cada viaje al servidor (consulta, ping) espera `latencia` segundos; abrir la conexion cuesta 3 viajes (handshake)
+    def __init__(self, ruta, latencia=0.0005, caidas=0.0):
+        self.latencia = latencia
+        self.caidas = caidas
+        self.__viva = True
+        self._viaje(3)
+        self.__db = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+
+    def _viaje(self, veces=1):
+        if not self.__viva:
+            raise OperationalError("Lost connection to MySQL server during query")
+        time.sleep(self.latencia * veces)
+        if self.caidas and random.random() < self.caidas:
+            self.__viva = False
+            raise OperationalError("Lost connection to MySQL server during query")
+
+    def _ejecutar(self, sql, valores):
+        return self.__db.execute(sql.replace("%s", "?"), tuple(valores))
+
+    def cursor(self, prepared=False):
+        return CursorSimulado(self)
+
+    def is_connected(self):
+        return self.__viva
+
+    def ping(self, reconnect=False):
+        self._viaje()
+
+    def commit(self):
+        pass # Autocommit, como las conexiones del DAO
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.__viva = False
+        self.__db.close()
+
+
+class CursorSimulado():
+    def __init__(self, conexion):
+        self.__conexion = conexion
+        self.__filas = []
+        self.rowcount = -1
+
+    def execute(self, sql, valores=()):
+        self.__conexion._viaje()
+        resultado = self.__conexion._ejecutar(sql, valores)
+        self.__filas = resultado.fetchall()
+        self.rowcount = resultado.rowcount
+
+    def fetchone(self):
+        return self.__filas.pop(0) if self.__filas else None
+
+    def fetchall(self):
+        filas, self.__filas = self.__filas, []
+        return filas
+
+    def close(self):
+        pass
+
+
+class DAOCompartido():
+    # Lo de antes: una conexion y un cursor para todo; sin el lock dos hilos se mezclarian los resultados
+    def __init__(self, crear_conexion):
+        self.__conexion = crear_conexion()
+        self.__cursor = self.__conexion.cursor()
+        self.__lock = threading.Lock()
+
+    def comprobar_usuario(self, login):
+        with self.__lock:
+            self.__cursor.execute("SELECT usuario FROM usuario_contrasenyas WHERE usuario = %s", (login.get_usuario(), ))
+            return self.__cursor.fetchone() is not None
+
+    def comprobar_login(self, login):
+        with self.__lock:
+            self.__cursor.execute("SELECT contrasenya FROM usuario_contrasenyas WHERE usuario = %s", (login.get_usuario(), ))
+            resultado = self.__cursor.fetchone()
+        return resultado is not None and bcrypt.checkpw(login.get_contrasenya().encode(), resultado[0].encode())
+
+
+def crear_base_simulada(ruta, usuarios, coste):
+    # Tabla usuario_contrasenyas (como la del .sql de Documentos, con indice por usuario) con `usuarios` usuarios
+    hash_ = bcrypt.hashpw(CONTRASENYA.encode(), bcrypt.gensalt(coste)).decode()
+    db = sqlite3.connect(ruta)
+    db.execute("CREATE TABLE usuario_contrasenyas (idUsuario_contrasenya INTEGER PRIMARY KEY, usuario VARCHAR(45), contrasenya VARCHAR(100))")
+    db.execute("CREATE INDEX idx_usuario ON usuario_contrasenyas (usuario)")
+    db.executemany("INSERT INTO usuario_contrasenyas (usuario, contrasenya) VALUES (?, ?)", ((f"usuario{i}", hash_) for i in range(usuarios)))
+    db.commit()
+    db.close()
+
+
+def medir(dao, operacion, hilos, segundos, usuarios):
+    # Llamadas por segundo a dao.<operacion> con `hilos` hilos llamando al mismo DAO sin parar
+    fin = time.perf_counter() + segundos
+    hechas, fallos = [0] * hilos, [0] * hilos
+
+    def llamar(i):
+        rng = random.Random(i)
+        while time.perf_counter() < fin:
+            login = Usuario_Contrasenya(f"usuario{rng.randrange(usuarios)}", CONTRASENYA)
+            try:
+                correcto = getattr(dao, operacion)(login)
+            except Exception:
+                correcto = False
+            hechas[i] += 1
+            fallos[i] += not correcto
+
+    lista = [threading.Thread(target=llamar, args=(i,)) for i in range(hilos)]
+    inicio = time.perf_counter()
+    for hilo in lista:
+        hilo.start()
+    for hilo in lista:
+        hilo.join()
+    return sum(hechas) / (time.perf_counter() - inicio), sum(fallos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hilos", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--segundos", type=float, default=3)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--coste", type=int, default=4, help="Coste de bcrypt de los usuarios de prueba (bajo para medir la base de datos)")
+    parser.add_argument("--latencia", type=float, default=0.5, help="ms por viaje al servidor en el sustituto de MySQL")
+    parser.add_argument("--caidas", type=float, default=0.0, help="Fraccion de consultas en las que se cae la conexion")
+    parser.add_argument("--tam-pool", type=int, default=None, help="Conexiones del pool (por defecto tantas como hilos)")
+    parser.add_argument("--mysql-host")
+    parser.add_argument("--mysql-user", default="root")
+    parser.add_argument("--mysql-password", default="")
+    parser.add_argument("--mysql-database", default="logins_api_anime")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        if args.mysql_host:
+            import mysql.connector
+            crear = lambda: mysql.connector.connect(
+                host=args.mysql_host, user=args.mysql_user, password=args.mysql_password, database=args.mysql_database, autocommit=True
+            )
+            print(f"MySQL en {args.mysql_host} (los usuario0..usuario{args.usuarios - 1} deben tener la contraseña {CONTRASENYA})")
+        else:
+            ruta = os.path.join(carpeta, "logins.sqlite")
+            crear_base_simulada(ruta, args.usuarios, args.coste)
+            crear = lambda: ConexionSimulada(ruta, args.latencia / 1000, args.caidas)
+            print(f"Sustituto de MySQL: SQLite + {args.latencia} ms por viaje, {args.caidas:.1%} de caidas, bcrypt coste {args.coste}")
+
+        # Con caidas la conexion compartida no se recupera (no reconecta): solo se mide el pool
+        print(f"{'':>6} {'comprobar_usuario (/s)':^30} {'comprobar_login (/s)':^30}")
+        print(f"{'hilos':>6} {'compartida':>11} {'pool':>11} {'x':>6} {'compartida':>11} {'pool':>11} {'x':>6} {'fallos':>7} {'reconexiones':>13}")
+        for hilos in args.hilos:
+            fila, fallos_pool = [], 0
+            dao = DAO_Logins(args.mysql_user, args.mysql_password, tam_pool=args.tam_pool or hilos, crear_conexion=crear)
+            dao.conectar()
+            if not dao.get_conexion():
+                raise SystemExit(f"No se pudo conectar: {dao.last_error}")
+            for operacion in ("comprobar_usuario", "comprobar_login"):
+                compartida = float("nan") if args.caidas else medir(DAOCompartido(crear), operacion, hilos, args.segundos, args.usuarios)[0]
+                con_pool, fallos = medir(dao, operacion, hilos, args.segundos, args.usuarios)
+                fila += [compartida, con_pool, con_pool / compartida]
+                fallos_pool += fallos
+            reconexiones = dao.get_pool().reconexiones
+            dao.close()
+            print(f"{hilos:>6} {fila[0]:11.0f} {fila[1]:11.0f} {fila[2]:5.1f}x {fila[3]:11.0f} {fila[4]:11.0f} {fila[5]:5.1f}x {fallos_pool:>7} {reconexiones:>13}")
+
+
+if __name__ == "__main__":
+    main()
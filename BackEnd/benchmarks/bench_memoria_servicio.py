@@ -0,0 +1,84 @@
+# Memoria de un proceso que solo sirve peticiones: modelo antiguo (pickle con corrMatrix + anime + ratings)
+# frente al modelo actual (carpeta con corr.npy en mmap, sin ratings)
+# Cada caso corre en su propio proceso. Necesita un modelo ya entrenado y la cache de ratings
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_memoria_servicio.py
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+CARPETA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARPETA_BACKEND)
+
+
+def rss_actual_mb():
+    # RSS actual en Linux (/proc), en otros sistemas el pico que da resource
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmRSS:"):
+                    return round(int(linea.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    from entrenamiento import pico_rss_mb
+    return pico_rss_mb()
+
+
+def medir_caso(caso, ruta):
+    import API_RecomendacionesAnimes as api # Se importa antes de medir para no contar pandas/flask
+    base = rss_actual_mb()
+
+    if caso == "antes":
+        with open(ruta, "rb") as f:
+            data = pickle.load(f)
+        estado = (data["corrMatrix"], data["anime"], data["ratings"])
+    else:
+        api.MODEL_DIR = ruta
+        api.entrenar_modelo()
+        estado = api.modelo
+
+    print(json.dumps({"base_mb": base, "con_modelo_mb": rss_actual_mb()}))
+    return estado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modelo", default=os.path.join(CARPETA_BACKEND, "modelo_corrMatrix"))
+    parser.add_argument("--cache", default=os.path.join(CARPETA_BACKEND, "cache_ratings.npz"))
+    parser.add_argument("--solo", choices=["antes", "despues"], help=argparse.SUPPRESS)
+    parser.add_argument("--ruta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo:
+        medir_caso(args.solo, args.ruta)
+        return
+
+    import pandas as pd
+    from modelo_disco import cargar_modelo, cargar_cache_ratings
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        # Se reconstruye el pickle tal y como lo guardaba la version anterior
+        corrMatrix, anime, _ = cargar_modelo(args.modelo)
+        usuarios, animes, valores = cargar_cache_ratings(args.cache)
+        ratings = pd.DataFrame({"user_id": usuarios.astype("int64"), "anime_id": animes.astype("int64"), "user_rating": valores.astype("int64")})
+        ruta_pkl = os.path.join(carpeta, "modelo_corrMatrix.pkl")
+        with open(ruta_pkl, "wb") as f:
+            pickle.dump({"corrMatrix": corrMatrix.astype("float64"), "anime": anime, "ratings": ratings}, f)
+
+        resultados = {}
+        for caso, ruta in (("antes", ruta_pkl), ("despues", args.modelo)):
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--solo", caso, "--ruta", ruta],
+                capture_output=True, text=True, check=True
+            )
+            resultados[caso] = json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    for caso, r in resultados.items():
+        print(f"{caso:>7}: {r['con_modelo_mb']} MB de RSS ({r['con_modelo_mb'] - r['base_mb']:.1f} MB por el modelo)")
+
+
+if __name__ == "__main__":
+    main()
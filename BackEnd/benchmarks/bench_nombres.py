@@ -0,0 +1,112 @@
+# Respuesta de /recomendar: poner nombres con los dos merge contra la tabla anime + to_dict (como antes)
+# frente a sacarlos del catalogo del modelo (array de nombres por posicion de columna)
+# Mide solo el montaje de la respuesta y tambien la peticion completa con el cliente de pruebas de Flask
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_nombres.py --animes 3000 --perfil 20
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+CARPETA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARPETA_BACKEND)
+import API_RecomendacionesAnimes as api
+from metricas import Cronometro
+from modelo import Modelo
+from bench_recomendar import corr_sintetica
+
+
+def top_con_merge(motor, myRatings, anime):
+    # Copia del top original: DataFrame + merge con anime + to_dict(orient='records')
+    top = motor.puntuar(myRatings)
+    top_recommendations = pd.DataFrame(top, columns=["anime_id", "puntaje"])
+    top_recommendations = top_recommendations.merge(anime[['anime_id', 'name']], on='anime_id', how='left')
+    return top_recommendations.to_dict(orient='records')
+
+
+def usuario_con_merge(myRatings, anime):
+    # Copia de usuario_ratings original: Series -> DataFrame + merge con anime
+    myRatings = pd.Series(myRatings)
+    user_data = (
+        pd.DataFrame({"anime_id": list(map(int, myRatings.index)), "rating": list(myRatings.values)})
+        .merge(anime[['anime_id', 'name']], on='anime_id', how='left')
+    )
+    return user_data.to_dict(orient='records')
+
+
+def respuesta_con_merge(motor, myRatings, anime):
+    return {"usuario_ratings": usuario_con_merge(myRatings, anime), "recomendaciones_top_10": top_con_merge(motor, myRatings, anime)}
+
+
+def respuesta_con_catalogo(actual, myRatings):
+    top = api._top_perfil(actual.motor, actual.catalogo, myRatings, Cronometro())
+    return api._respuesta_perfil(actual, myRatings, myRatings, {}, top)
+
+
+def medir(funcion, perfiles, repeticiones=3):
+    # Mejor de varias pasadas, en microsegundos por perfil
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for perfil in perfiles:
+            funcion(perfil)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor / len(perfiles) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--animes", type=int, default=3000)
+    parser.add_argument("--perfil", type=int, default=20)
+    parser.add_argument("--perfiles", type=int, default=500)
+    args = parser.parse_args()
+
+    # Tabla anime real (12 mil filas, como la que recorrian los merge) y matriz sintetica con ids de esa tabla
+    anime = api.cargar_anime(os.path.join(CARPETA_BACKEND, "anime.csv"))
+    ids = np.sort(anime['anime_id'].sample(args.animes, random_state=0).to_numpy(dtype=np.int64))
+    corrMatrix = corr_sintetica(args.animes)
+    corrMatrix.index = corrMatrix.columns = pd.Index(ids, name='anime_id')
+    api.publicar_modelo(Modelo(corrMatrix, anime))
+    actual = api.modelo
+    api.cache = api.CacheResultados(0) # Sin cache: cada peticion se calcula
+
+    rng = np.random.default_rng(1)
+    perfiles = [
+        {int(aid): int(rng.integers(1, 11)) for aid in rng.choice(ids, args.perfil, replace=False)}
+        for _ in range(args.perfiles)
+    ]
+
+    # Las dos formas dan la misma respuesta
+    for perfil in perfiles[:50]:
+        antes = respuesta_con_merge(actual.motor, perfil, anime)
+        ahora = respuesta_con_catalogo(actual, perfil)
+        assert antes == ahora, (antes, ahora)
+
+    print(f"animes={args.animes} perfil={args.perfil} perfiles={args.perfiles} (tabla anime de {len(anime)} filas)")
+    solo_puntuar = medir(actual.motor.puntuar, perfiles)
+    con_merge = medir(lambda p: respuesta_con_merge(actual.motor, p, anime), perfiles)
+    con_catalogo = medir(lambda p: respuesta_con_catalogo(actual, p), perfiles)
+    print(f"solo puntuar:           {solo_puntuar:8.1f} us")
+    print(f"puntuar + merge:        {con_merge:8.1f} us  (nombres {con_merge - solo_puntuar:8.1f} us)")
+    print(f"puntuar + catalogo:     {con_catalogo:8.1f} us  (nombres {con_catalogo - solo_puntuar:8.1f} us)")
+
+    # Peticion completa por el cliente de pruebas, cambiando solo el montaje de la respuesta
+    cliente = api.app.test_client()
+    cuerpos = [{str(aid): nota for aid, nota in perfil.items()} for perfil in perfiles]
+    funciones = api._top_perfil, api._respuesta_perfil
+    peticion = lambda cuerpo: cliente.post("/recomendar", json=cuerpo)
+    api._top_perfil = lambda motor, catalogo, myRatings, crono, contenido=None, frios=None: top_con_merge(motor, myRatings, anime)
+    api._respuesta_perfil = lambda actual, user_ratings, myRatings, frios, top: {
+        "usuario_ratings": usuario_con_merge(myRatings, anime), "recomendaciones_top_10": top
+    }
+    endpoint_merge = medir(peticion, cuerpos)
+    api._top_perfil, api._respuesta_perfil = funciones
+    endpoint_catalogo = medir(peticion, cuerpos)
+    print(f"/recomendar con merge:    {endpoint_merge / 1000:.3f} ms")
+    print(f"/recomendar con catalogo: {endpoint_catalogo / 1000:.3f} ms  ({endpoint_merge / endpoint_catalogo:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Micro-benchmark: ruta original con pandas vs MotorRecomendacion vectorizado
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_recomendar.py --animes 3000 --perfil 20
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motor_recomendacion import MotorRecomendacion
+
+
+def corr_sintetica(n_animes, fraccion_nan=0.5, semilla=0):
+    # Matriz de correlacion simetrica con NaN (pares que no llegan a min_periods)
+    rng = np.random.default_rng(semilla)
+    valores = rng.uniform(-1, 1, size=(n_animes, n_animes))
+    valores = (valores + valores.T) / 2
+    nan = rng.random((n_animes, n_animes)) < fraccion_nan
+    nan = nan | nan.T
+    valores[nan] = np.nan
+    np.fill_diagonal(valores, 1.0)
+    ids = pd.CategoricalIndex(np.sort(rng.choice(40000, n_animes, replace=False)), name='anime_id')
+    return pd.DataFrame(valores, index=ids, columns=ids)
+
+
+def recomendar_pandas(corrMatrix, myRatings):
+    # Copia del bucle original de recomendar() para comparar
+    simCandidates = pd.Series(dtype='float64')
+    for anime_id, rating_value in myRatings.items():
+        sims = corrMatrix[anime_id].dropna()
+        sims = sims.map(lambda x: x * rating_value)
+        simCandidates = pd.concat([simCandidates, sims])
+    simCandidates = simCandidates.groupby(simCandidates.index).sum()
+    simCandidates.sort_values(inplace=True, ascending=False)
+    filteredSims = simCandidates.drop(myRatings.index, errors='ignore')
+    return [(int(aid), float(p)) for aid, p in filteredSims.head(10).items()]
+
+
+def medir(funcion, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        resultado = funcion()
+    return (time.perf_counter() - inicio) / repeticiones, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--animes", type=int, default=3000)
+    parser.add_argument("--perfil", type=int, default=20)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    corrMatrix = corr_sintetica(args.animes)
+    motor = MotorRecomendacion(corrMatrix)
+
+    rng = np.random.default_rng(1)
+    elegidos = rng.choice(np.asarray(corrMatrix.columns), args.perfil, replace=False)
+    myRatings = pd.Series({int(aid): int(rng.integers(1, 11)) for aid in elegidos})
+    perfil = myRatings.to_dict()
+
+    t_pandas, top_pandas = medir(lambda: recomendar_pandas(corrMatrix, myRatings), args.repeticiones)
+    t_motor, top_motor = medir(lambda: motor.puntuar(perfil), args.repeticiones)
+
+    mismos_ids = [a for a, _ in top_pandas] == [a for a, _ in top_motor]
+    puntajes_cercanos = np.allclose([p for _, p in top_pandas], [p for _, p in top_motor], rtol=1e-5)
+
+    print(f"animes={args.animes} perfil={args.perfil}")
+    print(f"pandas: {t_pandas * 1000:.3f} ms/peticion")
+    print(f"motor:  {t_motor * 1000:.3f} ms/peticion ({t_pandas / t_motor:.1f}x)")
+    print(f"mismo top 10: {mismos_ids} | puntajes iguales (float32): {puntajes_cercanos}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Coste de cada medida de similitud sobre los mismos ratings (leidos una sola vez) y cuanto se parecen sus
+# vecinos a los de pearson: fraccion de los 10 animes mas similares de cada anime que coinciden
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_similitudes.py --usuarios 20000 --animes 300 --densidad 0.08
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+CARPETA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(CARPETA_BENCHMARKS))
+from entrenamiento import cargar_ratings, construir_csr, correlacion_pearson_sparse, SIMILITUDES
+from motor_recomendacion import construir_indice_vecinos
+from sintetico import escribir_rating_csv, anime_ids_por_popularidad
+
+
+def coincidencia_vecinos(vecinos, referencia):
+    # Media de |vecinos ∩ referencia| / |referencia| sobre los animes que tienen vecinos en la referencia
+    total, filas = 0.0, 0
+    for fila, fila_ref in zip(vecinos, referencia):
+        ref = set(fila_ref[fila_ref >= 0].tolist())
+        if ref:
+            total += len(ref.intersection(fila[fila >= 0].tolist())) / len(ref)
+            filas += 1
+    return total / filas if filas else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--animes", type=int, default=300)
+    parser.add_argument("--densidad", type=float, default=0.08)
+    parser.add_argument("--min-periods", type=int, default=250)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    anime_ids = anime_ids_por_popularidad()
+    with tempfile.TemporaryDirectory() as carpeta:
+        ratings_file = os.path.join(carpeta, "rating.csv")
+        escribir_rating_csv(ratings_file, args.usuarios, args.animes, args.densidad)
+        inicio = time.perf_counter()
+        usuarios, animes, valores, _ = cargar_ratings(ratings_file, anime_ids_validos=anime_ids)
+        matriz, ids = construir_csr(usuarios, animes, valores, anime_ids)
+        print(f"{len(valores)} ratings, {matriz.shape[1]} animes en el modelo | lectura + CSR una vez: {time.perf_counter() - inicio:.2f} s")
+
+    referencia = None
+    for similitud in SIMILITUDES:
+        inicio = time.perf_counter()
+        corr = correlacion_pearson_sparse(matriz, args.min_periods, args.workers, similitud=similitud)
+        segundos = time.perf_counter() - inicio
+        vecinos, _ = construir_indice_vecinos(corr, 10)
+        if referencia is None:
+            referencia = vecinos
+        validos = np.count_nonzero(~np.isnan(corr)) / corr.size
+        print(f"{similitud:>18}: {segundos:.2f} s | pares validos {validos:.1%} | top 10 comun con pearson {coincidencia_vecinos(vecinos, referencia):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Indice de vecinos top-K frente a la matriz completa: latencia por peticion y recall@10
+# El recall@10 es la fraccion del top 10 de la matriz completa que tambien sale con el indice de vecinos
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_vecinos.py --animes 3000 --perfil 20
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from motor_recomendacion import MotorRecomendacion, MotorVecinos, construir_indice_vecinos
+
+
+def corr_estructurada(n_animes, dimensiones=16, fraccion_nan=0.3, semilla=0):
+    # Correlaciones con estructura (como las reales): coseno entre vectores latentes de cada anime mas ruido
+    rng = np.random.default_rng(semilla)
+    latentes = rng.normal(size=(n_animes, dimensiones))
+    latentes /= np.linalg.norm(latentes, axis=1, keepdims=True)
+    valores = latentes @ latentes.T + rng.normal(scale=0.05, size=(n_animes, n_animes))
+    valores = np.clip((valores + valores.T) / 2, -1, 1)
+    nan = rng.random((n_animes, n_animes)) < fraccion_nan
+    valores[nan | nan.T] = np.nan
+    np.fill_diagonal(valores, 1.0)
+    ids = pd.Index(np.arange(1, n_animes + 1), name='anime_id')
+    return pd.DataFrame(valores, index=ids, columns=ids)
+
+
+def medir(motor, perfiles):
+    inicio = time.perf_counter()
+    resultados = [motor.puntuar(perfil) for perfil in perfiles]
+    return (time.perf_counter() - inicio) / len(perfiles), resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--animes", type=int, default=3000)
+    parser.add_argument("--perfil", type=int, default=20)
+    parser.add_argument("--perfiles", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 20, 50, 100, 200])
+    args = parser.parse_args()
+
+    corrMatrix = corr_estructurada(args.animes)
+    completo = MotorRecomendacion(corrMatrix)
+
+    rng = np.random.default_rng(1)
+    perfiles = [
+        {int(aid): int(rng.integers(1, 11)) for aid in rng.choice(completo.ids, args.perfil, replace=False)}
+        for _ in range(args.perfiles)
+    ]
+
+    t_completo, referencia = medir(completo, perfiles)
+    print(f"animes={args.animes} perfil={args.perfil}")
+    print(f"matriz completa: {t_completo * 1000:.3f} ms/peticion")
+
+    for k in args.k:
+        inicio = time.perf_counter()
+        vecinos, pesos = construir_indice_vecinos(completo.matriz, k)
+        t_indice = time.perf_counter() - inicio
+
+        t_vecinos, resultados = medir(MotorVecinos(completo.ids, vecinos, pesos), perfiles)
+        recall = np.mean([
+            len({a for a, _ in r} & {a for a, _ in ref}) / max(len(ref), 1)
+            for r, ref in zip(resultados, referencia)
+        ])
+        print(f"k={k:>4}: {t_vecinos * 1000:.3f} ms/peticion ({t_completo / t_vecinos:.1f}x) | recall@10 {recall:.3f} | indice {vecinos.nbytes + pesos.nbytes >> 10} KB en {t_indice:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Escalado de la correlacion por bloques con 1, 2, 4, 8 y N workers
+# Usa una matriz usuarios x animes dispersa sintetica, asi que no hace falta el rating.csv
+# Uso (desde la carpeta BackEnd): python benchmarks/bench_workers.py --usuarios 50000 --animes 2000
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from entrenamiento import correlacion_pearson_sparse
+
+
+def matriz_sintetica(n_usuarios, n_animes, densidad, semilla=0):
+    # Calificaciones del 1 al 10 con algunos animes mucho mas vistos que otros
+    rng = np.random.default_rng(semilla)
+    total = int(n_usuarios * n_animes * densidad)
+    popularidad = 1.0 / np.arange(1, n_animes + 1) ** 0.5
+    filas = rng.integers(0, n_usuarios, total)
+    columnas = rng.choice(n_animes, total, p=popularidad / popularidad.sum())
+    matriz = sparse.coo_matrix((rng.integers(1, 11, total).astype(np.float64), (filas, columnas)), shape=(n_usuarios, n_animes)).tocsr()
+    matriz.data = np.minimum(matriz.data, 10) # Los repetidos se suman, se dejan dentro del rango
+    return matriz
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=50000)
+    parser.add_argument("--animes", type=int, default=2000)
+    parser.add_argument("--densidad", type=float, default=0.02)
+    args = parser.parse_args()
+
+    matriz = matriz_sintetica(args.usuarios, args.animes, args.densidad)
+    n_cpu = os.cpu_count() or 1
+    lista_workers = sorted({w for w in (1, 2, 4, 8, n_cpu) if w <= n_cpu} | {n_cpu})
+
+    referencia, t_base = None, None
+    print(f"{args.usuarios} usuarios x {args.animes} animes, {matriz.nnz} calificaciones, {n_cpu} nucleos")
+    for workers in lista_workers:
+        inicio = time.perf_counter()
+        corr = correlacion_pearson_sparse(matriz, workers=workers)
+        segundos = time.perf_counter() - inicio
+
+        if referencia is None:
+            referencia, t_base = corr, segundos
+        identica = np.array_equal(corr.view(np.uint32), referencia.view(np.uint32)) # Comparacion bit a bit (NaN incluidos)
+        print(f"workers={workers:>3}: {segundos:.3f} s | speedup {t_base / segundos:.2f}x | identica a 1 worker: {identica}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Generador determinista de ratings con la forma de rating.csv (user_id,anime_id,rating, ~8% de -1)
+# rating.csv no esta en el repositorio: con esto se puede entrenar y medir la API a cualquier escala
+# - Popularidad de los animes tipo Zipf (pocos animes concentran casi todos los ratings, como en el real)
+# - Actividad de los usuarios lognormal (la mayoria ve pocos animes y unos pocos ven cientos)
+# - Notas de un modelo de factores latentes (usuario x anime + sesgo del anime), asi hay correlaciones de verdad
+# Con los mismos parametros y semilla sale siempre exactamente el mismo CSV
+# Uso (desde la carpeta BackEnd): python benchmarks/sintetico.py salida.csv --usuarios 20000 --animes 300 --densidad 0.08
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CARPETA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FACTORES = 8 # Dimensiones latentes de usuarios y animes
+PROPORCION_SIN_NOTA = 0.08 # Fraccion de -1 (visto sin puntuar), como en rating.csv
+EXPONENTE_ZIPF = 0.6
+CELDAS_BLOQUE = 4_000_000 # Usuarios x animes que se sortean a la vez (acota la memoria del generador)
+
+
+def anime_ids_por_popularidad(anime_file=None):
+    # anime_id de anime.csv del mas al menos visto (columna members): los sinteticos usan ids reales
+    anime = pd.read_csv(anime_file or os.path.join(CARPETA_BACKEND, "anime.csv"), usecols=["anime_id", "members"])
+    return anime.sort_values("members", ascending=False, kind="stable")["anime_id"].to_numpy(dtype=np.int64)
+
+
+def generar_ratings(usuarios, animes, densidad, semilla=0, anime_ids=None):
+    # Genera por bloques de usuarios DataFrames (user_id, anime_id, rating) ordenados por usuario
+    # densidad: fraccion media de animes que ha visto cada usuario (rating.csv real ~0.0095)
+    if anime_ids is None:
+        anime_ids = anime_ids_por_popularidad()
+    if animes > len(anime_ids):
+        raise ValueError(f"Solo hay {len(anime_ids)} anime_id disponibles, se pidieron {animes}")
+    if not 0 < densidad <= 1:
+        raise ValueError("La densidad debe estar entre 0 y 1")
+    anime_ids = np.asarray(anime_ids[:animes], dtype=np.int64)
+
+    rng = np.random.default_rng(semilla)
+    log_popularidad = (-EXPONENTE_ZIPF * np.log(np.arange(1, animes + 1))).astype(np.float32)
+    factores_anime = rng.normal(0, 1, (animes, FACTORES)).astype(np.float32)
+    sesgo_anime = rng.normal(7.5, 1.0, animes).astype(np.float32)
+    # Animes vistos por usuario: lognormal con media densidad * animes, al menos 1
+    vistos = rng.lognormal(0, 1, usuarios)
+    vistos = np.clip(np.rint(vistos / vistos.mean() * densidad * animes), 1, animes).astype(np.int64)
+
+    tam_bloque = max(1, CELDAS_BLOQUE // animes)
+    for bloque, inicio in enumerate(range(0, usuarios, tam_bloque)):
+        # Cada bloque tiene su propio generador derivado de la semilla: no depende de lo que se consumio antes
+        rng_bloque = np.random.default_rng([semilla, bloque])
+        n = min(tam_bloque, usuarios - inicio)
+        k = vistos[inicio:inicio + n]
+
+        # Muestreo sin reemplazo proporcional a la popularidad (Gumbel top-k): los k_u animes con mayor
+        # log(popularidad) + ruido Gumbel de cada fila
+        claves = rng_bloque.gumbel(size=(n, animes)).astype(np.float32)
+        claves += log_popularidad
+        # Solo hace falta ordenar los k_max primeros de cada fila, no todos los animes
+        k_max = int(k.max())
+        orden = np.argpartition(-claves, k_max - 1, axis=1)[:, :k_max] if k_max < animes else np.arange(animes)[None, :].repeat(n, 0)
+        orden = np.take_along_axis(orden, np.argsort(-np.take_along_axis(claves, orden, axis=1), axis=1), axis=1)
+        del claves
+        mascara = np.arange(k_max) < k[:, None]
+        filas = np.repeat(np.arange(n), k)
+        columnas = orden[mascara]
+
+        factores_usuario = rng_bloque.normal(0, 1, (n, FACTORES)).astype(np.float32)
+        afinidad = np.einsum("ij,ij->i", factores_usuario[filas], factores_anime[columnas]) / np.sqrt(FACTORES)
+        notas = sesgo_anime[columnas] + 1.5 * afinidad + rng_bloque.normal(0, 1, len(filas))
+        notas = np.clip(np.rint(notas), 1, 10).astype(np.int64)
+        notas[rng_bloque.random(len(notas)) < PROPORCION_SIN_NOTA] = -1
+
+        yield pd.DataFrame({
+            "user_id": (inicio + 1 + filas).astype(np.int64),
+            "anime_id": anime_ids[columnas],
+            "rating": notas,
+        })
+
+
+def escribir_rating_csv(ruta, usuarios, animes, densidad, semilla=0, anime_ids=None):
+    # Escribe el CSV por bloques (nunca esta entero en memoria) y devuelve cuantas filas tiene
+    filas = 0
+    with open(ruta, "w", encoding="utf-8", newline="") as f:
+        f.write("user_id,anime_id,rating\n")
+        for trozo in generar_ratings(usuarios, animes, densidad, semilla, anime_ids):
+            trozo.to_csv(f, header=False, index=False)
+            filas += len(trozo)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("salida")
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--animes", type=int, default=300)
+    parser.add_argument("--densidad", type=float, default=0.08)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    filas = escribir_rating_csv(args.salida, args.usuarios, args.animes, args.densidad, args.semilla)
+    print(f"{args.salida}: {filas} ratings ({os.path.getsize(args.salida) / (1024 * 1024):.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
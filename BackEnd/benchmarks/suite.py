@@ -0,0 +1,253 @@
+# Suite de rendimiento sobre datos sinteticos (sintetico.py), sin necesitar el rating.csv real
+# Mide, cada caso en su propio proceso para que el pico de RSS sea solo el suyo:
+#   entrenamiento: tiempo y pico de memoria de entrenar_modelo(force=True) desde el CSV
+#   carga:         tiempo y memoria de cargar el modelo ya guardado, y la primera peticion despues
+#   latencia:      /recomendar peticion a peticion (p50/p90/p99) con perfiles de usuarios del CSV
+#   batch:         usuarios/s con /recomendar/batch
+# Todo corre contra una carpeta temporal (variable API_DATOS), el modelo de BackEnd no se toca.
+# Los resultados se guardan en un JSON por version de la API (vers) y escala, para comparar entre versiones
+# resultados.json es la salida de cada ejecucion (no esta en git, depende de la maquina); linea_base.json es la
+# referencia que si esta en git y solo cambia a proposito con --fijar-linea-base
+# Uso (desde la carpeta BackEnd): python benchmarks/suite.py --escala pequena
+#                                 python benchmarks/suite.py --escala mediana --comparar 0.0.4
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+CARPETA_BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+CARPETA_BACKEND = os.path.dirname(CARPETA_BENCHMARKS)
+sys.path.insert(0, CARPETA_BACKEND)
+
+# usuarios, animes, densidad. "grande" tiene el tamaño del rating.csv real (~7.8 millones de ratings)
+ESCALAS = {
+    "pequena": (20000, 300, 0.08),
+    "mediana": (50000, 2000, 0.02),
+    "grande": (73516, 11200, 0.0095),
+}
+CASOS = ("entrenamiento", "carga", "latencia", "batch")
+RESULTADOS = os.path.join(CARPETA_BENCHMARKS, "resultados.json")
+LINEA_BASE = os.path.join(CARPETA_BENCHMARKS, "linea_base.json")
+TAM_LOTE = 256 # Perfiles por llamada a /recomendar/batch
+
+# (caso, metrica, True si menos es mejor) que se comparan entre versiones
+METRICAS = (
+    ("entrenamiento", "segundos", True),
+    ("entrenamiento", "pico_rss_mb", True),
+    ("carga", "segundos", True),
+    ("carga", "rss_mb", True),
+    ("latencia", "p50_ms", True),
+    ("latencia", "p99_ms", True),
+    ("batch", "usuarios_s", False),
+)
+
+
+def medir_caso(caso, carpeta, peticiones):
+    # Se ejecuta en el proceso hijo, con API_DATOS apuntando a la carpeta temporal
+    import API_RecomendacionesAnimes as api
+    from entrenamiento import pico_rss_mb
+    from bench_memoria_servicio import rss_actual_mb
+
+    if caso == "entrenamiento":
+        informe = api.entrenar_modelo(force=True)
+        resultado = {clave: informe[clave] for clave in ("segundos", "pico_rss_mb", "segundos_lectura", "ratings", "usuarios", "animes", "workers")}
+        print(json.dumps(resultado))
+        return
+
+    base = rss_actual_mb()
+    inicio = time.perf_counter()
+    api.entrenar_modelo() # Carga el modelo guardado por el caso de entrenamiento
+    segundos_carga = time.perf_counter() - inicio
+    with open(os.path.join(carpeta, "perfiles.json"), encoding="utf-8") as f:
+        perfiles = json.load(f)
+    # Solo los animes que entraron al modelo, como haria un cliente que elige de /animes
+    perfiles = [{aid: nota for aid, nota in perfil.items() if api.modelo.motor.contiene(aid)} for perfil in perfiles]
+    perfiles = [perfil for perfil in perfiles if perfil]
+    cliente = api.app.test_client()
+
+    if caso == "carga":
+        inicio = time.perf_counter()
+        respuesta = cliente.post("/recomendar", json=perfiles[0])
+        assert respuesta.status_code == 200, respuesta.get_json()
+        print(json.dumps({
+            "segundos": round(segundos_carga, 4),
+            "rss_mb": round(rss_actual_mb() - base, 1),
+            "primera_peticion_ms": round((time.perf_counter() - inicio) * 1000, 3),
+        }))
+    elif caso == "latencia":
+        for perfil in perfiles[:20]: # Calentamiento
+            cliente.post("/recomendar", json=perfil)
+        latencias = []
+        for i in range(peticiones):
+            inicio = time.perf_counter()
+            respuesta = cliente.post("/recomendar", json=perfiles[i % len(perfiles)])
+            latencias.append(time.perf_counter() - inicio)
+            assert respuesta.status_code == 200, respuesta.get_json()
+        latencias = np.array(latencias) * 1000
+        print(json.dumps({
+            "peticiones": peticiones,
+            **{f"p{p}_ms": round(float(np.percentile(latencias, p)), 3) for p in (50, 90, 99)},
+            "pico_rss_mb": pico_rss_mb(),
+        }))
+    else:
+        lotes = [perfiles[i:i + TAM_LOTE] for i in range(0, len(perfiles), TAM_LOTE)]
+        cliente.post("/recomendar/batch", json=lotes[0]) # Calentamiento
+        usuarios, inicio = 0, time.perf_counter()
+        while usuarios < peticiones:
+            for lote in lotes:
+                respuesta = cliente.post("/recomendar/batch", json=lote)
+                assert respuesta.status_code == 200, respuesta.get_json()
+                usuarios += len(lote)
+        segundos = time.perf_counter() - inicio
+        print(json.dumps({"usuarios": usuarios, "usuarios_s": round(usuarios / segundos, 1), "pico_rss_mb": pico_rss_mb()}))
+
+
+def perfiles_del_csv(ratings_file, n):
+    # Perfiles {anime_id: nota} de los primeros n usuarios del CSV (solo ratings con nota)
+    ratings = pd.read_csv(ratings_file, nrows=max(100_000, n * 200))
+    ratings = ratings[ratings["rating"] != -1]
+    perfiles = []
+    for _, grupo in ratings.groupby("user_id", sort=True):
+        perfiles.append({str(aid): int(nota) for aid, nota in zip(grupo["anime_id"], grupo["rating"])})
+        if len(perfiles) == n:
+            break
+    return perfiles
+
+
+def info_maquina():
+    return {
+        "python": platform.python_version(),
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def leer_resultados(ruta):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def comparar(resultados, version, anterior, escala, tolerancia, previos=()):
+    # Imprime el cambio de cada metrica frente a otra version; devuelve True si alguna empeora mas de la tolerancia
+    # La version anterior se busca en orden en previos (resultados guardados de esta maquina y linea base)
+    actual, previa = resultados.get(version, {}).get(escala), None
+    for fuente in previos:
+        previa = previa or fuente.get(anterior, {}).get(escala)
+    if previa is None:
+        print(f"No hay resultados de la version {anterior} con la escala {escala}")
+        return False
+    regresion = False
+    print(f"\n{anterior} -> {version} ({escala}):")
+    for caso, metrica, menos_es_mejor in METRICAS:
+        antes, despues = previa.get(caso, {}).get(metrica), actual.get(caso, {}).get(metrica)
+        if antes is None or despues is None:
+            continue
+        cambio = (despues - antes) / antes if antes else 0.0
+        empeora = cambio > tolerancia if menos_es_mejor else cambio < -tolerancia
+        regresion |= empeora
+        print(f"  {caso + '.' + metrica:<28} {antes:>10} -> {despues:<10} {cambio:+.1%}{'  REGRESION' if empeora else ''}")
+    return regresion
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--usuarios", type=int, help="Cambia los usuarios de la escala")
+    parser.add_argument("--animes", type=int, help="Cambia los animes de la escala")
+    parser.add_argument("--densidad", type=float, help="Cambia la densidad de la escala")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--casos", nargs="+", choices=CASOS, default=list(CASOS), help="entrenamiento siempre se ejecuta (los demas usan su modelo)")
+    parser.add_argument("--peticiones", type=int, default=500, help="Peticiones de latencia y usuarios minimos del batch")
+    parser.add_argument("--perfiles", type=int, default=500, help="Perfiles distintos sacados del CSV")
+    parser.add_argument("--resultados", default=RESULTADOS)
+    parser.add_argument("--comparar", metavar="VERS", help="Version con la que comparar los resultados")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Empeoramiento relativo que cuenta como regresion")
+    parser.add_argument("--no-guardar", action="store_true")
+    parser.add_argument("--linea-base", default=LINEA_BASE)
+    parser.add_argument("--fijar-linea-base", action="store_true", help="Guarda tambien este resultado en la linea base")
+    parser.add_argument("--solo", choices=CASOS, help=argparse.SUPPRESS)
+    parser.add_argument("--carpeta", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.solo:
+        medir_caso(args.solo, args.carpeta, args.peticiones)
+        return
+
+    usuarios, animes, densidad = ESCALAS[args.escala]
+    usuarios, animes = args.usuarios or usuarios, args.animes or animes
+    densidad = args.densidad or densidad
+    escala = args.escala if (usuarios, animes, densidad) == ESCALAS[args.escala] else f"{usuarios}x{animes}x{densidad}"
+
+    from API_RecomendacionesAnimes import vers
+    casos = [caso for caso in CASOS if caso == "entrenamiento" or caso in args.casos]
+    resultado = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "parametros": {"usuarios": usuarios, "animes": animes, "densidad": densidad, "semilla": args.semilla},
+        "maquina": info_maquina(),
+    }
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        shutil.copy(os.path.join(CARPETA_BACKEND, "anime.csv"), carpeta)
+        ratings_file = os.path.join(carpeta, "rating.csv")
+        inicio = time.perf_counter()
+        # El CSV se genera en otro proceso: el pico de RSS (ru_maxrss) se hereda al lanzar los casos
+        # y el del generador se colaria en sus medidas
+        subprocess.run(
+            [sys.executable, os.path.join(CARPETA_BENCHMARKS, "sintetico.py"), ratings_file, "--usuarios", str(usuarios),
+             "--animes", str(animes), "--densidad", str(densidad), "--semilla", str(args.semilla)],
+            capture_output=True, check=True
+        )
+        filas = sum(1 for _ in open(ratings_file, encoding="utf-8")) - 1
+        print(f"vers {vers} | escala {escala}: {filas} ratings generados en {time.perf_counter() - inicio:.1f} s")
+        resultado["parametros"]["filas"] = filas
+        with open(os.path.join(carpeta, "perfiles.json"), "w", encoding="utf-8") as f:
+            json.dump(perfiles_del_csv(ratings_file, args.perfiles), f)
+
+        # Sin cache de resultados: se mide el calculo, no los aciertos
+        entorno = {**os.environ, "API_DATOS": carpeta, "CACHE_TAM": "0"}
+        for caso in casos:
+            proceso = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--solo", caso, "--carpeta", carpeta, "--peticiones", str(args.peticiones)],
+                capture_output=True, text=True, env=entorno, cwd=CARPETA_BACKEND
+            )
+            if proceso.returncode != 0:
+                print(proceso.stdout[-2000:], proceso.stderr[-2000:])
+                raise SystemExit(f"Fallo el caso {caso}")
+            resultado[caso] = json.loads(proceso.stdout.strip().splitlines()[-1])
+            print(f"{caso:>13}: {resultado[caso]}")
+
+    resultados = leer_resultados(args.resultados)
+    anteriores = json.loads(json.dumps(resultados)) # Lo guardado antes de esta ejecucion, para --comparar
+    # Si solo se repiten algunos casos se conservan los demas de la ejecucion anterior
+    resultados.setdefault(vers, {}).setdefault(escala, {}).update(resultado)
+    if not args.no_guardar:
+        with open(args.resultados, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, sort_keys=True)
+        print(f"Resultados guardados en {args.resultados}")
+    linea_base = leer_resultados(args.linea_base)
+    if args.fijar_linea_base:
+        linea_base.setdefault(vers, {})[escala] = resultados[vers][escala]
+        with open(args.linea_base, "w", encoding="utf-8") as f:
+            json.dump(linea_base, f, indent=2, sort_keys=True)
+        print(f"Linea base guardada en {args.linea_base}")
+
+    if args.comparar and comparar(resultados, vers, args.comparar, escala, args.tolerancia, (anteriores, linea_base)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+BUSQUEDA_N = 10 # Resultados de /animes/buscar si no se indica n
+UMBRAL_APROXIMADA = 0.3 # Parecido minimo (trigramas en comun / trigramas de los dos) para la busqueda aproximada
+MIN_APROXIMADA = 3 # Con menos letras no se hace busqueda aproximada (casi todo comparte 1 o 2 letras)
+NO_ALFANUMERICO = re.compile(r"[^0-9a-z]+")
+
+
+def normalizar(texto):
+    # Minusculas, sin acentos y con cualquier cosa que no sea letra o numero como un solo espacio:
+    # "Kimi no Na wa." -> "kimi no na wa", "Pokémon: XY" -> "pokemon xy"
+    sin_acentos = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return NO_ALFANUMERICO.sub(" ", sin_acentos.lower()).strip()
+
+
+def trigramas(texto):
+    # Trigramas de un texto ya normalizado, con un espacio delante y detras de cada palabra (" ki", "kim", ..., "wa ")
+    trozos = set()
+    for palabra in texto.split():
+        relleno = f" {palabra} "
+        trozos.update(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return trozos
+
+
+class IndiceBusqueda():
+    # Busqueda por nombre sobre los animes de un catalogo, construida una vez por modelo
+    # - Prefijo: array ordenado con el nombre normalizado entero y cada sufijo que empieza en una palabra
+    #   ("fullmetal alchemist brotherhood", "alchemist brotherhood", "brotherhood"); las claves que empiezan por
+    #   la consulta son un rango contiguo que se encuentra con dos busquedas binarias
+    # - Aproximada (erratas): indice invertido trigrama -> posiciones; se cuentan los trigramas en comun con
+    #   bincount y se ordena por parecido (en comun / trigramas de la consulta y del nombre sin repetir)
+    # Dentro de cada tipo de coincidencia gana el mas popular. nombres y popularidad van por posicion del catalogo
+    def __init__(self, nombres, popularidad):
+        claves, posiciones, palabra = [], [], []
+        por_trigrama = {}
+        self.tam_trigramas = np.zeros(len(nombres), dtype=np.int32)
+        for pos, nombre in enumerate(nombres):
+            if nombre is None:
+                continue
+            texto = normalizar(nombre)
+            if not texto:
+                continue
+            inicios = [0] + [m.end() for m in re.finditer(" ", texto)]
+            for i, inicio in enumerate(inicios):
+                claves.append(texto[inicio:])
+                posiciones.append(pos)
+                palabra.append(i > 0)
+            propios = trigramas(texto)
+            self.tam_trigramas[pos] = len(propios)
+            for trigrama in propios:
+                por_trigrama.setdefault(trigrama, []).append(pos)
+
+        orden = sorted(range(len(claves)), key=claves.__getitem__)
+        self.claves = [claves[i] for i in orden] # Lista de str: bisect sobre ella es mas rapido que searchsorted con unicode
+        self.posiciones = np.asarray(posiciones, dtype=np.int32)[orden]
+        # Orden de cada clave dentro de su rango: primero las que empiezan el nombre, luego por popularidad
+        popularidad = np.nan_to_num(np.asarray(popularidad, dtype=np.float64), nan=0.0)
+        self.rango = np.asarray(palabra, dtype=np.float64)[orden] * (popularidad.max(initial=0) + 1) - popularidad[self.posiciones]
+        self.popularidad = popularidad
+        self.por_trigrama = {trigrama: np.array(lista, dtype=np.int32) for trigrama, lista in por_trigrama.items()}
+
+    def __len__(self):
+        return int(np.count_nonzero(self.tam_trigramas))
+
+    def prefijo(self, texto, n):
+        # [(posicion, "prefijo" o "palabra")] de las n mejores claves que empiezan por el texto normalizado
+        inicio = bisect_left(self.claves, texto)
+        fin = bisect_left(self.claves, texto + "\uffff", inicio)
+        if inicio == fin:
+            return []
+        rango = self.rango[inicio:fin]
+        # Se cogen de sobra porque un anime puede aparecer varias veces (con el nombre entero y con otra palabra)
+        mejores = np.argsort(rango) if len(rango) <= 4 * n else np.argpartition(rango, 4 * n)[:4 * n]
+        mejores = mejores[np.argsort(rango[mejores], kind="stable")]
+        vistos, resultado = set(), []
+        for i in mejores.tolist():
+            pos = int(self.posiciones[inicio + i])
+            if pos not in vistos:
+                vistos.add(pos)
+                resultado.append((pos, "prefijo" if rango[i] <= 0 else "palabra"))
+                if len(resultado) == n:
+                    break
+        return resultado
+
+    def aproximada(self, texto, n, excluir=()):
+        # [(posicion, parecido)] de los n nombres con mas trigramas en comun (parecido >= UMBRAL_APROXIMADA)
+        propios = trigramas(texto)
+        listas = [self.por_trigrama[t] for t in propios if t in self.por_trigrama]
+        if len(texto) < MIN_APROXIMADA or not listas:
+            return []
+        comunes = np.bincount(np.concatenate(listas), minlength=len(self.tam_trigramas))
+        candidatos = np.flatnonzero(comunes)
+        parecido = comunes[candidatos] / (len(propios) + self.tam_trigramas[candidatos] - comunes[candidatos])
+        validos = parecido >= UMBRAL_APROXIMADA
+        candidatos, parecido = candidatos[validos], parecido[validos]
+        k = n + len(excluir)
+        if len(parecido) > k:
+            # Solo se ordenan los que llegan al k-esimo parecido (con los empates, para no perder al mas popular)
+            corte = np.partition(parecido, len(parecido) - k)[len(parecido) - k]
+            candidatos, parecido = candidatos[parecido >= corte], parecido[parecido >= corte]
+        # Mas parecido primero y, a igualdad, mas popular
+        orden = np.lexsort((-self.popularidad[candidatos], -parecido))
+        resultado = []
+        for i in orden.tolist():
+            pos = int(candidatos[i])
+            if pos not in excluir:
+                resultado.append((pos, round(float(parecido[i]), 4)))
+                if len(resultado) == n:
+                    break
+        return resultado
+
+    def buscar(self, consulta, n=BUSQUEDA_N):
+        # Hasta n posiciones: primero las coincidencias por prefijo y, si faltan, las aproximadas
+        # Devuelve [(posicion, tipo, parecido)] con tipo "prefijo", "palabra" o "aproximada"
+        texto = normalizar(consulta)
+        if not texto or n <= 0:
+            return []
+        resultado = [(pos, tipo, 1.0) for pos, tipo in self.prefijo(texto, n)]
+        if len(resultado) < n:
+            vistos = {pos for pos, _, _ in resultado}
+            resultado += [(pos, "aproximada", parecido) for pos, parecido in self.aproximada(texto, n - len(resultado), vistos)]
+        return resultado
+
+    def __str__(self):
+        return f"Indice de busqueda ({len(self)} animes, {len(self.claves)} claves, {len(self.por_trigrama)} trigramas)"
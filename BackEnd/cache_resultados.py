@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+class CacheResultados():
+    # Cache LRU con caducidad (TTL) para el top de /recomendar
+    # La clave es un hash del perfil normalizado (ids ordenados, notas como float) mas la version del modelo,
+    # asi un modelo nuevo nunca devuelve resultados del anterior aunque no se haya vaciado todavia
+    # Como perfiles distintos en la forma (orden, 9 frente a 9.0) comparten clave, solo se debe guardar lo que
+    # sale igual para todos ellos (el top), no nada copiado de la peticion
+    def __init__(self, tam_maximo=1024, ttl=300):
+        self.__entradas = OrderedDict() # clave -> (caduca, valor), de la menos a la mas usada
+        self.__lock = threading.Lock()
+        self.__tam_maximo = tam_maximo # Entradas como maximo (0 = cache desactivada)
+        self.__ttl = ttl # Segundos que vale una entrada
+        self.__aciertos = self.__fallos = self.__expulsiones = self.__caducadas = 0
+
+    @staticmethod
+    def clave(perfil, version):
+        # Hash canonico de {anime_id: calificacion}: el orden de las claves y 9 frente a 9.0 no cambian la clave
+        normalizado = sorted((int(aid), float(valor)) for aid, valor in perfil.items())
+        texto = json.dumps([version, normalizado], separators=(",", ":"))
+        return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+    def obtener(self, clave):
+        # Valor guardado o None si no esta o ha caducado
+        with self.__lock:
+            entrada = self.__entradas.get(clave)
+            if entrada is None:
+                self.__fallos += 1
+                return None
+            caduca, valor = entrada
+            if caduca < time.monotonic():
+                del self.__entradas[clave]
+                self.__caducadas += 1
+                self.__fallos += 1
+                return None
+            self.__entradas.move_to_end(clave)
+            self.__aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        # El valor se comparte entre peticiones, no se debe modificar despues de guardarlo
+        if self.__tam_maximo <= 0:
+            return
+        with self.__lock:
+            self.__entradas[clave] = (time.monotonic() + self.__ttl, valor)
+            self.__entradas.move_to_end(clave)
+            while len(self.__entradas) > self.__tam_maximo:
+                self.__entradas.popitem(last=False)
+                self.__expulsiones += 1
+
+    def descartar(self, clave):
+        # Quita una entrada concreta (por ejemplo un perfil que acaba de cambiar)
+        with self.__lock:
+            self.__entradas.pop(clave, None)
+
+    def vaciar(self):
+        # Se llama al publicar un modelo nuevo: las entradas del anterior ya no sirven
+        with self.__lock:
+            self.__entradas.clear()
+
+    def estadisticas(self):
+        with self.__lock:
+            consultas = self.__aciertos + self.__fallos
+            return {
+                "entradas": len(self.__entradas),
+                "tam_maximo": self.__tam_maximo,
+                "ttl": self.__ttl,
+                "aciertos": self.__aciertos,
+                "fallos": self.__fallos,
+                "expulsiones": self.__expulsiones,
+                "caducadas": self.__caducadas,
+                "tasa_aciertos": round(self.__aciertos / consultas, 4) if consultas else None,
+            }
+
+    def __str__(self):
+        return f"Cache de resultados ({len(self.__entradas)}/{self.__tam_maximo} entradas, ttl {self.__ttl} s)"
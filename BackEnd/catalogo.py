@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from busqueda import IndiceBusqueda, BUSQUEDA_N
+
+MUESTRA_N = 100 # Animes por pagina de /animes si no se indica n
+
+class Catalogo():
+    # Fichas de los animes que se pueden recomendar (los que estan en corrMatrix) como arrays compactos,
+    # indexados por la posicion de la columna en la matriz y preparados una vez por modelo:
+    # asi las respuestas ponen nombres sin hacer merge con la tabla anime y /animes solo sortea posiciones
+    # Tambien guarda las posiciones de cada genero y cada tipo para poder filtrar sin recorrer la tabla
+    # y el indice de busqueda por nombre de /animes/buscar (solo con los animes del modelo)
+    def __init__(self, anime, columnas):
+        self.ids = np.asarray(columnas, dtype=np.int64) # anime_id de cada columna
+        self.indice = {int(aid): pos for pos, aid in enumerate(self.ids)} # anime_id -> posicion
+        fichas = anime.drop_duplicates('anime_id').set_index('anime_id').reindex(self.ids)
+        # Object arrays de str de Python (None si el anime no esta en anime.csv): al indexarlos sale ya el str
+        self.nombres = _a_objetos(fichas, 'name')
+        self.generos = _a_objetos(fichas, 'genre')
+        self.tipos = _a_objetos(fichas, 'type')
+        self.notas = fichas['anime_rating'].to_numpy(dtype=np.float64) if 'anime_rating' in fichas else np.full(len(self.ids), np.nan)
+        # Posiciones con ficha: las que se pueden sacar en /animes
+        self.disponibles = np.flatnonzero(pd.notna(self.nombres)).astype(np.int32)
+        self.por_genero = _indices_por_valor(self.generos, separador=",")
+        self.por_tipo = _indices_por_valor(self.tipos)
+        popularidad = fichas['members'].to_numpy(dtype=np.float64) if 'members' in fichas else self.notas
+        self.busqueda = IndiceBusqueda(self.nombres, popularidad)
+
+    def __len__(self):
+        return len(self.disponibles)
+
+    def nombre(self, anime_id):
+        # Nombre del anime (None si no esta en el modelo o no tiene ficha)
+        pos = self.indice.get(int(anime_id))
+        return None if pos is None else self.nombres[pos]
+
+    def posiciones(self, genero=None, tipo=None):
+        # Posiciones de los animes que cumplen los filtros (None = sin filtro), ordenadas
+        seleccion = None
+        for indices, valor in ((self.por_genero, genero), (self.por_tipo, tipo)):
+            if valor is None:
+                continue
+            encontradas = indices.get(valor.strip().lower(), np.empty(0, dtype=np.int32))
+            seleccion = encontradas if seleccion is None else np.intersect1d(seleccion, encontradas, assume_unique=True)
+        return self.disponibles if seleccion is None else seleccion
+
+    def muestra(self, n=MUESTRA_N, semilla=None, genero=None, tipo=None, pagina=0):
+        # Pagina `pagina` de un orden aleatorio de los animes filtrados, reproducible con la misma semilla
+        # Devuelve (lista [[anime_id, name], ...], total de animes que cumplen los filtros)
+        candidatos = self.posiciones(genero, tipo)
+        # Todas las paginas salen de la misma permutacion, asi con la misma semilla no se repiten animes entre paginas
+        orden = np.random.default_rng(semilla).permutation(len(candidatos))
+        elegidos = candidatos[orden[pagina * n:(pagina + 1) * n]]
+        return [list(par) for par in zip(self.ids[elegidos].tolist(), self.nombres[elegidos].tolist())], len(candidatos)
+
+    def buscar(self, consulta, n=BUSQUEDA_N):
+        # [{anime_id, name, coincidencia, parecido}] de los animes cuyo nombre empieza por la consulta (o alguna de
+        # sus palabras) y, si no llegan a n, de los que se le parecen (erratas)
+        return [
+            {"anime_id": int(self.ids[pos]), "name": self.nombres[pos], "coincidencia": tipo, "parecido": parecido}
+            for pos, tipo, parecido in self.busqueda.buscar(consulta, n)
+        ]
+
+    def __str__(self):
+        return f"Catalogo ({len(self)} animes, {len(self.por_genero)} generos, {len(self.por_tipo)} tipos)"
+
+
+def _a_objetos(fichas, columna):
+    # Columna de las fichas -> array object con str de Python y None en los vacios (o si no existe la columna)
+    if columna not in fichas:
+        return np.full(len(fichas), None, dtype=object)
+    return np.array([None if pd.isna(valor) else str(valor) for valor in fichas[columna]], dtype=object)
+
+
+def _indices_por_valor(valores, separador=None):
+    # {valor en minusculas: posiciones (int32 ordenadas) de las filas que lo tienen}
+    # Con separador cada fila puede tener varios valores (los generos vienen como "Action, Comedy")
+    indices = {}
+    for pos, texto in enumerate(valores):
+        if texto is None:
+            continue
+        partes = texto.split(separador) if separador else [texto]
+        for parte in partes:
+            clave = parte.strip().lower()
+            if clave:
+                indices.setdefault(clave, []).append(pos)
+    return {clave: np.array(lista, dtype=np.int32) for clave, lista in indices.items()}
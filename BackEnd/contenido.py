@@ -0,0 +1,118 @@
+import numpy as np
+from scipy import sparse
+
+CONTENIDO_K = 50 # Vecinos por contenido que se guardan para cada anime
+PESO_TIPO = 0.5 # Peso del tipo (TV, Movie, OVA...) frente a cada genero en el vector de contenido
+PESO_CONTENIDO = 0.5 # Cuanto pesa una calificacion puntuada por contenido frente a una por correlacion
+
+
+def matriz_contenido(anime):
+    # Vectores de contenido de todos los animes de la tabla: multi-hot de generos + tipo (con PESO_TIPO),
+    # normalizados (norma 1) para que el producto de dos filas sea su similitud coseno
+    # Devuelve (anime_id de cada fila, CSR float32 animes x rasgos, nombre de cada rasgo)
+    fichas = anime.drop_duplicates('anime_id')
+    ids = fichas['anime_id'].to_numpy(dtype=np.int64)
+    rasgos, filas, columnas, valores = {}, [], [], []
+    for fila, (genero, tipo) in enumerate(zip(fichas['genre'], fichas['type'])):
+        marcados = {f"genero:{g.strip().lower()}": 1.0 for g in str(genero).split(",") if g.strip() and g.strip() != "Unknown"}
+        if isinstance(tipo, str) and tipo != "Unknown":
+            marcados[f"tipo:{tipo.strip().lower()}"] = PESO_TIPO
+        for rasgo, valor in marcados.items():
+            filas.append(fila)
+            columnas.append(rasgos.setdefault(rasgo, len(rasgos)))
+            valores.append(valor)
+
+    matriz = sparse.csr_matrix(
+        (np.asarray(valores, dtype=np.float32), (filas, columnas)), shape=(len(ids), len(rasgos))
+    )
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+    matriz = sparse.diags(np.where(normas > 0, 1 / np.maximum(normas, 1e-12), 0).astype(np.float32)) @ matriz
+    return ids, matriz.tocsr(), list(rasgos)
+
+
+def construir_indice_contenido(anime, columnas, k=CONTENIDO_K, tam_bloque=1024):
+    # Para cada anime de la tabla (tambien los que no estan en corrMatrix) sus k animes de las columnas del modelo
+    # con el contenido mas parecido (coseno > 0), sin el mismo. Es un indice de vecinos aproximado al estilo
+    # del de correlaciones: se calcula una vez al entrenar y al servir solo se leen las filas del perfil
+    # A igualdad de coseno (muchos animes tienen exactamente los mismos generos) gana el de mejor nota
+    # Devuelve (anime_id de cada fila, vecinos int32 animes x k con posiciones de columna o -1, pesos float32 coseno o 0)
+    ids, matriz, _ = matriz_contenido(anime)
+    columnas = np.asarray(columnas, dtype=np.int64)
+    fila_de = {int(aid): fila for fila, aid in enumerate(ids)}
+    en_modelo = np.fromiter((fila_de.get(int(aid), -1) for aid in columnas), dtype=np.int64, count=len(columnas))
+    tiene_ficha = en_modelo >= 0
+
+    # Rasgos de cada columna del modelo (las que no tienen ficha se quedan a 0 y nunca salen)
+    destino = sparse.csr_matrix((len(columnas), matriz.shape[1]), dtype=np.float32)
+    if tiene_ficha.any():
+        seleccion = sparse.csr_matrix(
+            (np.ones(int(tiene_ficha.sum()), dtype=np.float32), (np.flatnonzero(tiene_ficha), en_modelo[tiene_ficha])),
+            shape=(len(columnas), len(ids))
+        )
+        destino = (seleccion @ matriz).tocsr()
+    notas = np.zeros(len(columnas), dtype=np.float64)
+    if 'anime_rating' in anime:
+        nota_de = dict(zip(anime['anime_id'].to_numpy(dtype=np.int64).tolist(), anime['anime_rating'].to_numpy(dtype=np.float64)))
+        notas = np.nan_to_num(np.array([nota_de.get(int(aid), 0.0) for aid in columnas]), nan=0.0)
+    desempate = (notas / (notas.max(initial=0) + 1) * 1e-4).astype(np.float32) # Menor que cualquier diferencia real de coseno
+    posicion_de = {int(aid): pos for pos, aid in enumerate(columnas)}
+    propia = np.fromiter((posicion_de.get(int(aid), -1) for aid in ids), dtype=np.int64, count=len(ids))
+
+    n = len(ids)
+    k = max(0, min(int(k), len(columnas)))
+    vecinos = np.full((n, k), -1, dtype=np.int32)
+    pesos = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return ids, vecinos, pesos
+
+    destino_t = destino.T.tocsc()
+    for inicio in range(0, n, tam_bloque):
+        fin = min(inicio + tam_bloque, n)
+        bloque = (matriz[inicio:fin] @ destino_t).toarray()
+        filas_propias = np.flatnonzero(propia[inicio:fin] >= 0)
+        bloque[filas_propias, propia[inicio:fin][filas_propias]] = 0 # El propio anime no cuenta
+        orden_bloque = np.where(bloque > 0, bloque + desempate, -np.inf)
+
+        mejores = np.argpartition(-orden_bloque, k - 1, axis=1)[:, :k]
+        valores = np.take_along_axis(orden_bloque, mejores, axis=1)
+        orden = np.argsort(-valores, axis=1, kind='stable')
+        mejores = np.take_along_axis(mejores, orden, axis=1)
+        existen = np.isfinite(np.take_along_axis(valores, orden, axis=1))
+        vecinos[inicio:fin] = np.where(existen, mejores, -1)
+        pesos[inicio:fin] = np.where(existen, np.take_along_axis(bloque, mejores, axis=1), 0)
+
+    return ids, vecinos, pesos
+
+
+class IndiceContenido():
+    # Indice de vecinos por contenido para puntuar animes que no estan en corrMatrix (pocas calificaciones)
+    # Cada anime frio del perfil aporta calificacion x coseno x peso a sus k vecinos del modelo; esos aportes
+    # se suman a los puntajes por correlacion en la misma pasada del motor (ver el parametro extra de puntuar)
+    def __init__(self, ids, vecinos, pesos, nombres=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.indice = {int(aid): fila for fila, aid in enumerate(self.ids)} # anime_id -> fila del indice
+        self.vecinos = vecinos
+        self.pesos = pesos
+        self.nombres = nombres or {} # anime_id -> nombre, para poner los animes frios en la respuesta
+
+    def contiene(self, anime_id):
+        return int(anime_id) in self.indice
+
+    def nombre(self, anime_id):
+        return self.nombres.get(int(anime_id))
+
+    def aportes(self, frios, peso=PESO_CONTENIDO):
+        # frios: {anime_id: calificacion} de animes que estan en el indice
+        # Devuelve (posiciones de columna, aportes) para sumar a los puntajes del motor
+        filas = np.fromiter((self.indice[int(aid)] for aid in frios), dtype=np.intp, count=len(frios))
+        calificaciones = np.fromiter(frios.values(), dtype=np.float64, count=len(frios))
+        vecinos = self.vecinos[filas]
+        validos = vecinos >= 0
+        valores = self.pesos[filas] * (calificaciones[:, None] * peso)
+        return vecinos[validos].astype(np.intp), valores[validos]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __str__(self):
+        return f"Indice de contenido ({len(self.ids)} animes, {self.vecinos.shape[1]} vecinos por anime)"
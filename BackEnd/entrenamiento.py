@@ -0,0 +1,364 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from modelo_disco import guardar_cache_ratings, cache_ratings_valida, cargar_cache_ratings, guardar_estadisticas
+
+try:
+    import resource # Solo existe en Linux/Mac, en Windows no se puede medir el pico de RSS asi
+except ImportError:
+    resource = None
+
+TAM_CHUNK = 1_000_000 # Filas de rating.csv que se leen de cada vez
+MIN_RATINGS_ANIME = 300 # Un anime entra al modelo si tiene mas de estas calificaciones
+MIN_PERIODS = 250 # Minimo de usuarios en comun para que una correlacion sea valida
+TAM_BLOQUE = 256 # Columnas de corrMatrix que calcula cada tarea (fijo para que el resultado no dependa de los workers)
+VARIABLE_WORKERS = "ENTRENAMIENTO_WORKERS" # Variable de entorno con el numero de procesos para la correlacion
+# Medidas de similitud entre animes, todas sobre los usuarios que vieron los dos y con los mismos estadisticos:
+#   pearson: la de siempre (DataFrame.corr), coseno: coseno de las notas sin centrar,
+#   coseno_ajustado: coseno de las notas menos la media de cada anime,
+#   pearson_contraida: pearson * N / (N + contraccion), encoge hacia 0 los pares con pocos usuarios en comun
+SIMILITUDES = ("pearson", "coseno", "coseno_ajustado", "pearson_contraida")
+CONTRACCION = 100 # Usuarios en comun con los que pearson_contraida se queda en la mitad de pearson
+ESTADISTICAS = ("N", "SX", "SXX", "SXY") # Estadisticos suficientes por par que se guardan para actualizar sin reentrenar
+# N son conteos (exactos en int32, la mitad que en float64); las sumas se quedan en float64 por la cancelacion de N*SXY - SX*SY
+TIPOS_ESTADISTICAS = {"N": np.int32, "SX": np.float64, "SXX": np.float64, "SXY": np.float64}
+# Tipos con los que se parsea rating.csv (la nota en float32 admite vacios y decimales)
+TIPOS_CSV = {'user_id': np.int32, 'anime_id': np.int32, 'rating': np.float32}
+# Si algun id viene vacio: enteros nullable de pandas (admiten vacios pero el parser va varias veces mas lento)
+TIPOS_CSV_NULOS = {'user_id': 'Int32', 'anime_id': 'Int32', 'rating': np.float32}
+PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096 # Bytes por pagina de /proc/self/statm
+
+
+def pico_rss_mb():
+    # Pico de memoria residente en MB de toda la vida del proceso (None si el sistema no lo permite)
+    # Dentro de la API (proceso de larga vida) incluye lo que gastaron trabajos anteriores: para un trabajo usar PicoRSS
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # En Linux ru_maxrss viene en KB y en Mac en bytes
+    return round(pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024, 1)
+
+
+def rss_actual_mb():
+    # Memoria residente del proceso ahora mismo en MB (None fuera de Linux, sin /proc)
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * PAGINA / (1024 * 1024)
+
+
+class PicoRSS():
+    # Pico de RSS mientras dura un bloque with (un entrenamiento o una actualizacion), no el de toda la vida
+    # del proceso: un hilo mira la RSS cada intervalo. Como ru_maxrss, no cuenta los procesos del pool
+    # Uso: with PicoRSS() as pico: ... pico.valor() (None si el sistema no permite medirlo)
+    def __init__(self, intervalo=0.02):
+        self.intervalo = intervalo
+        self.pico = None
+        self.__parar = threading.Event()
+        self.__hilo = None
+
+    def __enter__(self):
+        self.muestrear()
+        if self.pico is not None:
+            self.__hilo = threading.Thread(target=self.__bucle, daemon=True)
+            self.__hilo.start()
+        return self
+
+    def __exit__(self, *error):
+        self.__parar.set()
+        if self.__hilo is not None:
+            self.__hilo.join()
+        self.muestrear()
+        return False
+
+    def __bucle(self):
+        while not self.__parar.wait(self.intervalo):
+            self.muestrear()
+
+    def muestrear(self):
+        actual = rss_actual_mb()
+        if actual is not None and (self.pico is None or actual > self.pico):
+            self.pico = actual
+
+    def valor(self):
+        # Pico hasta ahora (se puede pedir dentro del bloque, por ejemplo al terminar la lectura)
+        self.muestrear()
+        return None if self.pico is None else round(self.pico, 1)
+
+
+def leer_ratings_por_chunks(ratings_file, tam_chunk=TAM_CHUNK, anime_ids_validos=None):
+    # Lee rating.csv por trozos con tipos compactos desde el parser y limpia cada trozo al vuelo:
+    # sin -1, sin vacios y, si se indican, solo animes de anime_ids_validos
+    # Devuelve arrays contiguos (usuarios int32, animes int32, valores int8 si todas las notas son enteras)
+    try:
+        return _leer_chunks(ratings_file, tam_chunk, anime_ids_validos, TIPOS_CSV)
+    except ValueError: # "Integer column has NA values": se repite admitiendo ids vacios
+        return _leer_chunks(ratings_file, tam_chunk, anime_ids_validos, TIPOS_CSV_NULOS)
+
+
+def _leer_chunks(ratings_file, tam_chunk, anime_ids_validos, tipos):
+    usuarios, animes, valores = [], [], []
+    for chunk in pd.read_csv(ratings_file, names=['user_id', 'anime_id', 'rating'], header=0, encoding="utf-8", dtype=tipos, chunksize=tam_chunk):
+        u, a, v = chunk['user_id'], chunk['anime_id'], chunk['rating'].to_numpy()
+        limpios = ~(u.isna().to_numpy() | a.isna().to_numpy() | np.isnan(v)) & (v != -1)
+        u, a = u.to_numpy(dtype=np.int32, na_value=0), a.to_numpy(dtype=np.int32, na_value=0)
+        if anime_ids_validos is not None:
+            limpios &= np.isin(a, anime_ids_validos)
+
+        usuarios.append(u[limpios])
+        animes.append(a[limpios])
+        valores.append(_notas_compactas(v[limpios]))
+
+    if not usuarios:
+        return np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.int8)
+    # Si algun trozo trae notas con decimales (añadidas con /ratings) el resultado queda en float32
+    return np.concatenate(usuarios), np.concatenate(animes), np.concatenate(valores)
+
+
+def _notas_compactas(valores):
+    # Las notas del dataset son enteros de 1 a 10: caben en int8 (1 byte en vez de 4)
+    if np.all((valores == np.round(valores)) & (np.abs(valores) <= 127)):
+        return valores.astype(np.int8)
+    return valores
+
+
+def cargar_ratings(ratings_file, ruta_cache=None, tam_chunk=TAM_CHUNK, anime_ids_validos=None):
+    # Ratings limpios desde la cache de entrenamiento si esta al dia, si no desde el CSV (y se crea la cache)
+    # Devuelve (usuarios, animes, valores, desde_cache)
+    if cache_ratings_valida(ruta_cache, ratings_file, anime_ids_validos):
+        return (*cargar_cache_ratings(ruta_cache), True)
+
+    usuarios, animes, valores = leer_ratings_por_chunks(ratings_file, tam_chunk, anime_ids_validos)
+    if ruta_cache:
+        guardar_cache_ratings(ruta_cache, usuarios, animes, valores, ratings_file, anime_ids_validos)
+    return usuarios, animes, valores, False
+
+
+def construir_csr(usuarios, animes, valores, anime_ids_validos, min_ratings=MIN_RATINGS_ANIME):
+    # Construye la matriz dispersa usuarios x animes populares (CSR) sin pasar por un pivot denso
+    # Devuelve la matriz y los anime_id de cada columna
+
+    # Igual que el merge con anime: solo animes que existen en anime.csv ya limpio
+    conocidos = np.isin(animes, anime_ids_validos)
+    usuarios, animes, valores = usuarios[conocidos], animes[conocidos], valores[conocidos]
+
+    # Filtrar por los animes mas puntuados (se cuentan filas, igual que value_counts)
+    ids_anime, codigos_anime, conteos = np.unique(animes, return_inverse=True, return_counts=True)
+    populares = conteos > min_ratings
+    nuevas_columnas = np.cumsum(populares) - 1
+    filas_populares = populares[codigos_anime]
+
+    columnas = nuevas_columnas[codigos_anime[filas_populares]]
+    ids_usuario, filas = np.unique(usuarios[filas_populares], return_inverse=True)
+    valores = valores[filas_populares].astype(np.float64)
+
+    matriz = csr_medias(filas, columnas, valores, (len(ids_usuario), int(populares.sum())))
+    return matriz, ids_anime[populares]
+
+
+def csr_medias(filas, columnas, valores, forma):
+    # Matriz CSR con la media de los valores repetidos en la misma celda (como aggfunc='mean' del pivot)
+    n_filas, n_columnas = forma
+    if n_columnas == 0 or len(valores) == 0:
+        return sparse.csr_matrix(forma)
+
+    claves = np.asarray(filas, dtype=np.int64) * n_columnas + columnas
+    claves_unicas, posicion = np.unique(claves, return_inverse=True)
+    medias = np.bincount(posicion, weights=valores) / np.bincount(posicion)
+
+    return sparse.csr_matrix(
+        (medias, (claves_unicas // n_columnas, claves_unicas % n_columnas)),
+        shape=forma
+    )
+
+
+def workers_por_defecto():
+    # Numero de procesos: la variable de entorno si existe, si no todos los nucleos
+    valor = os.environ.get(VARIABLE_WORKERS)
+    if valor:
+        return max(1, int(valor))
+    return os.cpu_count() or 1
+
+
+def preparar_matrices(matriz):
+    # X (notas), B (indicador de "califico este anime") y X2 (notas al cuadrado) en CSC
+    X = matriz.tocsc()
+    B = X.copy()
+    B.data = np.ones_like(B.data)
+    X2 = X.multiply(X).tocsc()
+    return X, B, X2
+
+
+def corr_desde_estadisticas(N, SX, SY, SXX, SYY, SXY, min_periods=MIN_PERIODS, similitud="pearson", contraccion=CONTRACCION, medias_x=None, medias_y=None):
+    # Similitud a partir de los estadisticos suficientes de cada par (i, j) sobre los usuarios que vieron los dos:
+    # N usuarios en comun, SX/SY sumas de notas de i/j, SXX/SYY sumas de cuadrados y SXY productos cruzados
+    # medias_x/medias_y: media de cada anime de las filas/columnas con todos sus usuarios (solo coseno_ajustado)
+    if similitud in ("pearson", "pearson_contraida"):
+        numerador = N * SXY - SX * SY
+        denominador = np.sqrt((N * SXX - SX * SX) * (N * SYY - SY * SY))
+    elif similitud == "coseno":
+        numerador = SXY
+        denominador = np.sqrt(SXX * SYY)
+    elif similitud == "coseno_ajustado":
+        # Sumas de (x - media_i)(y - media_j), (x - media_i)^2 y (y - media_j)^2 desarrolladas con los mismos estadisticos
+        a, b = medias_x[:, None], medias_y[None, :]
+        numerador = SXY - b * SX - a * SY + N * a * b
+        denominador = np.sqrt((SXX - 2 * a * SX + N * a * a) * (SYY - 2 * b * SY + N * b * b))
+    else:
+        raise ValueError(f"Similitud desconocida: {similitud}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = numerador / denominador
+        if similitud == "pearson_contraida":
+            corr *= N / (N + contraccion)
+    corr[(N < min_periods) | ~(denominador > 0)] = np.nan
+    return corr.astype(np.float32)
+
+
+def medias_animes(X, B):
+    # Media de las notas de cada anime (columna) con todos los usuarios que lo vieron
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(X.sum(axis=0)).ravel() / np.asarray(B.sum(axis=0)).ravel()
+
+
+# Matrices compartidas por cada proceso del pool (se mandan una vez al arrancar el worker)
+_X = _B = _X2 = None
+_MIN_PERIODS = MIN_PERIODS
+_CON_ESTADISTICAS = False
+_SIMILITUD = {"similitud": "pearson"} # Medida y sus parametros (contraccion, medias) para corr_desde_estadisticas
+
+def _iniciar_worker(X, B, X2, min_periods, con_estadisticas=False, similitud=None):
+    global _X, _B, _X2, _MIN_PERIODS, _CON_ESTADISTICAS, _SIMILITUD
+    _X, _B, _X2, _MIN_PERIODS, _CON_ESTADISTICAS = X, B, X2, min_periods, con_estadisticas
+    _SIMILITUD = similitud or {"similitud": "pearson"}
+
+
+def _correlacion_bloque(inicio, fin):
+    # Calcula las columnas [inicio, fin) de corrMatrix (y sus estadisticos si se piden)
+    # Para cada par (i, j) solo cuentan los usuarios que calificaron los dos animes
+    X_j, B_j, X2_j = _X[:, inicio:fin], _B[:, inicio:fin], _X2[:, inicio:fin]
+
+    N = (_B.T @ B_j).toarray() # Usuarios en comun de cada par
+    SX = (_X.T @ B_j).toarray() # SX[i, j] = suma de las notas de i entre los que tambien vieron j
+    SY = (_B.T @ X_j).toarray() # SY[i, j] = suma de las notas de j entre los que tambien vieron i
+    SXX = (_X2.T @ B_j).toarray()
+    SYY = (_B.T @ X2_j).toarray()
+    SXY = (_X.T @ X_j).toarray()
+
+    opciones = dict(_SIMILITUD)
+    medias = opciones.pop("medias", None)
+    if medias is not None:
+        opciones["medias_x"], opciones["medias_y"] = medias, medias[inicio:fin]
+    corr = corr_desde_estadisticas(N, SX, SY, SXX, SYY, SXY, _MIN_PERIODS, **opciones)
+    # SY y SYY son las traspuestas de SX y SXX, asi que no hace falta guardarlas
+    return corr, ((N, SX, SXX, SXY) if _CON_ESTADISTICAS else None)
+
+
+def correlacion_pearson_sparse(matriz, min_periods=MIN_PERIODS, workers=None, tam_bloque=TAM_BLOQUE, con_estadisticas=False, similitud="pearson", contraccion=CONTRACCION):
+    # Pearson por pares con observaciones completas (lo mismo que DataFrame.corr) usando productos dispersos
+    # o cualquiera de las otras SIMILITUDES, que salen de los mismos estadisticos por bloque
+    # La matriz se calcula por bloques de columnas, repartidos en un pool de procesos si workers > 1
+    # Los bloques son siempre los mismos, asi que el resultado es identico bit a bit con cualquier numero de workers
+    # Con con_estadisticas=True devuelve (corr, {"N", "SX", "SXX", "SXY"}) para las actualizaciones incrementales
+    if similitud not in SIMILITUDES:
+        raise ValueError(f"Similitud desconocida: {similitud}")
+    workers = workers_por_defecto() if workers is None else max(1, int(workers))
+
+    X, B, X2 = preparar_matrices(matriz)
+    opciones = {"similitud": similitud, "contraccion": contraccion}
+    if similitud == "coseno_ajustado":
+        opciones["medias"] = medias_animes(X, B)
+
+    n_animes = X.shape[1]
+    corr = np.empty((n_animes, n_animes), dtype=np.float32)
+    estadisticas = {nombre: np.empty((n_animes, n_animes), dtype=TIPOS_ESTADISTICAS[nombre]) for nombre in ESTADISTICAS} if con_estadisticas else None
+    bloques = [(inicio, min(inicio + tam_bloque, n_animes)) for inicio in range(0, n_animes, tam_bloque)]
+    workers = min(workers, len(bloques)) if bloques else 1
+
+    def colocar(inicio, fin, resultado):
+        corr[:, inicio:fin] = resultado[0]
+        if con_estadisticas:
+            for nombre, bloque in zip(ESTADISTICAS, resultado[1]):
+                estadisticas[nombre][:, inicio:fin] = bloque
+
+    if workers == 1:
+        _iniciar_worker(X, B, X2, min_periods, con_estadisticas, opciones)
+        for inicio, fin in bloques:
+            colocar(inicio, fin, _correlacion_bloque(inicio, fin))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(X, B, X2, min_periods, con_estadisticas, opciones)) as pool:
+            tareas = [pool.submit(_correlacion_bloque, inicio, fin) for inicio, fin in bloques]
+            for (inicio, fin), tarea in zip(bloques, tareas):
+                colocar(inicio, fin, tarea.result())
+
+    return (corr, estadisticas) if con_estadisticas else corr
+
+
+def entrenar_sparse(ratings_file, anime_ids_validos, min_ratings=MIN_RATINGS_ANIME, min_periods=MIN_PERIODS, tam_chunk=TAM_CHUNK, workers=None, ruta_cache=None, carpeta_estadisticas=None, similitud="pearson", contraccion=CONTRACCION, ratings=None):
+    # Entrenamiento completo en modo disperso: lectura por chunks (o cache) -> CSR -> correlacion (o la similitud pedida)
+    # Si se indica carpeta_estadisticas guarda ahi los estadisticos por par para las actualizaciones incrementales
+    # (cuatro matrices animes x animes mas: solo se piden si se va a usar /ratings)
+    # ratings = (usuarios, animes, valores) ya limpios entrena con esos en vez de leer ratings_file (evaluacion.py)
+    # Devuelve corrMatrix y un informe de tiempo y memoria (pico_rss_mb es el de este entrenamiento)
+    with PicoRSS() as pico:
+        return _entrenar_sparse(
+            ratings_file, anime_ids_validos, min_ratings, min_periods, tam_chunk, workers, ruta_cache,
+            carpeta_estadisticas, similitud, contraccion, ratings, pico
+        )
+
+
+def _entrenar_sparse(ratings_file, anime_ids_validos, min_ratings, min_periods, tam_chunk, workers, ruta_cache, carpeta_estadisticas, similitud, contraccion, ratings, pico):
+    inicio = time.perf_counter()
+
+    etapas = {} # Segundos de cada fase (la limpieza va dentro de la lectura, se hace por chunks)
+    if ratings is None:
+        usuarios, animes, valores, desde_cache = cargar_ratings(ratings_file, ruta_cache, tam_chunk, anime_ids_validos)
+    else:
+        (usuarios, animes, valores), desde_cache = ratings, False
+    segundos_lectura, pico_lectura = round(time.perf_counter() - inicio, 3), pico.valor()
+    etapas["lectura"] = segundos_lectura
+    marca = time.perf_counter()
+    matriz, ids = construir_csr(usuarios, animes, valores, anime_ids_validos, min_ratings)
+    etapas["csr"], marca = round(time.perf_counter() - marca, 3), time.perf_counter()
+    if len(ids) == 0: # Antes de tocar los estadisticos guardados del modelo anterior
+        raise ValueError(f"Ningun anime tiene mas de {min_ratings} calificaciones, baja min_ratings")
+    workers = workers_por_defecto() if workers is None else workers
+    if carpeta_estadisticas:
+        corr, estadisticas = correlacion_pearson_sparse(matriz, min_periods, workers, con_estadisticas=True, similitud=similitud, contraccion=contraccion)
+        etapas["corr"], marca = round(time.perf_counter() - marca, 3), time.perf_counter()
+        conteo_ids, conteos = np.unique(animes, return_counts=True) # Ya vienen solo los animes conocidos
+        guardar_estadisticas(carpeta_estadisticas, ids, estadisticas, conteo_ids, conteos, {
+            "min_ratings": min_ratings, "min_periods": min_periods, "similitud": similitud, "contraccion": contraccion
+        })
+        etapas["estadisticas"] = round(time.perf_counter() - marca, 3)
+        del estadisticas
+    else:
+        corr = correlacion_pearson_sparse(matriz, min_periods, workers, similitud=similitud, contraccion=contraccion)
+        etapas["corr"] = round(time.perf_counter() - marca, 3)
+
+    columnas = pd.Index(ids.astype(np.int64), name='anime_id')
+    corrMatrix = pd.DataFrame(corr, index=columnas, columns=columnas)
+
+    informe = {
+        "modo": "sparse",
+        "similitud": similitud,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "pico_rss_mb": pico.valor(),
+        "pico_rss_mb_proceso": pico_rss_mb(),
+        "usuarios": matriz.shape[0],
+        "animes": matriz.shape[1],
+        "workers": workers,
+        "cache_ratings": desde_cache,
+        "ratings": int(len(valores)),
+        "segundos_lectura": segundos_lectura,
+        "pico_rss_mb_lectura": pico_lectura,
+        "etapas": etapas,
+    }
+    return corrMatrix, informe
@@ -0,0 +1,240 @@
+# Evaluacion offline de un modelo: separa de rating.csv una parte de las calificaciones de cada usuario (holdout),
+# entrena con el resto por el mismo camino que /entrenar (entrenar_sparse + indice de vecinos + Modelo)
+# y puntua a todos los usuarios del holdout por lotes, repartidos en procesos
+# Mide precision@n, recall@n y NDCG@n (un anime del holdout es relevante si su nota llega a --umbral),
+# cobertura del catalogo (fraccion de animes del modelo que sale en alguna recomendacion) y usuarios/s
+# Asi se puede comparar calidad contra velocidad de cada variante (similitud, umbrales, modo vecinos con k, formato_corr...)
+# Uso (desde la carpeta BackEnd): python evaluacion.py --ratings rating.csv --holdout 0.2 --workers 4
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from entrenamiento import cargar_ratings, entrenar_sparse, workers_por_defecto, pico_rss_mb, SIMILITUDES, CONTRACCION, MIN_RATINGS_ANIME, MIN_PERIODS
+from modelo import Modelo, MODOS_PUNTUACION
+from motor_recomendacion import construir_indice_vecinos, compactar_corr, TOP_N, VECINOS_K, FORMATOS_CORR, UMBRAL_DISPERSO
+
+FRACCION_HOLDOUT = 0.2 # Parte de las calificaciones de cada usuario que se aparta para evaluar
+MIN_RATINGS_USUARIO = 5 # Los usuarios con menos calificaciones no se evaluan (se quedan enteros para entrenar)
+UMBRAL_RELEVANTE = 8 # Nota minima de un anime del holdout para que acertarlo cuente
+TAM_LOTE_EVALUACION = 1024 # Usuarios que puntua cada tarea de una vez con puntuar_lote
+
+
+def dividir_por_usuario(usuarios, animes, valores, fraccion=FRACCION_HOLDOUT, min_ratings_usuario=MIN_RATINGS_USUARIO, semilla=0):
+    # Reparte las calificaciones en entrenamiento y holdout: de cada usuario con al menos min_ratings_usuario
+    # se aparta al azar floor(fraccion * calificaciones) (minimo 1). Con la misma semilla sale siempre lo mismo
+    # Los pares (usuario, anime) repetidos se juntan antes en uno con la media (como csr_medias), asi
+    # un mismo anime nunca queda a la vez en entrenamiento y en holdout
+    # Devuelve ((usuarios, animes, valores) de entrenamiento, (usuarios, animes, valores) de holdout), ordenados por usuario
+    claves = (usuarios.astype(np.int64) << 32) | animes.astype(np.int64)
+    claves, posicion = np.unique(claves, return_inverse=True)
+    valores = np.bincount(posicion, weights=valores) / np.bincount(posicion)
+    usuarios, animes = (claves >> 32).astype(np.int32), (claves & 0xFFFFFFFF).astype(np.int32)
+
+    _, inicios, conteos = np.unique(usuarios, return_index=True, return_counts=True)
+    apartar = np.where(conteos >= min_ratings_usuario, np.maximum(1, (conteos * fraccion).astype(np.int64)), 0)
+
+    # Posicion de cada calificacion dentro de su usuario en un orden aleatorio: las primeras van al holdout
+    rng = np.random.default_rng(semilla)
+    orden = np.lexsort((rng.random(len(claves)), usuarios))
+    puesto = np.empty(len(claves), dtype=np.int64)
+    puesto[orden] = np.arange(len(claves)) - np.repeat(inicios, conteos)
+    holdout = puesto < np.repeat(apartar, conteos)
+
+    entrenamiento = ~holdout
+    return (
+        (usuarios[entrenamiento], animes[entrenamiento], valores[entrenamiento]),
+        (usuarios[holdout], animes[holdout], valores[holdout]),
+    )
+
+
+def preparar_usuarios(motor, entrenamiento, holdout, umbral=UMBRAL_RELEVANTE):
+    # Usuarios evaluables: con algun anime relevante en el holdout y alguna calificacion de entrenamiento
+    # que este en el modelo (si no, la API no podria recomendarles nada)
+    # Los relevantes cuentan aunque no esten en el modelo: un modelo con menos animes no puede acertarlos
+    # Devuelve (usuarios, perfiles, relevantes) con perfiles y relevantes como (animes, valores/None, desplazamientos)
+    usuarios_e, animes_e, valores_e = entrenamiento
+    usuarios_h, animes_h, valores_h = holdout
+
+    en_modelo = np.isin(animes_e, motor.ids)
+    usuarios_e, animes_e, valores_e = usuarios_e[en_modelo], animes_e[en_modelo], valores_e[en_modelo]
+    relevante = valores_h >= umbral
+    usuarios_h, animes_h = usuarios_h[relevante], animes_h[relevante]
+
+    evaluados = np.intersect1d(usuarios_e, usuarios_h)
+    en_e, en_h = np.isin(usuarios_e, evaluados), np.isin(usuarios_h, evaluados)
+    usuarios_e, animes_e, valores_e = usuarios_e[en_e], animes_e[en_e], valores_e[en_e]
+    usuarios_h, animes_h = usuarios_h[en_h], animes_h[en_h]
+
+    # Los arrays vienen ordenados por usuario: cada usuario es un tramo [desplazamientos[i], desplazamientos[i + 1])
+    desplazamientos_e = np.searchsorted(usuarios_e, evaluados, side="left")
+    desplazamientos_h = np.searchsorted(usuarios_h, evaluados, side="left")
+    perfiles = (animes_e, valores_e, np.append(desplazamientos_e, len(animes_e)))
+    relevantes = (animes_h, None, np.append(desplazamientos_h, len(animes_h)))
+    return evaluados, perfiles, relevantes
+
+
+def _iniciar_evaluador(motor, n):
+    global _MOTOR, _N, _DESCUENTOS
+    _MOTOR, _N = motor, n
+    _DESCUENTOS = 1 / np.log2(np.arange(2, n + 2)) # Descuento de cada puesto del top para el NDCG
+
+
+def _evaluar_lote(animes_e, valores_e, desplazamientos_e, animes_h, desplazamientos_h):
+    # Puntua un lote de usuarios y devuelve las sumas de sus metricas y los animes recomendados
+    perfiles = [
+        dict(zip(animes_e[inicio:fin].tolist(), valores_e[inicio:fin].tolist()))
+        for inicio, fin in zip(desplazamientos_e[:-1], desplazamientos_e[1:])
+    ]
+    tops = _MOTOR.puntuar_lote(perfiles, _N)
+
+    precision = recall = ndcg = 0.0
+    recomendados = set()
+    for top, inicio, fin in zip(tops, desplazamientos_h[:-1], desplazamientos_h[1:]):
+        relevantes = set(animes_h[inicio:fin].tolist())
+        aciertos = np.fromiter((aid in relevantes for aid, _ in top), dtype=bool, count=len(top))
+        recomendados.update(aid for aid, _ in top)
+        precision += aciertos.sum() / _N
+        recall += aciertos.sum() / len(relevantes)
+        ndcg += _DESCUENTOS[:len(top)][aciertos].sum() / _DESCUENTOS[:min(len(relevantes), _N)].sum()
+    return len(perfiles), precision, recall, ndcg, recomendados
+
+
+def evaluar_modelo(motor, perfiles, relevantes, n=TOP_N, workers=None, tam_lote=TAM_LOTE_EVALUACION):
+    # Metricas medias de todos los usuarios, puntuados por lotes de tam_lote en `workers` procesos
+    # Los lotes son siempre los mismos y las sumas se hacen en orden, asi el resultado no depende de los workers
+    workers = workers_por_defecto() if workers is None else max(1, int(workers))
+    animes_e, valores_e, desplazamientos_e = perfiles
+    animes_h, _, desplazamientos_h = relevantes
+    total = len(desplazamientos_e) - 1
+
+    lotes = []
+    for inicio in range(0, total, tam_lote):
+        fin = min(inicio + tam_lote, total)
+        e0, e1, h0, h1 = desplazamientos_e[inicio], desplazamientos_e[fin], desplazamientos_h[inicio], desplazamientos_h[fin]
+        lotes.append((
+            animes_e[e0:e1], valores_e[e0:e1], desplazamientos_e[inicio:fin + 1] - e0,
+            animes_h[h0:h1], desplazamientos_h[inicio:fin + 1] - h0,
+        ))
+    workers = min(workers, len(lotes)) if lotes else 1
+
+    inicio = time.perf_counter()
+    if workers == 1:
+        _iniciar_evaluador(motor, n)
+        resultados = [_evaluar_lote(*lote) for lote in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_evaluador, initargs=(motor, n)) as pool:
+            resultados = list(pool.map(_evaluar_lote, *zip(*lotes)))
+    segundos = time.perf_counter() - inicio
+
+    usuarios = sum(r[0] for r in resultados)
+    recomendados = set().union(*(r[4] for r in resultados))
+    media = lambda i: round(float(sum(r[i] for r in resultados)) / usuarios, 6) if usuarios else None
+    return {
+        "usuarios": usuarios,
+        f"precision@{n}": media(1),
+        f"recall@{n}": media(2),
+        f"ndcg@{n}": media(3),
+        "cobertura": round(len(recomendados) / len(motor.ids), 6) if len(motor.ids) else None,
+        "animes_recomendados": len(recomendados),
+        "workers": workers,
+        "segundos": round(segundos, 3),
+        "usuarios_por_segundo": round(usuarios / segundos, 1) if segundos else None,
+    }
+
+
+def evaluar(ratings_file, anime, fraccion=FRACCION_HOLDOUT, min_ratings_usuario=MIN_RATINGS_USUARIO, umbral=UMBRAL_RELEVANTE,
+            semilla=0, n=TOP_N, workers=None, tam_lote=TAM_LOTE_EVALUACION, modo_puntuacion="completo", k=VECINOS_K,
+            ruta_cache=None, formato_corr="float32", umbral_disperso=UMBRAL_DISPERSO, **opciones):
+    # Evaluacion completa: division por usuario -> entrenamiento con la parte de entrenamiento -> puntuacion del holdout
+    # opciones: similitud, contraccion, min_ratings y min_periods de entrenar_sparse
+    # Devuelve el informe con las metricas, los tiempos de cada fase y las opciones usadas
+    inicio = time.perf_counter()
+    anime_ids = anime['anime_id'].to_numpy()
+    usuarios, animes, valores, _ = cargar_ratings(ratings_file, ruta_cache, anime_ids_validos=anime_ids)
+    entrenamiento, holdout = dividir_por_usuario(usuarios, animes, valores, fraccion, min_ratings_usuario, semilla)
+    del usuarios, animes, valores
+    segundos_division = time.perf_counter() - inicio
+
+    marca = time.perf_counter()
+    corrMatrix, informe_entrenamiento = entrenar_sparse(None, anime_ids, workers=workers, ratings=entrenamiento, **opciones)
+    vecinos = construir_indice_vecinos(corrMatrix.to_numpy(), k)
+    compacta = compactar_corr(corrMatrix.to_numpy(), formato_corr, umbral_disperso)
+    modelo = Modelo(corrMatrix, anime, {"formato_corr": formato_corr}, vecinos, modo_puntuacion, compacta)
+    segundos_entrenamiento = time.perf_counter() - marca
+
+    marca = time.perf_counter()
+    _, perfiles, relevantes = preparar_usuarios(modelo.motor, entrenamiento, holdout, umbral)
+    segundos_preparar = time.perf_counter() - marca
+    metricas = evaluar_modelo(modelo.motor, perfiles, relevantes, n, workers, tam_lote)
+
+    return {
+        **metricas,
+        "opciones": {
+            "fraccion": fraccion, "min_ratings_usuario": min_ratings_usuario, "umbral": umbral, "semilla": semilla,
+            "modo_puntuacion": modo_puntuacion, "k": k, "formato_corr": formato_corr, "umbral_disperso": umbral_disperso, **opciones,
+        },
+        "ratings_entrenamiento": int(len(entrenamiento[0])),
+        "ratings_holdout": int(len(holdout[0])),
+        "animes_modelo": int(len(modelo.motor.ids)),
+        "etapas": {
+            "division": round(segundos_division, 3),
+            "entrenamiento": round(segundos_entrenamiento, 3),
+            "preparar": round(segundos_preparar, 3),
+            "puntuacion": metricas["segundos"],
+        },
+        "entrenamiento": informe_entrenamiento,
+        "segundos_total": round(time.perf_counter() - inicio, 3),
+        "pico_rss_mb": pico_rss_mb(),
+    }
+
+
+def main():
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Evaluacion offline con holdout por usuario")
+    parser.add_argument("--ratings", default=os.path.join(carpeta, "rating.csv"))
+    parser.add_argument("--anime", default=os.path.join(carpeta, "anime.csv"))
+    parser.add_argument("--cache", help="Cache de ratings limpios (p. ej. cache_ratings.npz) para no releer el CSV")
+    parser.add_argument("--holdout", type=float, default=FRACCION_HOLDOUT)
+    parser.add_argument("--min-ratings-usuario", type=int, default=MIN_RATINGS_USUARIO)
+    parser.add_argument("--umbral", type=float, default=UMBRAL_RELEVANTE)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--n", type=int, default=TOP_N, help="Recomendaciones por usuario (el @n de las metricas)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tam-lote", type=int, default=TAM_LOTE_EVALUACION)
+    parser.add_argument("--similitud", choices=SIMILITUDES, default="pearson")
+    parser.add_argument("--contraccion", type=float, default=CONTRACCION)
+    parser.add_argument("--min-ratings", type=int, default=MIN_RATINGS_ANIME)
+    parser.add_argument("--min-periods", type=int, default=MIN_PERIODS)
+    parser.add_argument("--modo", choices=MODOS_PUNTUACION, default="completo")
+    parser.add_argument("--k", type=int, default=VECINOS_K, help="Vecinos por anime del modo vecinos")
+    parser.add_argument("--formato", choices=FORMATOS_CORR, default="float32", help="Formato de corrMatrix al puntuar")
+    parser.add_argument("--umbral-disperso", type=float, default=UMBRAL_DISPERSO)
+    parser.add_argument("--guardar", help="Archivo JSON donde guardar el informe")
+    args = parser.parse_args()
+    if not 0 < args.holdout < 1:
+        parser.error("--holdout debe estar entre 0 y 1")
+
+    from API_RecomendacionesAnimes import cargar_anime # La misma limpieza de anime.csv que al entrenar la API
+    informe = evaluar(
+        args.ratings, cargar_anime(args.anime), args.holdout, args.min_ratings_usuario, args.umbral, args.semilla,
+        args.n, args.workers, args.tam_lote, args.modo, args.k, args.cache, args.formato, args.umbral_disperso, similitud=args.similitud,
+        contraccion=args.contraccion, min_ratings=args.min_ratings, min_periods=args.min_periods,
+    )
+
+    n = args.n
+    print(f"{informe['usuarios']} usuarios evaluados | {informe['animes_modelo']} animes en el modelo "
+          f"({args.similitud}, modo {args.modo}, {args.formato}) | {informe['ratings_entrenamiento']} ratings de entrenamiento, {informe['ratings_holdout']} de holdout")
+    print(f"precision@{n} {informe[f'precision@{n}']} | recall@{n} {informe[f'recall@{n}']} | ndcg@{n} {informe[f'ndcg@{n}']} | cobertura {informe['cobertura']}")
+    print(f"puntuacion: {informe['etapas']['puntuacion']} s con {informe['workers']} workers ({informe['usuarios_por_segundo']} usuarios/s) | "
+          f"total {informe['segundos_total']} s (etapas {informe['etapas']}) | pico RSS {informe['pico_rss_mb']} MB")
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
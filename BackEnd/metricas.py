@@ -0,0 +1,149 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Limites (segundos) de los histogramas de las peticiones y de las etapas del entrenamiento
+LIMITES_PETICION = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_ENTRENAMIENTO = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+
+class Histograma():
+    # Histograma en formato Prometheus (contadores por limite, suma y total) para cada combinacion de etiquetas
+    def __init__(self, nombre, ayuda, etiquetas, limites=LIMITES_PETICION):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(sorted(limites))
+        self.__series = {} # valores de las etiquetas -> [contadores por limite (+Inf al final), suma]
+        self.__lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        # etiquetas en el mismo orden que self.etiquetas
+        posicion = bisect.bisect_left(self.limites, valor)
+        with self.__lock:
+            serie = self.__series.get(etiquetas)
+            if serie is None:
+                serie = self.__series[etiquetas] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][posicion] += 1
+            serie[1] += valor
+
+    def texto(self):
+        # Lineas del formato de exposicion de Prometheus (los "le" son acumulados)
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self.__lock:
+            series = [(etiquetas, list(contadores), suma) for etiquetas, (contadores, suma) in sorted(self.__series.items())]
+        for etiquetas, contadores, suma in series:
+            base = ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(self.etiquetas, etiquetas))
+            acumulado = 0
+            for limite, contador in zip(self.limites + (float("inf"),), contadores):
+                acumulado += contador
+                le = "+Inf" if limite == float("inf") else repr(float(limite))
+                lineas.append(f'{self.nombre}_bucket{{{base + "," if base else ""}le="{le}"}} {acumulado}')
+            sufijo = f"{{{base}}}" if base else ""
+            lineas.append(f"{self.nombre}_sum{sufijo} {suma!r}")
+            lineas.append(f"{self.nombre}_count{sufijo} {acumulado}")
+        return "\n".join(lineas)
+
+
+class RegistroMetricas():
+    # Conjunto de histogramas que se exponen juntos en /metrics
+    # Las metricas son de cada proceso: con varios workers de gunicorn cada uno lleva las suyas
+    def __init__(self):
+        self.__histogramas = {}
+        self.__lock = threading.Lock()
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_PETICION):
+        with self.__lock:
+            if nombre not in self.__histogramas:
+                self.__histogramas[nombre] = Histograma(nombre, ayuda, etiquetas, limites)
+            return self.__histogramas[nombre]
+
+    def texto(self):
+        with self.__lock:
+            histogramas = list(self.__histogramas.values())
+        return "\n".join(h.texto() for h in histogramas) + "\n"
+
+
+class Cronometro():
+    # Tiempos por etapa de una peticion: with crono.etapa("puntuar"): ...
+    # Se pasa de funcion en funcion; al terminar la peticion se vuelcan a los histogramas y/o a Server-Timing
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = [] # (nombre, segundos) en el orden en que ocurrieron
+
+    def etapa(self, nombre):
+        return _Etapa(self, nombre)
+
+    def anotar(self, nombre, segundos):
+        self.etapas.append((nombre, segundos))
+
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+    def server_timing(self):
+        # Valor de la cabecera Server-Timing (duraciones en ms, la ultima entrada es el total)
+        partes = [f"{nombre};dur={segundos * 1000:.3f}" for nombre, segundos in self.etapas]
+        partes.append(f"total;dur={self.total() * 1000:.3f}")
+        return ", ".join(partes)
+
+
+class _Etapa():
+    __slots__ = ("crono", "nombre", "inicio")
+
+    def __init__(self, crono, nombre):
+        self.crono, self.nombre = crono, nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        self.crono.anotar(self.nombre, time.perf_counter() - self.inicio)
+        return False
+
+
+class PerfiladorMuestreo():
+    # Perfilador de muestreo para una sola peticion: un hilo aparte mira cada `intervalo` segundos la pila del hilo
+    # que atiende la peticion (sys._current_frames) y cuenta cada pila. No toca el codigo perfilado
+    # guardar() escribe las pilas en formato "folded" (una linea "a;b;c muestras"), el que leen flamegraph.pl
+    # y speedscope para dibujar el flamegraph
+    def __init__(self, hilo_id=None, intervalo=0.001):
+        self.hilo_id = threading.get_ident() if hilo_id is None else hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self.__parar = threading.Event()
+        self.__hilo = threading.Thread(target=self.__muestrear, name="perfilador", daemon=True)
+
+    def iniciar(self):
+        self.__hilo.start()
+        return self
+
+    def parar(self):
+        self.__parar.set()
+        self.__hilo.join()
+        return self
+
+    def __muestrear(self):
+        while not self.__parar.wait(self.intervalo):
+            marco = sys._current_frames().get(self.hilo_id)
+            pila = []
+            while marco is not None:
+                codigo = marco.f_code
+                pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{marco.f_lineno})")
+                marco = marco.f_back
+            if pila:
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def guardar(self, ruta):
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        with open(ruta, "w", encoding="utf-8") as f:
+            for pila, muestras in self.pilas.most_common():
+                f.write(f"{pila} {muestras}\n")
+        return ruta
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
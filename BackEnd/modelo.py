@@ -0,0 +1,41 @@
+import uuid
+import numpy as np
+from motor_recomendacion import MotorVecinos, crear_motor
+from catalogo import Catalogo
+from contenido import IndiceContenido
+
+MODOS_PUNTUACION = ("completo", "vecinos") # Matriz completa o solo el indice de los K vecinos
+
+class Modelo():
+    # Foto de todo lo que hace falta para servir peticiones: corrMatrix, anime y el motor de puntuacion
+    # No se modifica nunca: al reentrenar se construye uno nuevo y se publica cambiando una sola referencia,
+    # asi una peticion que ya cogio el modelo anterior lo usa entero y nunca ve una mezcla de los dos
+    # vecinos es la tupla (vecinos, pesos) del indice de vecinos; con modo_puntuacion="vecinos" se puntua solo con el
+    # compacta es corrMatrix en el formato_corr de meta (compactar_corr); si esta, el modo completo puntua con ella
+    # contenido es la tupla (ids, vecinos, pesos) del indice por contenido; sin el los animes fuera de corrMatrix se ignoran
+    def __init__(self, corrMatrix, anime, meta=None, vecinos=None, modo_puntuacion="completo", compacta=None, contenido=None):
+        if modo_puntuacion not in MODOS_PUNTUACION:
+            raise ValueError(f"Modo de puntuacion desconocido: {modo_puntuacion}")
+        if modo_puntuacion == "vecinos" and vecinos is None:
+            raise ValueError("El modo de puntuacion 'vecinos' necesita el indice de vecinos")
+
+        self.corrMatrix = corrMatrix
+        self.anime = anime
+        self.vecinos = vecinos
+        self.modo_puntuacion = modo_puntuacion
+        self.meta = dict(meta or {})
+        self.formato_corr = self.meta.get("formato_corr", "float32") if compacta else "float32"
+        if modo_puntuacion == "vecinos":
+            self.motor = MotorVecinos(corrMatrix.columns, *vecinos)
+        else:
+            self.motor = crear_motor(corrMatrix, self.formato_corr, compacta)
+        self.catalogo = Catalogo(anime, corrMatrix.columns) # Animes recomendables para /animes
+        self.contenido = None
+        if contenido is not None:
+            nombres = dict(zip(anime['anime_id'].to_numpy(dtype=np.int64).tolist(), anime['name'].tolist()))
+            self.contenido = IndiceContenido(*contenido, nombres)
+        # Identificador de esta version: el id_modelo guardado en disco (el mismo en todos los procesos) o uno nuevo
+        self.version = self.meta.get("id_modelo") or uuid.uuid4().hex[:12]
+
+    def __str__(self):
+        return f"Modelo {self.version} ({len(self.corrMatrix.columns)} animes, puntuacion {self.modo_puntuacion}, {self.formato_corr})"
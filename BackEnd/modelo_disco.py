@@ -0,0 +1,232 @@
+# Formato en disco del modelo: una carpeta versionada en vez de un .pkl
+#   meta.json   -> version del formato y datos del entrenamiento
+#   corr.npy    -> corrMatrix como float32 crudo (se abre con mmap, compartido entre procesos)
+#   ids.npy     -> anime_id de cada fila/columna de corr.npy
+#   anime.npz   -> metadatos de anime guardados por columnas (comprimido, es pequeño)
+#   vecinos.npy / pesos.npy -> indice de los K vecinos mas correlacionados de cada anime (int32 / float32)
+#   contenido_ids.npy / contenido_vecinos.npy / contenido_pesos.npy -> indice de vecinos por contenido (generos y tipo)
+#                  de todos los animes de la tabla hacia las columnas del modelo, para los animes que no estan en corrMatrix
+#   corr_*.npy  -> corrMatrix en forma compacta si se entreno con formato_corr float16, int8 o disperso
+#                  (corr.npy se guarda siempre: la usan las actualizaciones incrementales, al servir no se lee)
+# Los ratings no forman parte del modelo que se sirve: van a una cache de entrenamiento aparte
+# que solo se lee al reentrenar (/entrenar?force=true)
+# Las actualizaciones incrementales usan otra carpeta con los estadisticos suficientes de cada par (N, SX, SXX, SXY)
+# Uso para convertir un .pkl antiguo: python modelo_disco.py modelo_corrMatrix.pkl [carpeta_destino] [cache_ratings]
+import json
+import os
+import pickle
+import shutil
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+FORMATO_MODELO = 2 # Subir si cambia la estructura de la carpeta
+FORMATOS_COMPATIBLES = (1, 2) # El formato 1 ademas traia ratings.npz, que ya no se lee
+
+
+def guardar_modelo(carpeta, corrMatrix, anime, meta=None, vecinos=None, compacta=None, contenido=None):
+    # vecinos: tupla (vecinos, pesos) del indice de vecinos, opcional
+    # contenido: tupla (ids, vecinos, pesos) de construir_indice_contenido, opcional
+    # compacta: {nombre: array} de compactar_corr, opcional (cada array va a <nombre>.npy)
+    temporal = _carpeta_temporal(carpeta)
+
+    np.save(os.path.join(temporal, "corr.npy"), np.ascontiguousarray(corrMatrix.to_numpy(dtype=np.float32)))
+    np.save(os.path.join(temporal, "ids.npy"), np.asarray(corrMatrix.columns, dtype=np.int64))
+    _guardar_columnas(os.path.join(temporal, "anime.npz"), anime, comprimir=True)
+
+    meta = {"formato": FORMATO_MODELO, "animes": len(corrMatrix.columns), **(meta or {})}
+    if vecinos is not None:
+        np.save(os.path.join(temporal, "vecinos.npy"), np.asarray(vecinos[0], dtype=np.int32))
+        np.save(os.path.join(temporal, "pesos.npy"), np.asarray(vecinos[1], dtype=np.float32))
+        meta["vecinos_k"] = int(vecinos[0].shape[1])
+    if contenido is not None:
+        for nombre, array, tipo in zip(("ids", "vecinos", "pesos"), contenido, (np.int64, np.int32, np.float32)):
+            np.save(os.path.join(temporal, f"contenido_{nombre}.npy"), np.asarray(array, dtype=tipo))
+        meta["contenido_k"] = int(contenido[1].shape[1])
+    if compacta:
+        for nombre, array in compacta.items():
+            np.save(os.path.join(temporal, f"{nombre}.npy"), array)
+        meta["archivos_corr"] = sorted(compacta)
+        meta["bytes_corr"] = int(sum(array.nbytes for array in compacta.values()))
+
+    with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    _publicar_carpeta(temporal, carpeta)
+
+
+def cargar_modelo(carpeta):
+    # Devuelve (corrMatrix, anime, meta). corrMatrix queda sobre un mmap de solo lectura:
+    # no se copia a RAM y todos los procesos que abren el mismo archivo comparten las paginas
+    meta = leer_meta(carpeta)
+    if meta.get("formato") not in FORMATOS_COMPATIBLES:
+        raise ValueError(f"Formato de modelo {meta.get('formato')} no soportado (se esperaba {FORMATO_MODELO}), vuelve a entrenar")
+
+    corr = np.load(os.path.join(carpeta, "corr.npy"), mmap_mode='r')
+    ids = pd.Index(np.load(os.path.join(carpeta, "ids.npy")), name='anime_id')
+    corrMatrix = pd.DataFrame(corr, index=ids, columns=ids, copy=False)
+
+    anime = _cargar_columnas(os.path.join(carpeta, "anime.npz"))
+    return corrMatrix, anime, meta
+
+
+def cargar_vecinos(carpeta):
+    # Indice de vecinos (vecinos, pesos) con mmap, o None si el modelo se guardo sin el
+    if not os.path.exists(os.path.join(carpeta, "vecinos.npy")):
+        return None
+    return (
+        np.load(os.path.join(carpeta, "vecinos.npy"), mmap_mode='r'),
+        np.load(os.path.join(carpeta, "pesos.npy"), mmap_mode='r')
+    )
+
+
+def cargar_contenido(carpeta):
+    # Indice de vecinos por contenido (ids, vecinos, pesos) con mmap, o None si el modelo se guardo sin el
+    if not os.path.exists(os.path.join(carpeta, "contenido_ids.npy")):
+        return None
+    return tuple(np.load(os.path.join(carpeta, f"contenido_{nombre}.npy"), mmap_mode='r') for nombre in ("ids", "vecinos", "pesos"))
+
+
+def cargar_corr_compacta(carpeta, meta):
+    # {nombre: array con mmap} de la corrMatrix compacta, o None si el modelo solo tiene corr.npy
+    if not meta.get("archivos_corr"):
+        return None
+    return {nombre: np.load(os.path.join(carpeta, f"{nombre}.npy"), mmap_mode='r') for nombre in meta["archivos_corr"]}
+
+
+def leer_meta(carpeta):
+    with open(os.path.join(carpeta, "meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def existe_modelo(carpeta):
+    return os.path.exists(os.path.join(carpeta, "meta.json"))
+
+
+def convertir_pkl(ruta_pkl, carpeta, ruta_cache=None):
+    # Conversion de una sola vez del modelo_corrMatrix.pkl antiguo al formato de carpeta
+    # Los ratings que traia el pickle pasan a la cache de entrenamiento (si se indica ruta_cache)
+    with open(ruta_pkl, "rb") as f:
+        data = pickle.load(f)
+    guardar_modelo(carpeta, data["corrMatrix"], data["anime"], {"origen": os.path.basename(ruta_pkl)})
+
+    ratings = data.get("ratings")
+    if ruta_cache and ratings is not None:
+        guardar_cache_ratings(
+            ruta_cache,
+            ratings['user_id'].to_numpy(dtype=np.int32),
+            ratings['anime_id'].to_numpy(dtype=np.int32),
+            ratings['user_rating'].to_numpy(dtype=np.float32)
+        )
+
+
+def guardar_cache_ratings(ruta, usuarios, animes, valores, ratings_file=None, anime_ids=None):
+    # Cache de entrenamiento: los ratings ya limpios por columnas, junto con la fecha/tamaño del CSV de origen
+    # para saber si sigue siendo valida. Si se filtraron por los anime_id de anime.csv se guarda tambien
+    # una huella de esos ids (con otro anime.csv la cache ya no vale)
+    origen = os.stat(ratings_file) if ratings_file and os.path.exists(ratings_file) else None
+    np.savez(
+        ruta,
+        user_id=usuarios, anime_id=animes, user_rating=valores,
+        origen=np.array([origen.st_mtime_ns, origen.st_size] if origen else [-1, -1], dtype=np.int64),
+        filtro=_huella_ids(anime_ids)
+    )
+
+
+def cache_ratings_valida(ruta, ratings_file, anime_ids=None):
+    # La cache vale si existe y el CSV no ha cambiado desde que se creo ni se filtro con otros anime_id
+    # (si ya no hay CSV la cache es lo unico que queda y vale siempre)
+    if not ruta or not os.path.exists(ruta):
+        return False
+    if not os.path.exists(ratings_file):
+        return True
+    with np.load(ruta, allow_pickle=False) as datos:
+        mtime, tam = datos["origen"]
+        filtro = datos["filtro"] if "filtro" in datos.files else _huella_ids(None)
+    actual = os.stat(ratings_file)
+    return mtime == actual.st_mtime_ns and tam == actual.st_size and np.array_equal(filtro, _huella_ids(anime_ids))
+
+
+def _huella_ids(anime_ids):
+    # (cantidad, crc32) de los ids ordenados; [-1, -1] si no se filtro
+    if anime_ids is None:
+        return np.array([-1, -1], dtype=np.int64)
+    ids = np.unique(np.asarray(anime_ids, dtype=np.int64))
+    return np.array([len(ids), zlib.crc32(ids.tobytes())], dtype=np.int64)
+
+
+def cargar_cache_ratings(ruta):
+    # Devuelve (usuarios, animes, valores) como arrays compactos
+    with np.load(ruta, allow_pickle=False) as datos:
+        return datos["user_id"], datos["anime_id"], datos["user_rating"]
+
+
+def guardar_estadisticas(carpeta, ids, estadisticas, conteo_ids, conteos, meta):
+    # ids: animes populares (filas/columnas de los estadisticos), conteo_ids/conteos: calificaciones de todos los animes
+    temporal = _carpeta_temporal(carpeta)
+    np.save(os.path.join(temporal, "ids.npy"), np.asarray(ids, dtype=np.int64))
+    for nombre, matriz in estadisticas.items():
+        np.save(os.path.join(temporal, f"{nombre}.npy"), matriz)
+    np.save(os.path.join(temporal, "conteo_ids.npy"), np.asarray(conteo_ids, dtype=np.int64))
+    np.save(os.path.join(temporal, "conteos.npy"), np.asarray(conteos, dtype=np.int64))
+    with open(os.path.join(temporal, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"formato": FORMATO_MODELO, "estadisticas": list(estadisticas), **meta}, f, indent=2)
+    _publicar_carpeta(temporal, carpeta)
+
+
+def cargar_estadisticas(carpeta):
+    # Devuelve (ids, {nombre: matriz}, conteo_ids, conteos, meta) con las matrices en memoria (se van a modificar)
+    meta = leer_meta(carpeta)
+    estadisticas = {nombre: np.load(os.path.join(carpeta, f"{nombre}.npy")) for nombre in meta["estadisticas"]}
+    ids = np.load(os.path.join(carpeta, "ids.npy"))
+    conteo_ids = np.load(os.path.join(carpeta, "conteo_ids.npy"))
+    conteos = np.load(os.path.join(carpeta, "conteos.npy"))
+    return ids, estadisticas, conteo_ids, conteos, meta
+
+
+def _carpeta_temporal(carpeta):
+    # Todo se escribe primero en una carpeta temporal, para no dejar nunca un modelo a medias
+    temporal = carpeta.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    return temporal
+
+
+def _publicar_carpeta(temporal, carpeta):
+    # Cambia la carpeta temporal ya completa por la anterior
+    anterior = carpeta.rstrip(os.sep) + ".old"
+    shutil.rmtree(anterior, ignore_errors=True)
+    if os.path.exists(carpeta):
+        os.replace(carpeta, anterior)
+    os.replace(temporal, carpeta)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+
+def _guardar_columnas(ruta, df, comprimir=False):
+    # Cada columna se guarda como un array propio (los textos como unicode de ancho fijo, sin pickle)
+    columnas = {}
+    for col in df.columns:
+        valores = df[col].to_numpy()
+        if valores.dtype == object or isinstance(df[col].dtype, pd.StringDtype):
+            valores = df[col].astype(str).to_numpy(dtype=str)
+        columnas[col] = valores
+    (np.savez_compressed if comprimir else np.savez)(ruta, **columnas)
+
+
+def _cargar_columnas(ruta):
+    with np.load(ruta, allow_pickle=False) as datos:
+        return pd.DataFrame({col: datos[col] for col in datos.files})
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python modelo_disco.py modelo_corrMatrix.pkl [carpeta_destino] [cache_ratings]")
+        sys.exit(1)
+
+    origen = sys.argv[1]
+    destino = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(origen)[0]
+    cache = sys.argv[3] if len(sys.argv) > 3 else os.path.join(os.path.dirname(os.path.abspath(origen)), "cache_ratings.npz")
+    convertir_pkl(origen, destino, cache)
+    print(f"\033[32m### Modelo convertido en {destino}\033[0m")
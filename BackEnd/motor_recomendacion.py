@@ -0,0 +1,324 @@
+import numpy as np
+from scipy import sparse
+
+TOP_N = 10
+VECINOS_K = 50 # Vecinos por anime que se guardan en el indice de vecinos
+TAM_LOTE = 1024 # Perfiles que se puntuan juntos en puntuar_lote (acota la memoria a perfiles x animes)
+# Formas de guardar y servir corrMatrix: float32 (la de siempre), float16 (mitad de bytes), int8 con una escala
+# por columna (la cuarta parte) o disperso (CSR solo con los pares con |r| >= umbral, sin los NaN)
+FORMATOS_CORR = ("float32", "float16", "int8", "disperso")
+UMBRAL_DISPERSO = 0.05 # |r| minimo de los pares que se guardan en el formato disperso
+NULO_INT8 = -128 # Valor de los pares sin correlacion (NaN) en el formato int8; los demas van de -127 a 127
+
+class MotorRecomendacion():
+    # Motor de puntuacion vectorizado: guarda la corrMatrix como un array denso float32
+    # y un mapa anime_id -> posicion para no tocar pandas en cada peticion
+    # matriz: la misma corrMatrix en float16 (formato "float16"), se puntua sin pasarla entera a float32
+    def __init__(self, corrMatrix, matriz=None):
+        self.ids = np.asarray(corrMatrix.columns, dtype=np.int64) # ids de los animes en el orden de las columnas
+        self.indice = {int(aid): pos for pos, aid in enumerate(self.ids)} # anime_id -> posicion en la matriz
+
+        # La matriz de correlacion es simetrica, asi que se leen filas (contiguas en memoria) en vez de columnas
+        # Los NaN se mantienen para saber que pares no llegaron al min_periods
+        self.matriz = np.ascontiguousarray(corrMatrix.to_numpy(dtype=np.float32) if matriz is None else matriz)
+        self.matriz.flags.writeable = False # El motor es de solo lectura, se comparte entre peticiones
+
+    def _filas(self, posiciones):
+        # Filas de la matriz en float32 con 0 en los pares sin correlacion, y la mascara de los que la tienen
+        # (en float16 se pasan antes a float32: isnan y where van mucho mas rapido que sobre float16)
+        filas = self.matriz[posiciones].astype(np.float32, copy=False)
+        validos = ~np.isnan(filas)
+        return np.where(validos, filas, np.float32(0)), validos
+
+    def contiene(self, anime_id):
+        return int(anime_id) in self.indice
+
+    def puntuar(self, user_ratings, n=TOP_N, extra=None):
+        # user_ratings es un diccionario {anime_id: calificacion} con ids ya validados (puede estar vacio si hay extra)
+        # extra: (posiciones, aportes) que se suman a los puntajes en la misma pasada, por ejemplo los de los animes
+        # del perfil que no estan en corrMatrix (IndiceContenido.aportes); esos animes pasan a ser candidatos
+        # Devuelve una lista de tuplas (anime_id, puntaje) ordenada de mayor a menor
+        posiciones = np.fromiter((self.indice[int(aid)] for aid in user_ratings), dtype=np.intp, count=len(user_ratings))
+        calificaciones = np.fromiter(user_ratings.values(), dtype=np.float64, count=len(user_ratings))
+
+        filas, validos = self._filas(posiciones) # (animes del usuario x todos los animes) y correlaciones existentes
+
+        # Un unico producto matriz-vector con los NaN puestos a 0
+        puntajes = calificaciones @ filas
+
+        # Solo son candidatos los animes con al menos una correlacion valida y que el usuario no haya calificado
+        candidatos = validos.any(axis=0)
+        if extra is not None:
+            sumar_aportes(puntajes, candidatos, extra)
+        candidatos[posiciones] = False
+        puntajes[~candidatos] = -np.inf
+
+        return seleccionar_top(self.ids, puntajes, int(np.count_nonzero(candidatos)), n)
+
+    def puntuar_lote(self, perfiles, n=TOP_N, tam_lote=TAM_LOTE):
+        # perfiles es una lista de diccionarios {anime_id: calificacion} con ids ya validados
+        # Devuelve una lista por perfil (en el mismo orden) igual que la de puntuar
+        resultados = []
+        for inicio in range(0, len(perfiles), tam_lote):
+            resultados.extend(self._puntuar_trozo(perfiles[inicio:inicio + tam_lote], n))
+        return resultados
+
+    def _puntuar_trozo(self, perfiles, n):
+        # Los perfiles se apilan en una matriz dispersa perfiles x animes y se puntuan con un solo producto
+        usuarios = np.repeat(np.arange(len(perfiles)), [len(p) for p in perfiles])
+        posiciones = np.fromiter((self.indice[int(aid)] for p in perfiles for aid in p), dtype=np.intp, count=len(usuarios))
+        calificaciones = np.fromiter((c for p in perfiles for c in p.values()), dtype=np.float64, count=len(usuarios))
+
+        # Solo hacen falta las filas de los animes que califico alguien del lote (el indexado ya devuelve una copia)
+        usados, columnas = np.unique(posiciones, return_inverse=True)
+        filas, validos = self._filas(usados)
+
+        # En float32 para que scipy no convierta el bloque entero a float64 (los puntajes difieren en ~1e-7 de puntuar)
+        forma = (len(perfiles), len(usados))
+        perfiles_csr = sparse.csr_matrix((calificaciones.astype(np.float32), (usuarios, columnas)), shape=forma)
+        califico = sparse.csr_matrix((np.ones(len(usuarios), dtype=bool), (usuarios, columnas)), shape=forma)
+
+        puntajes = (perfiles_csr @ filas).astype(np.float64)
+
+        # Mismos candidatos que en puntuar: alguna correlacion valida con lo calificado y no calificado ya
+        candidatos = califico @ validos
+        candidatos[usuarios, posiciones] = False
+        puntajes[~candidatos] = -np.inf
+
+        return seleccionar_top_lote(self.ids, puntajes, np.count_nonzero(candidatos, axis=1), n)
+
+
+class MotorCuantizado(MotorRecomendacion):
+    # Formato "int8": cada correlacion es un entero de -127 a 127 por la escala de su columna (NULO_INT8 si es NaN)
+    # Solo se pasan a float32 las filas de los animes del perfil, la matriz se queda en int8 (1 byte por par)
+    def __init__(self, corrMatrix, corr_q, escalas):
+        super().__init__(corrMatrix, corr_q)
+        self.escalas = np.asarray(escalas, dtype=np.float32)
+
+    def _filas(self, posiciones):
+        filas = self.matriz[posiciones]
+        validos = filas != NULO_INT8
+        return np.where(validos, filas, np.int8(0)) * self.escalas, validos
+
+
+class MotorDisperso():
+    # Formato "disperso": corrMatrix como CSR (datos, indices, indptr) solo con los pares con |r| >= umbral
+    # Un anime es candidato si tiene algun par guardado con lo que califico el usuario (los de |r| pequeño no cuentan)
+    # Misma interfaz que MotorRecomendacion
+    def __init__(self, corrMatrix, datos, indices, indptr):
+        self.ids = np.asarray(corrMatrix.columns, dtype=np.int64)
+        self.indice = {int(aid): pos for pos, aid in enumerate(self.ids)}
+        self.matriz = sparse.csr_matrix((datos, indices, indptr), shape=(len(self.ids), len(self.ids)), copy=False)
+
+    def contiene(self, anime_id):
+        return int(anime_id) in self.indice
+
+    def puntuar(self, user_ratings, n=TOP_N, extra=None):
+        posiciones = np.fromiter((self.indice[int(aid)] for aid in user_ratings), dtype=np.intp, count=len(user_ratings))
+        calificaciones = np.fromiter(user_ratings.values(), dtype=np.float64, count=len(user_ratings))
+
+        # Suma de las filas dispersas de lo calificado, cada una por su nota: solo se recorren los pares guardados
+        filas = self.matriz[posiciones]
+        puntajes = np.bincount(
+            filas.indices, weights=filas.data * np.repeat(calificaciones, np.diff(filas.indptr)), minlength=len(self.ids)
+        ).astype(np.float64, copy=False) # Con el perfil vacio (solo animes por contenido) bincount devuelve enteros
+        candidatos = np.zeros(len(self.ids), dtype=bool)
+        candidatos[filas.indices] = True
+        if extra is not None:
+            sumar_aportes(puntajes, candidatos, extra)
+        candidatos[posiciones] = False
+        puntajes[~candidatos] = -np.inf
+
+        return seleccionar_top(self.ids, puntajes, int(np.count_nonzero(candidatos)), n)
+
+    def puntuar_lote(self, perfiles, n=TOP_N, tam_lote=TAM_LOTE):
+        resultados = []
+        for inicio in range(0, len(perfiles), tam_lote):
+            resultados.extend(self._puntuar_trozo(perfiles[inicio:inicio + tam_lote], n))
+        return resultados
+
+    def _puntuar_trozo(self, perfiles, n):
+        # Igual que en MotorRecomendacion pero el producto es disperso por disperso: solo se recorren los pares guardados
+        usuarios = np.repeat(np.arange(len(perfiles)), [len(p) for p in perfiles])
+        posiciones = np.fromiter((self.indice[int(aid)] for p in perfiles for aid in p), dtype=np.intp, count=len(usuarios))
+        calificaciones = np.fromiter((c for p in perfiles for c in p.values()), dtype=np.float64, count=len(usuarios))
+
+        usados, columnas = np.unique(posiciones, return_inverse=True)
+        filas = self.matriz[usados]
+        forma = (len(perfiles), len(usados))
+        perfiles_csr = sparse.csr_matrix((calificaciones, (usuarios, columnas)), shape=forma)
+        califico = sparse.csr_matrix((np.ones(len(usuarios)), (usuarios, columnas)), shape=forma)
+
+        # Candidatos: algun par guardado con lo calificado (por la estructura de la CSR, no por el valor)
+        guardados = sparse.csr_matrix((np.ones(len(filas.data)), filas.indices, filas.indptr), shape=filas.shape)
+        puntajes = (perfiles_csr @ filas).toarray()
+        candidatos = (califico @ guardados).toarray() > 0
+        candidatos[usuarios, posiciones] = False
+        puntajes[~candidatos] = -np.inf
+
+        return seleccionar_top_lote(self.ids, puntajes, np.count_nonzero(candidatos, axis=1), n)
+
+
+class MotorVecinos():
+    # Motor que puntua solo con el indice de vecinos: para cada anime sus K animes mas correlacionados
+    # Coste O(animes del usuario x K) en vez de O(animes del usuario x todos los animes)
+    # Misma interfaz que MotorRecomendacion
+    def __init__(self, ids, vecinos, pesos):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.indice = {int(aid): pos for pos, aid in enumerate(self.ids)}
+        self.vecinos = vecinos # (animes x K) int32 con la posicion de cada vecino, -1 si no hay
+        self.pesos = pesos # (animes x K) float32 con la correlacion de cada vecino
+
+    def contiene(self, anime_id):
+        return int(anime_id) in self.indice
+
+    def puntuar(self, user_ratings, n=TOP_N, extra=None):
+        posiciones = np.fromiter((self.indice[int(aid)] for aid in user_ratings), dtype=np.intp, count=len(user_ratings))
+        calificaciones = np.fromiter(user_ratings.values(), dtype=np.float64, count=len(user_ratings))
+
+        vecinos = self.vecinos[posiciones]
+        validos = vecinos >= 0
+        apariciones = vecinos[validos]
+        aportes = (self.pesos[posiciones] * calificaciones[:, None])[validos]
+        if extra is not None:
+            apariciones = np.concatenate([apariciones, extra[0]])
+            aportes = np.concatenate([aportes, extra[1]])
+
+        # Se suman las aportaciones de cada vecino solo sobre los animes que aparecen
+        candidatos, inversa = np.unique(apariciones, return_inverse=True)
+        puntajes = np.bincount(inversa, weights=aportes, minlength=len(candidatos))
+
+        # Fuera los que ya califico el usuario
+        no_vistos = ~np.isin(candidatos, posiciones)
+        candidatos, puntajes = candidatos[no_vistos], puntajes[no_vistos]
+
+        return seleccionar_top(self.ids[candidatos], puntajes, len(candidatos), n)
+
+    def puntuar_lote(self, perfiles, n=TOP_N, tam_lote=TAM_LOTE):
+        # Con el indice cada perfil ya cuesta O(animes del usuario x K), se puntuan uno a uno
+        return [self.puntuar(perfil, n) for perfil in perfiles]
+
+
+def sumar_aportes(puntajes, candidatos, extra):
+    # Suma (posiciones, aportes) a un vector de puntajes de todos los animes y marca esas posiciones como candidatas
+    posiciones, aportes = extra
+    if len(posiciones):
+        puntajes += np.bincount(posiciones, weights=aportes, minlength=len(puntajes))
+        candidatos[posiciones] = True
+
+
+def seleccionar_top(ids, puntajes, total, n=TOP_N):
+    # Seleccion parcial de los n mejores (argpartition) y despues se ordenan solo esos
+    # Los que no son candidatos deben venir con puntaje -inf; total es cuantos candidatos hay
+    n = min(n, total)
+    if n == 0:
+        return []
+
+    mejores = np.argpartition(-puntajes, n - 1)[:n]
+    mejores = mejores[np.argsort(-puntajes[mejores], kind='stable')]
+
+    return [(int(ids[pos]), float(puntajes[pos])) for pos in mejores]
+
+
+def seleccionar_top_lote(ids, puntajes, totales, n=TOP_N):
+    # Igual que seleccionar_top pero para una matriz de puntajes (una fila por perfil) de una vez
+    # totales es cuantos candidatos tiene cada fila
+    n = min(n, puntajes.shape[1])
+    if n == 0:
+        return [[] for _ in range(puntajes.shape[0])]
+
+    mejores = np.argpartition(-puntajes, n - 1, axis=1)[:, :n]
+    valores = np.take_along_axis(puntajes, mejores, axis=1)
+    orden = np.argsort(-valores, axis=1, kind='stable')
+    mejores = np.take_along_axis(mejores, orden, axis=1)
+    valores = np.take_along_axis(valores, orden, axis=1)
+
+    return [
+        [(int(ids[pos]), float(p)) for pos, p in zip(fila_mejores[:total], fila_valores[:total])]
+        for fila_mejores, fila_valores, total in zip(mejores, valores, np.minimum(totales, n))
+    ]
+
+
+def construir_indice_vecinos(matriz, k=VECINOS_K, tam_bloque=1024):
+    # Para cada anime (fila de la matriz de correlacion) sus k vecinos con mayor correlacion, sin el mismo
+    # Devuelve (vecinos int32, pesos float32) de tamaño fijo (animes x k); si hay menos de k se rellena con -1 / NaN
+    n = matriz.shape[0]
+    k = max(0, min(int(k), n - 1))
+    vecinos = np.full((n, k), -1, dtype=np.int32)
+    pesos = np.full((n, k), np.nan, dtype=np.float32)
+    if k == 0:
+        return vecinos, pesos
+
+    # Por bloques de filas para no duplicar la matriz entera en memoria
+    for inicio in range(0, n, tam_bloque):
+        fin = min(inicio + tam_bloque, n)
+        bloque = np.array(matriz[inicio:fin], dtype=np.float32)
+        bloque[np.arange(fin - inicio), np.arange(inicio, fin)] = np.nan # El propio anime no cuenta
+        bloque[np.isnan(bloque)] = -np.inf
+
+        mejores = np.argpartition(-bloque, k - 1, axis=1)[:, :k]
+        valores = np.take_along_axis(bloque, mejores, axis=1)
+        orden = np.argsort(-valores, axis=1, kind='stable')
+        mejores = np.take_along_axis(mejores, orden, axis=1)
+        valores = np.take_along_axis(valores, orden, axis=1)
+
+        existen = np.isfinite(valores)
+        vecinos[inicio:fin] = np.where(existen, mejores, -1)
+        pesos[inicio:fin] = np.where(existen, valores, np.nan)
+
+    return vecinos, pesos
+
+
+def compactar_corr(corr, formato, umbral=UMBRAL_DISPERSO, tam_bloque=1024):
+    # corrMatrix (array animes x animes con NaN) -> {nombre: array} del formato, para guardar_modelo y crear_motor
+    # (cada nombre es tambien el del .npy en la carpeta del modelo)
+    # Se recorre por bloques de filas para no hacer copias temporales de la matriz entera
+    if formato not in FORMATOS_CORR:
+        raise ValueError(f"Formato de corrMatrix desconocido: {formato}")
+    if formato == "float32":
+        return {}
+    if formato == "float16":
+        return {"corr16": np.asarray(corr).astype(np.float16)}
+    n = corr.shape[0]
+    bloques = [(inicio, min(inicio + tam_bloque, n)) for inicio in range(0, n, tam_bloque)]
+
+    if formato == "int8":
+        # Escala de cada columna: su |r| maximo pasa a ser 127 (columnas sin ningun par valido: escala 1)
+        maximos = np.zeros(n, dtype=np.float32)
+        for inicio, fin in bloques:
+            maximos = np.maximum(maximos, np.abs(np.nan_to_num(corr[inicio:fin], nan=0)).max(axis=0))
+        escalas = np.where(maximos > 0, maximos / 127, 1).astype(np.float32)
+        corr_q = np.empty((n, n), dtype=np.int8)
+        for inicio, fin in bloques:
+            bloque = np.asarray(corr[inicio:fin], dtype=np.float32)
+            cuantizado = np.clip(np.rint(bloque / escalas), -127, 127)
+            corr_q[inicio:fin] = np.where(np.isnan(bloque), NULO_INT8, cuantizado)
+        return {"corr_q": corr_q, "corr_escalas": escalas}
+
+    # disperso: fila a fila (bloque a bloque) los pares validos con |r| >= umbral, en orden de columna
+    datos, indices, conteos = [], [], [np.zeros(1, dtype=np.int64)]
+    for inicio, fin in bloques:
+        bloque = np.asarray(corr[inicio:fin], dtype=np.float32)
+        guardar = np.abs(bloque) >= umbral # Los NaN dan False
+        filas, columnas = np.nonzero(guardar)
+        datos.append(bloque[filas, columnas])
+        indices.append(columnas.astype(np.int32))
+        conteos.append(np.count_nonzero(guardar, axis=1))
+    return {
+        "corr_datos": np.concatenate(datos).astype(np.float32),
+        "corr_indices": np.concatenate(indices),
+        "corr_indptr": np.cumsum(np.concatenate(conteos)).astype(np.int64),
+    }
+
+
+def crear_motor(corrMatrix, formato="float32", compacta=None):
+    # Motor de la matriz completa para el formato en que se guardo corrMatrix (compacta = salida de compactar_corr)
+    if formato == "float32" or not compacta:
+        return MotorRecomendacion(corrMatrix)
+    if formato == "float16":
+        return MotorRecomendacion(corrMatrix, compacta["corr16"])
+    if formato == "int8":
+        return MotorCuantizado(corrMatrix, compacta["corr_q"], compacta["corr_escalas"])
+    if formato == "disperso":
+        return MotorDisperso(corrMatrix, compacta["corr_datos"], compacta["corr_indices"], compacta["corr_indptr"])
+    raise ValueError(f"Formato de corrMatrix desconocido: {formato}")
@@ -0,0 +1,54 @@
+import threading
+
+
+class PerfilesUsuarios():
+    # Perfiles {anime_id: calificacion} guardados en MySQL (DAO_Calificaciones) con una cache LRU por usuario delante
+    # - obtener: si no esta en la cache lo lee de la base de datos en una consulta y lo guarda
+    # - guardar: escribe solo las calificaciones nuevas (upsert) y quita el perfil de la cache
+    # Cada cambio sube la generacion del usuario: una lectura que empezo antes del cambio no se guarda en la cache
+    # (si no, un perfil viejo podria quedarse hasta que caduque). Con varios workers cada proceso tiene su cache,
+    # asi que otro worker puede servir el perfil anterior como mucho durante el ttl de la cache
+    def __init__(self, dao, cache):
+        self.__dao = dao
+        self.__cache = cache # CacheResultados con el usuario como clave
+        self.__generaciones = {}
+        self.__lock = threading.Lock()
+
+    def obtener(self, usuario):
+        # Perfil del usuario con las claves como texto, igual que el JSON que recibe /recomendar (vacio si no tiene)
+        perfil = self.__cache.obtener(usuario)
+        if perfil is not None:
+            return perfil
+        with self.__lock:
+            generacion = self.__generaciones.get(usuario, 0)
+        perfil = {str(anime_id): calificacion for anime_id, calificacion in self.__dao.obtener_calificaciones(usuario).items()}
+        with self.__lock:
+            if self.__generaciones.get(usuario, 0) == generacion:
+                self.__cache.guardar(usuario, perfil)
+        return perfil
+
+    def guardar(self, usuario, calificaciones):
+        try:
+            return self.__dao.guardar_calificaciones(usuario, calificaciones)
+        finally:
+            self.__cambio(usuario)
+
+    def borrar(self, usuario):
+        try:
+            return self.__dao.borrar_calificaciones(usuario)
+        finally:
+            self.__cambio(usuario)
+
+    def __cambio(self, usuario):
+        with self.__lock:
+            self.__generaciones[usuario] = self.__generaciones.get(usuario, 0) + 1
+            self.__cache.descartar(usuario)
+
+    def estadisticas(self):
+        return self.__cache.estadisticas()
+
+    def close(self):
+        self.__dao.close()
+
+    def __str__(self):
+        return f"Perfiles de usuarios ({self.__dao})"
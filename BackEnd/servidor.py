@@ -0,0 +1,83 @@
+# Arranque de produccion de la API (en vez de app.run(debug=True) o flask run, que son el servidor de desarrollo)
+# Carga el modelo una sola vez antes de crear los procesos: corr.npy va con mmap y el resto se comparte
+# copy-on-write, asi cada worker arranca ya listo sin volver a leerlo. Cada worker vigila la carpeta del
+# modelo y recarga si otro worker entrena o actualiza con /ratings
+# Configuracion con variables de entorno:
+#   API_HOST (127.0.0.1), API_PORT (5000), API_WORKERS (nucleos), API_THREADS (4), API_RECARGA (5 segundos)
+# Uso (desde la carpeta BackEnd): python servidor.py
+# Necesita gunicorn (Linux/Mac, varios procesos) o waitress (Windows, un proceso con varios hilos)
+import os
+import sys
+
+import API_RecomendacionesAnimes as api
+from modelo_disco import existe_modelo
+
+HOST = os.environ.get("API_HOST", "127.0.0.1")
+PUERTO = int(os.environ.get("API_PORT", 5000))
+WORKERS = int(os.environ.get("API_WORKERS", os.cpu_count() or 1))
+HILOS = int(os.environ.get("API_THREADS", 4))
+INTERVALO_RECARGA = float(os.environ.get("API_RECARGA", 5)) # Segundos entre comprobaciones del modelo en disco
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+
+def precargar_modelo():
+    # Solo carga el modelo si ya esta entrenado: entrenar desde cero tarda minutos y se lanza con /entrenar
+    if existe_modelo(api.MODEL_DIR) or os.path.exists(api.MODEL_FILE):
+        api.entrenar_modelo()
+    else:
+        print("\033[33m### No hay modelo entrenado: /listo respondera 503 hasta que se llame a /entrenar\033[0m")
+
+
+if BaseApplication is not None:
+    class ServidorGunicorn(BaseApplication):
+        # Gunicorn configurado desde aqui en vez de con la linea de comandos
+        def __init__(self, app, opciones):
+            self.application = app
+            self.opciones = opciones
+            super().__init__()
+
+        def load_config(self):
+            for clave, valor in self.opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            return self.application
+
+
+def _despues_de_fork(server, worker):
+    # Los hilos no sobreviven al fork: cada worker arranca su propio vigilante del modelo
+    api.vigilar_modelo(INTERVALO_RECARGA)
+
+
+def main():
+    precargar_modelo()
+    print(f"\033[32m### Sirviendo en http://{HOST}:{PUERTO}\033[0m")
+
+    if BaseApplication is not None:
+        ServidorGunicorn(api.app, {
+            "bind": f"{HOST}:{PUERTO}",
+            "workers": WORKERS,
+            "threads": HILOS,
+            "worker_class": "gthread",
+            "preload_app": True, # La app (y el modelo ya cargado) se crea en el proceso padre antes del fork
+            "post_fork": _despues_de_fork,
+            "timeout": 120,
+        }).run()
+        return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        print("\033[31m### Instala gunicorn (Linux/Mac) o waitress (Windows): pip install gunicorn / pip install waitress\033[0m")
+        sys.exit(1)
+
+    # waitress: un solo proceso con varios hilos (no hace falta vigilar el modelo, nadie mas lo cambia)
+    serve(api.app, host=HOST, port=PUERTO, threads=HILOS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Pruebas con datos sinteticos pequeños (benchmarks/sintetico.py), sin rating.csv ni MySQL
+# Uso (desde la carpeta BackEnd): python -m pytest -q tests
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+CARPETA_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CARPETA_BACKEND)
+sys.path.insert(0, os.path.join(CARPETA_BACKEND, "benchmarks"))
+sys.path.insert(0, os.path.dirname(CARPETA_BACKEND)) # Raiz del proyecto, por el paquete Comun
+
+# La API escribe el modelo, los trabajos y las caches en su carpeta de datos: en las pruebas una temporal
+if "API_DATOS" not in os.environ:
+    os.environ["API_DATOS"] = tempfile.mkdtemp(prefix="api_datos_")
+    atexit.register(shutil.rmtree, os.environ["API_DATOS"], ignore_errors=True)
+
+from sintetico import escribir_rating_csv
+
+USUARIOS, ANIMES, DENSIDAD = 2000, 120, 0.15
+MIN_RATINGS, MIN_PERIODS = 30, 20 # Umbrales bajos para que con pocos usuarios entren casi todos los animes
+
+
+@pytest.fixture(scope="session")
+def anime():
+    # anime.csv limpio, como lo carga la API
+    import API_RecomendacionesAnimes as api
+    return api.cargar_anime(os.path.join(CARPETA_BACKEND, "anime.csv"))
+
+
+@pytest.fixture(scope="session")
+def ratings_csv(tmp_path_factory):
+    ruta = str(tmp_path_factory.mktemp("ratings") / "rating.csv")
+    escribir_rating_csv(ruta, USUARIOS, ANIMES, DENSIDAD)
+    return ruta
+
+
+@pytest.fixture(scope="session")
+def corrMatrix(ratings_csv, anime):
+    # Modelo entrenado como lo hace la API (solo animes de anime.csv limpio)
+    from entrenamiento import entrenar_sparse
+    corr, _ = entrenar_sparse(ratings_csv, anime['anime_id'].to_numpy(), MIN_RATINGS, MIN_PERIODS, workers=1)
+    return corr
+
+
+@pytest.fixture
+def perfiles(corrMatrix):
+    rng = np.random.default_rng(1)
+    ids = np.asarray(corrMatrix.columns)
+    return [{int(aid): int(rng.integers(1, 11)) for aid in rng.choice(ids, 10, replace=False)} for _ in range(50)]
+
@@ -0,0 +1,66 @@
+import json
+import time
+
+import pytest
+
+from cache_resultados import CacheResultados
+
+
+def test_clave_no_depende_del_orden_ni_de_9_frente_a_9_0():
+    clave = CacheResultados.clave({"136": 9, "1535": 7}, "v1")
+    assert CacheResultados.clave({"1535": 7.0, "136": 9.0}, "v1") == clave
+    assert CacheResultados.clave({136: 9, 1535: 7}, "v1") == clave
+
+
+def test_clave_cambia_con_las_notas_los_animes_y_el_modelo():
+    clave = CacheResultados.clave({"136": 9, "1535": 7}, "v1")
+    assert CacheResultados.clave({"136": 8, "1535": 7}, "v1") != clave
+    assert CacheResultados.clave({"136": 9}, "v1") != clave
+    assert CacheResultados.clave({"136": 9, "1535": 7}, "v2") != clave
+
+
+def test_lru_y_caducidad():
+    cache = CacheResultados(tam_maximo=2, ttl=0.05)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    assert cache.obtener("a") == 1 # a pasa a ser la mas usada
+    cache.guardar("c", 3)
+    assert cache.obtener("b") is None and cache.obtener("a") == 1
+    time.sleep(0.06)
+    assert cache.obtener("c") is None
+    assert cache.estadisticas()["expulsiones"] == 1 and cache.estadisticas()["caducadas"] == 1
+
+
+@pytest.fixture
+def cliente(corrMatrix, anime):
+    import API_RecomendacionesAnimes as api
+    from modelo import Modelo
+    api.cache = CacheResultados(100, 300)
+    api.publicar_modelo(Modelo(corrMatrix, anime))
+    return api.app.test_client()
+
+
+def test_respuesta_cacheada_devuelve_las_calificaciones_de_cada_peticion(cliente, corrMatrix):
+    # Dos perfiles con la misma clave (orden distinto, 9 frente a 9.0): el segundo sale de la cache pero su
+    # usuario_ratings es el suyo, igual que sin cache
+    a, b = (str(aid) for aid in corrMatrix.columns[:2])
+    # El JSON se manda a mano: el cliente de pruebas ordenaria las claves
+    enviar = lambda perfil: cliente.post("/recomendar", data=json.dumps(perfil), content_type="application/json").get_json()
+    primera = enviar({a: 9, b: 7})
+    segunda = enviar({b: 7.0, a: 9.0})
+    assert cliente.get("/cache").get_json()["aciertos"] == 1
+    assert [(r["anime_id"], r["rating"]) for r in primera["usuario_ratings"]] == [(int(a), 9), (int(b), 7)]
+    assert [(r["anime_id"], r["rating"]) for r in segunda["usuario_ratings"]] == [(int(b), 7.0), (int(a), 9.0)]
+    assert isinstance(segunda["usuario_ratings"][0]["rating"], float)
+    assert segunda["recomendaciones_top_10"] == primera["recomendaciones_top_10"]
+
+
+@pytest.mark.parametrize("perfil", [{"abc": 9}, {"136": "nueve"}, {"136": 9.5}, {"136": 0}, {"136": None}])
+def test_calificaciones_no_validas_dan_400(cliente, corrMatrix, perfil):
+    # Antes de filtrar o buscar en la cache: un anime_id o una nota mala es un 400, no un 500
+    import API_RecomendacionesAnimes as api
+    perfil = {**perfil, str(corrMatrix.columns[0]): 8}
+    assert cliente.post("/recomendar", json=perfil).status_code == 400
+    assert api.recomendar_perfil(api.modelo, perfil)[1] == 400 # Lo que usa api_async.py
+    lote = cliente.post("/recomendar/batch", json=[perfil, {str(corrMatrix.columns[0]): 8}]).get_json()["resultados"]
+    assert "error" in lote[0] and "recomendaciones_top_10" in lote[1]
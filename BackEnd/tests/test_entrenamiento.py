@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from actualizacion_incremental import actualizar_con_ratings
+from entrenamiento import correlacion_pearson_sparse, entrenar_sparse, SIMILITUDES
+from conftest import MIN_RATINGS, MIN_PERIODS
+
+
+def iguales_bit_a_bit(a, b):
+    return list(a.columns) == list(b.columns) and np.array_equal(a.to_numpy().view(np.uint32), b.to_numpy().view(np.uint32))
+
+
+def test_sparse_igual_que_pivot(ratings_csv, anime, corrMatrix):
+    # El entrenamiento disperso da la misma corrMatrix que el pivot denso + DataFrame.corr original
+    import API_RecomendacionesAnimes as api
+    pivot, _ = api.entrenar_pivot(ratings_csv, anime, MIN_RATINGS, MIN_PERIODS)
+    assert [int(c) for c in pivot.columns] == [int(c) for c in corrMatrix.columns]
+    assert np.allclose(pivot.to_numpy(), corrMatrix.to_numpy(), atol=1e-5, equal_nan=True)
+
+
+@pytest.mark.parametrize("similitud", SIMILITUDES)
+def test_mismo_resultado_con_cualquier_numero_de_workers(similitud):
+    # Los bloques de columnas son fijos: 1 proceso o varios dan la misma matriz bit a bit
+    rng = np.random.default_rng(0)
+    matriz = sparse.random(3000, 300, density=0.05, random_state=rng, data_rvs=lambda n: rng.integers(1, 11, n)).tocsr()
+    uno = correlacion_pearson_sparse(matriz, 5, workers=1, tam_bloque=64, similitud=similitud)
+    varios = correlacion_pearson_sparse(matriz, 5, workers=3, tam_bloque=64, similitud=similitud)
+    assert np.array_equal(uno.view(np.uint32), varios.view(np.uint32))
+
+
+@pytest.mark.parametrize("similitud", ["pearson", "coseno_ajustado"])
+def test_incremental_igual_que_reentrenar(tmp_path, similitud):
+    # Aplicar un lote con /ratings da la misma corrMatrix que reentrenar desde cero con todos los ratings,
+    # incluido un anime que cruza el umbral de popularidad con el lote
+    rng = np.random.default_rng(0)
+    usuarios, animes, por_usuario = 1500, 60, 20
+    base = pd.DataFrame({
+        "user_id": np.repeat(np.arange(1, usuarios + 1), por_usuario),
+        "anime_id": np.concatenate([rng.choice(animes, por_usuario, replace=False) for _ in range(usuarios)]) + 1,
+        "rating": rng.integers(1, 11, usuarios * por_usuario),
+    })
+    frontera = animes + 1
+    base = pd.concat([base, pd.DataFrame({"user_id": np.arange(1, MIN_RATINGS + 1), "anime_id": frontera, "rating": 7})])
+    lote = pd.DataFrame({
+        "user_id": rng.integers(1, usuarios + 50, 200),
+        "anime_id": np.append(rng.integers(1, animes + 1, 199), frontera),
+        "rating": rng.integers(1, 11, 200),
+    })
+    lote.iloc[0, 2] = -1
+    ids = np.arange(1, frontera + 1)
+
+    ratings_file, cache, estadisticas = str(tmp_path / "rating.csv"), str(tmp_path / "cache.npz"), str(tmp_path / "estadisticas")
+    base.to_csv(ratings_file, index=False)
+    corr_base, _ = entrenar_sparse(ratings_file, ids, MIN_RATINGS, MIN_PERIODS, workers=1, ruta_cache=cache, carpeta_estadisticas=estadisticas, similitud=similitud)
+    assert frontera not in corr_base.columns
+
+    corr_inc, informe = actualizar_con_ratings(
+        estadisticas, corr_base, cache, ratings_file, ids,
+        lote["user_id"].to_numpy(), lote["anime_id"].to_numpy(), lote["rating"].to_numpy()
+    )
+    corr_total, _ = entrenar_sparse(ratings_file, ids, MIN_RATINGS, MIN_PERIODS, workers=1, similitud=similitud)
+    assert informe["animes_nuevos_en_modelo"] == [frontera]
+    assert iguales_bit_a_bit(corr_inc, corr_total)
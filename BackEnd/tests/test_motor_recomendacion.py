@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_recomendar import corr_sintetica, recomendar_pandas
+from motor_recomendacion import MotorRecomendacion, compactar_corr, crear_motor
+
+
+def test_puntuar_igual_que_pandas():
+    # El motor vectorizado da el mismo top 10 (ids y puntajes) que el bucle original de pandas
+    corrMatrix = corr_sintetica(300)
+    motor = MotorRecomendacion(corrMatrix)
+    rng = np.random.default_rng(1)
+    for _ in range(20):
+        elegidos = rng.choice(np.asarray(corrMatrix.columns), 15, replace=False)
+        myRatings = pd.Series({int(aid): int(rng.integers(1, 11)) for aid in elegidos})
+        esperado = recomendar_pandas(corrMatrix, myRatings)
+        obtenido = motor.puntuar(myRatings.to_dict())
+        assert [a for a, _ in obtenido] == [a for a, _ in esperado]
+        assert np.allclose([p for _, p in obtenido], [p for _, p in esperado], rtol=1e-5)
+
+
+def test_puntuar_lote_igual_que_uno_a_uno(corrMatrix, perfiles):
+    motor = MotorRecomendacion(corrMatrix)
+    for lote, uno in zip(motor.puntuar_lote(perfiles), (motor.puntuar(p) for p in perfiles)):
+        assert [a for a, _ in lote] == [a for a, _ in uno]
+        assert np.allclose([p for _, p in lote], [p for _, p in uno], rtol=1e-5)
+
+
+@pytest.mark.parametrize("formato, umbral, minimo", [
+    ("float16", None, 0.9),
+    ("int8", None, 0.9),
+    ("disperso", 0.0, 1.0), # Con umbral 0 se guardan todos los pares validos: mismo top exacto
+])
+def test_formatos_compactos_mismo_top(corrMatrix, perfiles, formato, umbral, minimo):
+    # Los formatos compactos (float16, int8 por columna, disperso con umbral) dan (casi) el mismo top 10 que float32
+    referencia = MotorRecomendacion(corrMatrix)
+    compacta = compactar_corr(corrMatrix.to_numpy(), formato, *(() if umbral is None else (umbral, )))
+    motor = crear_motor(corrMatrix, formato, compacta)
+    comun = []
+    for perfil in perfiles:
+        esperado = {a for a, _ in referencia.puntuar(perfil)}
+        obtenido = {a for a, _ in motor.puntuar(perfil)}
+        comun.append(len(esperado & obtenido) / len(esperado))
+    assert np.mean(comun) >= minimo
@@ -0,0 +1,202 @@
+import threading
+
+import bcrypt
+import pytest
+from itsdangerous import URLSafeTimedSerializer
+from mysql.connector import DatabaseError, OperationalError
+
+from cache_resultados import CacheResultados
+from DAO_Calificaciones import DAO_Calificaciones
+from perfiles_usuarios import PerfilesUsuarios
+from Comun.servicio_autenticacion import ServicioAutenticacion
+from Comun.Usuario_Contrasenya import Usuario_Contrasenya
+
+CONTRASENYA = "Prueba#123"
+
+
+class ConexionApuntada():
+    # Lo que usa DAO_Calificaciones de una conexion de mysql.connector: apunta cada sentencia y que se confirma
+    def __init__(self, fallar_en=None, caer_en=None):
+        self.fallar_en = fallar_en # Numero de sentencia de la transaccion que falla
+        self.caer_en = caer_en # "execute" o "commit": ahi se cae la conexion una vez
+        self.pendientes, self.confirmadas = [], []
+        self.transacciones = self.commits = self.rollbacks = 0
+
+    def cursor(self, prepared=False):
+        return CursorApuntado(self)
+
+    def start_transaction(self):
+        self.pendientes = []
+        self.transacciones += 1
+
+    def caer(self, donde):
+        if self.caer_en == donde:
+            self.caer_en = None
+            self.pendientes = [] # El servidor deshace lo que no se confirmo
+            raise OperationalError("Se perdio la conexion")
+
+    def commit(self):
+        self.caer("commit")
+        self.confirmadas += self.pendientes
+        self.pendientes = []
+        self.commits += 1
+
+    def rollback(self):
+        self.pendientes = []
+        self.rollbacks += 1
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+class CursorApuntado():
+    def __init__(self, conexion):
+        self.__conexion = conexion
+        self.rowcount = -1
+
+    def execute(self, sql, valores=()):
+        self.__conexion.caer("execute")
+        if len(self.__conexion.pendientes) == self.__conexion.fallar_en:
+            raise DatabaseError("Fallo a mitad de la transaccion")
+        self.__conexion.pendientes.append((sql, valores))
+        self.rowcount = len(valores) // 3
+
+    def close(self):
+        pass
+
+
+def test_todos_los_lotes_van_en_una_transaccion():
+    conexion = ConexionApuntada()
+    dao = DAO_Calificaciones("", "", crear_conexion=lambda: conexion)
+    assert dao.guardar_calificaciones("ana", {aid: 1 + aid % 10 for aid in range(1200)}) == 1200
+    assert len(conexion.confirmadas) == 3 and conexion.commits == 1
+    assert all("VALUES(calificacion)" in sql and " AS " not in sql for sql, _ in conexion.confirmadas)
+
+
+def test_si_falla_un_lote_no_se_guarda_ninguno():
+    conexion = ConexionApuntada(fallar_en=1)
+    dao = DAO_Calificaciones("", "", crear_conexion=lambda: conexion)
+    with pytest.raises(DatabaseError):
+        dao.guardar_calificaciones("ana", {aid: 5 for aid in range(1200)})
+    assert conexion.confirmadas == [] and conexion.commits == 0 and conexion.rollbacks == 1
+
+
+def test_si_se_cae_antes_del_commit_se_repite():
+    conexion = ConexionApuntada(caer_en="execute")
+    dao = DAO_Calificaciones("", "", crear_conexion=lambda: conexion)
+    assert dao.guardar_calificaciones("ana", {aid: 5 for aid in range(1200)}) == 1200
+    assert conexion.transacciones == 2 and conexion.commits == 1 and len(conexion.confirmadas) == 3
+
+
+def test_si_se_cae_en_el_commit_no_se_repite():
+    # No se sabe si el servidor llego a confirmar la transaccion: se lanza el error en vez de repetirla
+    conexion = ConexionApuntada(caer_en="commit")
+    dao = DAO_Calificaciones("", "", crear_conexion=lambda: conexion)
+    with pytest.raises(OperationalError):
+        dao.guardar_calificaciones("ana", {aid: 5 for aid in range(1200)})
+    assert conexion.transacciones == 1 and conexion.commits == 0
+
+
+class CalificacionesEnMemoria():
+    # Lo que usa PerfilesUsuarios de DAO_Calificaciones, en un diccionario
+    def __init__(self):
+        self.perfiles = {}
+
+    def obtener_calificaciones(self, usuario):
+        return dict(self.perfiles.get(usuario, {}))
+
+    def guardar_calificaciones(self, usuario, calificaciones):
+        self.perfiles.setdefault(usuario, {}).update(calificaciones)
+        return len(calificaciones)
+
+    def borrar_calificaciones(self, usuario):
+        return len(self.perfiles.pop(usuario, {}))
+
+    def close(self):
+        pass
+
+
+class LoginsEnMemoria():
+    # Lo que usa ServicioAutenticacion de DAO_Logins
+    def __init__(self, hashes):
+        self.hashes = hashes
+
+    def obtener_hash(self, usuario):
+        self.hilo = threading.current_thread().name
+        if self.hashes is None:
+            raise OperationalError("No se puede conectar con MySQL")
+        return self.hashes.get(usuario)
+
+    def guardar_hash(self, usuario, password_hash):
+        self.hashes[usuario] = password_hash
+
+
+def test_login_en_el_pool_y_sin_base_de_datos_es_incorrecto():
+    # La consulta del hash tambien va al pool de bcrypt, y si falla el login da False (no una excepcion)
+    hash_ = bcrypt.hashpw(CONTRASENYA.encode(), bcrypt.gensalt(4)).decode()
+    logins = LoginsEnMemoria({"ana": hash_})
+    servicio = ServicioAutenticacion(logins, coste=4, workers=1)
+    try:
+        assert servicio.iniciar_sesion(Usuario_Contrasenya("ana", CONTRASENYA)) is True
+        assert logins.hilo != threading.current_thread().name
+        assert servicio.iniciar_sesion(Usuario_Contrasenya("nadie", CONTRASENYA)) is False
+        logins.hashes = None
+        assert servicio.iniciar_sesion(Usuario_Contrasenya("ana", CONTRASENYA)) is False
+    finally:
+        servicio.cerrar()
+
+
+@pytest.fixture
+def cliente(monkeypatch):
+    import API_RecomendacionesAnimes as api
+    hash_ = bcrypt.hashpw(CONTRASENYA.encode(), bcrypt.gensalt(4)).decode()
+    autenticacion = ServicioAutenticacion(LoginsEnMemoria({"ana": hash_, "bob": hash_}), coste=4, workers=1)
+    monkeypatch.setattr(api, "firmas_sesion", URLSafeTimedSerializer("secreto de prueba", salt="sesion-perfiles"))
+    monkeypatch.setattr(api, "perfiles", PerfilesUsuarios(CalificacionesEnMemoria(), CacheResultados(100, 60)))
+    monkeypatch.setattr(api, "autenticacion", autenticacion)
+    yield api.app.test_client()
+    autenticacion.cerrar()
+
+
+def token(cliente, usuario, contrasenya=CONTRASENYA):
+    resp = cliente.post("/sesiones", json={"usuario": usuario, "contrasenya": contrasenya})
+    return resp.status_code, (resp.get_json() or {}).get("token")
+
+
+def test_sin_token_no_se_toca_ningun_perfil(cliente):
+    assert cliente.get("/perfiles/ana").status_code == 401
+    assert cliente.post("/perfiles/ana", json={"136": 10}).status_code == 401
+    assert cliente.delete("/perfiles/ana").status_code == 401
+    assert cliente.get("/recomendar/ana").status_code == 401
+    assert token(cliente, "ana", "otra")[0] == 401
+    assert token(cliente, "nadie")[0] == 401
+
+
+def test_el_token_solo_vale_para_su_usuario(cliente):
+    codigo, token_ana = token(cliente, "ana")
+    assert codigo == 200
+    cabeceras = {"Authorization": f"Bearer {token_ana}"}
+    assert cliente.post("/perfiles/ana", json={"136": 10}, headers=cabeceras).status_code == 200
+    assert cliente.get("/perfiles/ana", headers=cabeceras).get_json()["calificaciones"] == {"136": 10}
+    assert cliente.get("/perfiles/bob", headers=cabeceras).status_code == 403
+    assert cliente.delete("/perfiles/bob", headers=cabeceras).status_code == 403
+    assert cliente.get("/recomendar/bob", headers=cabeceras).status_code == 403
+
+
+def test_token_caducado_o_de_otro_secreto(cliente, monkeypatch):
+    import API_RecomendacionesAnimes as api
+    falso = URLSafeTimedSerializer("otro secreto", salt="sesion-perfiles").dumps({"usuario": "ana"})
+    assert cliente.get("/perfiles/ana", headers={"Authorization": f"Bearer {falso}"}).status_code == 401
+    _, token_ana = token(cliente, "ana")
+    monkeypatch.setattr(api, "SESION_TTL", -1)
+    assert cliente.get("/perfiles/ana", headers={"Authorization": f"Bearer {token_ana}"}).status_code == 401
+
+
+def test_batch_no_es_un_usuario(cliente):
+    resp = cliente.get("/recomendar/batch")
+    assert resp.status_code == 405 and resp.headers["Allow"] == "POST"
+    _, token_ana = token(cliente, "ana")
+    assert cliente.get("/perfiles/batch", headers={"Authorization": f"Bearer {token_ana}"}).status_code == 400
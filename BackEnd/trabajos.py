@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import fcntl # Solo en Linux/Mac; en Windows el servidor es un unico proceso y no hace falta
+except ImportError:
+    fcntl = None
+
+class GestorTrabajos():
+    # Ejecuta trabajos largos (los entrenamientos) en un hilo aparte y guarda su estado para poder consultarlo
+    # Hay un solo hilo, asi que los trabajos se hacen de uno en uno y en orden de llegada
+    # Con carpeta, el estado de cada trabajo se escribe tambien en un JSON para que lo vean los demas
+    # procesos del servidor (el trabajo se lanza en un worker pero se puede consultar desde cualquiera)
+    def __init__(self, max_guardados=100, carpeta=None):
+        self.__pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entrenamiento")
+        self.__trabajos = {}
+        self.__lock = threading.Lock()
+        self.__max_guardados = max_guardados # Trabajos terminados que se recuerdan como maximo
+        self.__carpeta = carpeta # Se crea al escribir el primer trabajo, no al importar la API
+
+    def lanzar(self, funcion, **kwargs):
+        job_id = uuid.uuid4().hex
+        with self.__lock:
+            self.__trabajos[job_id] = {"job_id": job_id, "estado": "pendiente", "creado": time.time(), "parametros": kwargs}
+            self.__escribir(self.__trabajos[job_id])
+            self.__limpiar()
+        self.__pool.submit(self.__ejecutar, job_id, funcion, kwargs)
+        return job_id
+
+    def estado(self, job_id):
+        # Copia del estado del trabajo (None si no existe); si no es de este proceso se busca en la carpeta
+        with self.__lock:
+            trabajo = self.__trabajos.get(job_id)
+            if trabajo:
+                return dict(trabajo)
+        return self.__leer(job_id)
+
+    def en_curso(self):
+        with self.__lock:
+            return any(t["estado"] in ("pendiente", "en_curso") for t in self.__trabajos.values())
+
+    def __ejecutar(self, job_id, funcion, kwargs):
+        self.__actualizar(job_id, estado="en_curso", inicio=time.time())
+        try:
+            resultado = funcion(**kwargs)
+            self.__actualizar(job_id, estado="terminado", resultado=resultado, fin=time.time())
+        except Exception as e:
+            traceback.print_exc()
+            self.__actualizar(job_id, estado="error", error=str(e), fin=time.time())
+
+    def __actualizar(self, job_id, **cambios):
+        with self.__lock:
+            self.__trabajos[job_id].update(cambios)
+            self.__escribir(self.__trabajos[job_id])
+
+    def __limpiar(self):
+        # Borra los trabajos terminados mas antiguos si hay demasiados
+        terminados = [t for t in self.__trabajos.values() if t["estado"] in ("terminado", "error")]
+        for trabajo in sorted(terminados, key=lambda t: t["creado"])[:max(0, len(terminados) - self.__max_guardados)]:
+            del self.__trabajos[trabajo["job_id"]]
+            if self.__carpeta:
+                try:
+                    os.remove(self.__ruta(trabajo["job_id"]))
+                except OSError:
+                    pass
+
+    def __ruta(self, job_id):
+        return os.path.join(self.__carpeta, f"{job_id}.json")
+
+    def __escribir(self, trabajo):
+        # Se escribe en un temporal y se cambia de golpe para que nadie lea un JSON a medias
+        if not self.__carpeta:
+            return
+        os.makedirs(self.__carpeta, exist_ok=True)
+        temporal = self.__ruta(trabajo["job_id"]) + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(trabajo, f, default=str)
+        os.replace(temporal, self.__ruta(trabajo["job_id"]))
+
+    def __leer(self, job_id):
+        if not self.__carpeta or not job_id.isalnum(): # Solo ids hexadecimales, nada de rutas
+            return None
+        try:
+            with open(self.__ruta(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def __str__(self):
+        return "Gestor de trabajos de entrenamiento"
+
+
+@contextmanager
+def bloqueo_entre_procesos(ruta, bloqueante=True):
+    # Cerrojo de archivo (flock) para que dos procesos del servidor no escriban el modelo a la vez
+    # Devuelve True si se consiguio (con bloqueante=False puede devolver False en vez de esperar)
+    # Sin fcntl (Windows) no bloquea nada: alli el servidor es un solo proceso y basta con el lock de hilos
+    if fcntl is None:
+        yield True
+        return
+
+    with open(ruta, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if bloqueante else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
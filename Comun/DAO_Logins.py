@@ -0,0 +1,171 @@
+import mysql.connector
+from mysql.connector import Error, InterfaceError, OperationalError
+import bcrypt
+from .pool_conexiones import PoolConexiones, PoolAgotado, POOL_TAM, POOL_TIMEOUT, POOL_VERIFICAR
+
+# Errores de conexion caida/perdida: la conexion se descarta del pool y la consulta se repite con otra
+ERRORES_CONEXION = (OperationalError, InterfaceError)
+INTENTOS = 2 # Veces que se intenta cada consulta (la segunda ya con una conexion nueva)
+
+class DAO_Logins():
+    # DAO de la tabla usuario_contrasenyas sobre un pool de conexiones: se puede usar desde varios hilos a la vez
+    # Cada llamada saca una conexion del pool, abre su propio cursor (sentencias preparadas) y la devuelve al terminar
+    # tam_pool, timeout_pool y verificar_cada: ver PoolConexiones
+    # crear_conexion: funcion que abre una conexion (por defecto mysql.connector.connect con los datos de arriba)
+    # coste_bcrypt: coste de los hashes que calculan anyadir y actualizarContrasenya (el de bcrypt por defecto, 12)
+    def __init__(self, user_input: str, password_input: str, host="localhost", database="logins_api_anime",
+                 tam_pool=POOL_TAM, timeout_pool=POOL_TIMEOUT, verificar_cada=POOL_VERIFICAR, crear_conexion=None,
+                 coste_bcrypt=12):
+
+        self.__host = host
+        self.__user = user_input
+        self.__password = password_input
+        self.__database = database
+        self.__tam_pool = tam_pool
+        self.__timeout_pool = timeout_pool
+        self.__verificar_cada = verificar_cada
+        self.__crear_conexion = crear_conexion or self.__nueva_conexion
+        self.__coste_bcrypt = coste_bcrypt
+        self.__pool = None
+        self.__conexionHecha = False
+        self.connected = False
+
+    def get_conexion(self):
+        return self.__conexionHecha
+
+    def get_pool(self):
+        return self.__pool
+
+    def __nueva_conexion(self):
+        # autocommit: una conexion que vuelve al pool no se queda con una transaccion abierta
+        # (con REPEATABLE READ las siguientes lecturas verian una foto vieja de la tabla)
+        return mysql.connector.connect(
+            host=self.__host,
+            user=self.__user,
+            password=self.__password,
+            database=self.__database,
+            autocommit=True
+        )
+
+    def conectar(self):
+        try:
+            self.__pool = PoolConexiones(
+                self.__crear_conexion, self.__tam_pool, self.__timeout_pool, self.__verificar_cada, ERRORES_CONEXION
+            )
+            # La primera conexion se abre ya para saber si el usuario/contraseña de la base de datos valen
+            with self.__pool.conexion() as conexion:
+                self.connected = conexion.is_connected()
+            self.__conexionHecha = True
+
+        except (Error, PoolAgotado) as err:
+            self.__pool = None
+            self.connected = False
+            self.__conexionHecha = False
+            self.last_error = err
+
+    def close(self):
+        if self.__pool:
+            self.__pool.cerrar()
+            self.__pool = None
+            self.__conexionHecha = False
+
+    def reconectar(self, user=None, password=None):
+        if user:
+            self.__user = user
+        if password:
+            self.__password = password
+        self.close()
+        self.conectar()
+        return self.connected
+
+    def __consultar(self, sql, valores=(), escribir=False):
+        # Ejecuta una sentencia preparada con una conexion del pool y un cursor propio
+        # Devuelve las filas (lecturas, con los textos ya como str) o las filas afectadas (escrituras)
+        # Si la conexion estaba caida se descarta y se repite con otra (el pool abre una nueva). Una escritura solo
+        # se repite si fallo antes de mandarla: si se cae despues no se sabe si el servidor la aplico, y repetir un
+        # INSERT podria duplicar la fila (o dar un error de clave duplicada)
+        for intento in range(INTENTOS):
+            enviada = False
+            try:
+                with self.__pool.conexion() as conexion:
+                    cursor = conexion.cursor(prepared=True)
+                    try:
+                        enviada = True
+                        cursor.execute(sql, valores)
+                        if escribir:
+                            conexion.commit()
+                            return cursor.rowcount
+                        return [tuple(_a_texto(valor) for valor in fila) for fila in cursor.fetchall()]
+                    finally:
+                        cursor.close()
+            except ERRORES_CONEXION:
+                if intento == INTENTOS - 1 or (escribir and enviada):
+                    raise
+
+    def comprobar_login(self, login):
+        try:
+            sql = "SELECT contrasenya FROM usuario_contrasenyas WHERE usuario = %s"
+            resultado = self.__consultar(sql, (login.get_usuario(), ))
+
+            if not resultado:
+                return False
+
+            # Recuperar el hash almacenado
+            password_hash = resultado[0][0]
+
+            # Comparar la contraseña ingresada con el hash almacenado
+            return bcrypt.checkpw(login.get_contrasenya().encode(), password_hash.encode())
+
+        except (Error, PoolAgotado) as err:
+            print(f"Error al comprobar login: {err}")
+            return False
+
+    def obtener_hash(self, usuario):
+        # Hash guardado del usuario (str) o None si no existe: todo lo que hace falta para un login, en una consulta
+        sql = "SELECT contrasenya FROM usuario_contrasenyas WHERE usuario = %s"
+        resultado = self.__consultar(sql, (usuario, ))
+        return resultado[0][0] if resultado else None
+
+    def comprobar_usuario(self, login):
+        try:
+            sql = "SELECT usuario FROM usuario_contrasenyas WHERE usuario = %s"
+            resultado = self.__consultar(sql, (login.get_usuario(), ))
+
+            # Si hay un resultado, el usuario existe
+            return len(resultado) > 0
+
+        except (Error, PoolAgotado) as err:
+            print(f"Error al comprobar usuario: {err}")
+            return False
+
+    def anyadir(self, login):
+        password_hash = bcrypt.hashpw(login.get_contrasenya().encode(), bcrypt.gensalt(self.__coste_bcrypt)).decode()
+        self.insertar_usuario(login.get_usuario(), password_hash)
+
+    def insertar_usuario(self, usuario, password_hash):
+        sql = "INSERT INTO usuario_contrasenyas (usuario, contrasenya) VALUES (%s, %s)"
+        self.__consultar(sql, (usuario, password_hash), escribir=True)
+
+    def ver(self):
+        # Filas (idUsuario_contrasenya, usuario, contrasenya) con los textos como str, para compararlos tal cual
+        return self.__consultar("SELECT * FROM usuario_contrasenyas")
+
+    def actualizarContrasenya(self, login):
+        password_hash = bcrypt.hashpw(login.get_contrasenya().encode(), bcrypt.gensalt(self.__coste_bcrypt)).decode()
+        self.guardar_hash(login.get_usuario(), password_hash)
+
+    def guardar_hash(self, usuario, password_hash):
+        sql = "UPDATE usuario_contrasenyas SET contrasenya = %s WHERE usuario = %s"
+        self.__consultar(sql, (password_hash, usuario), escribir=True)
+
+    def actualizarUsuario(self, user_nuevo, login):
+        sql = "UPDATE usuario_contrasenyas SET usuario = %s WHERE usuario = %s"
+        self.__consultar(sql, (user_nuevo, login.get_usuario()), escribir=True)
+
+    def __str__(self):
+        return "DAO de Logins"
+
+
+def _a_texto(valor):
+    # Con sentencias preparadas los VARCHAR pueden llegar como str o como bytes/bytearray segun la version del conector
+    return bytes(valor).decode() if isinstance(valor, (bytes, bytearray)) else valor
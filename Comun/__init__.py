@@ -0,0 +1 @@
+# Codigo compartido por FrontEnd (main.py) y BackEnd (la API): pool de conexiones a MySQL, DAO y servicio de logins
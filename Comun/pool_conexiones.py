@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# Configuracion del pool (se puede cambiar con variables de entorno o al crear el DAO)
+POOL_TAM = int(os.environ.get("DB_POOL_TAM", 8)) # Conexiones abiertas como maximo
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 5)) # Segundos que se espera a que quede una conexion libre
+POOL_VERIFICAR = float(os.environ.get("DB_POOL_VERIFICAR", 30)) # Una conexion parada mas de esto se comprueba antes de usarla
+
+
+class PoolAgotado(Exception):
+    # Todas las conexiones siguen ocupadas pasado el timeout
+    pass
+
+
+class PoolConexiones():
+    # Pool de conexiones thread-safe: cada hilo saca una conexion, la usa solo y la devuelve
+    # - Como maximo `tam` conexiones a la vez; si estan todas ocupadas se espera hasta `timeout` segundos
+    # - Se abren al pedirlas (no todas al principio) y se reutilizan la ultima devuelta primero (sigue caliente)
+    # - Una conexion que lleva parada mas de `verificar_cada` segundos se comprueba con ping antes de darla;
+    #   si no responde se cierra y se abre otra
+    # - Si durante el uso salta uno de `errores_conexion` (conexion caida) la conexion se descarta en vez de devolverse
+    # crear es la funcion que abre una conexion nueva (mysql.connector.connect con los datos de la base de datos)
+    def __init__(self, crear, tam=POOL_TAM, timeout=POOL_TIMEOUT, verificar_cada=POOL_VERIFICAR, errores_conexion=()):
+        if tam < 1:
+            raise ValueError("El pool necesita al menos una conexion")
+        self.__crear = crear
+        self.tam = tam
+        self.timeout = timeout
+        self.verificar_cada = verificar_cada
+        self.__errores_conexion = tuple(errores_conexion)
+        self.__libres = queue.LifoQueue() # (conexion, momento en que se devolvio)
+        self.__huecos = threading.BoundedSemaphore(tam) # Conexiones que aun se pueden sacar
+        self.__lock = threading.Lock()
+        self.__abiertas = 0
+        self.__cerrado = False
+        self.reconexiones = 0 # Conexiones descartadas por caidas o por no pasar el ping
+
+    @contextmanager
+    def conexion(self):
+        # with pool.conexion() as conexion: ... (la conexion vuelve al pool al salir del with)
+        if self.__cerrado:
+            raise PoolAgotado("El pool esta cerrado")
+        if not self.__huecos.acquire(timeout=self.timeout):
+            raise PoolAgotado(f"No quedo ninguna conexion libre en {self.timeout} s ({self.tam} ocupadas)")
+        try:
+            conexion = self.__sacar()
+        except BaseException:
+            self.__huecos.release()
+            raise
+
+        try:
+            yield conexion
+        except self.__errores_conexion:
+            self.__descartar(conexion)
+            raise
+        except BaseException:
+            self.__devolver(conexion, deshacer=True)
+            raise
+        else:
+            self.__devolver(conexion)
+        finally:
+            self.__huecos.release()
+
+    def __sacar(self):
+        while True:
+            try:
+                conexion, devuelta = self.__libres.get_nowait()
+            except queue.Empty:
+                return self.__abrir()
+            if time.monotonic() - devuelta < self.verificar_cada or self.__responde(conexion):
+                return conexion
+            self.__descartar(conexion)
+
+    def __abrir(self):
+        conexion = self.__crear()
+        with self.__lock:
+            self.__abiertas += 1
+        return conexion
+
+    def __responde(self, conexion):
+        try:
+            conexion.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def __devolver(self, conexion, deshacer=False):
+        if deshacer:
+            try:
+                conexion.rollback() # Que la siguiente no herede una transaccion a medias
+            except Exception:
+                self.__descartar(conexion)
+                return
+        if self.__cerrado:
+            self.__cerrar(conexion)
+            return
+        self.__libres.put((conexion, time.monotonic()))
+
+    def __descartar(self, conexion):
+        with self.__lock:
+            self.reconexiones += 1
+        self.__cerrar(conexion)
+
+    def __cerrar(self, conexion):
+        with self.__lock:
+            self.__abiertas -= 1
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def abiertas(self):
+        with self.__lock:
+            return self.__abiertas
+
+    def cerrar(self):
+        # Cierra las conexiones libres; las que estan en uso se cierran al devolverlas
+        self.__cerrado = True
+        while True:
+            try:
+                conexion, _ = self.__libres.get_nowait()
+            except queue.Empty:
+                return
+            self.__cerrar(conexion)
+
+    def __str__(self):
+        return f"Pool de conexiones ({self.abiertas()}/{self.tam} abiertas, timeout {self.timeout} s)"
@@ -0,0 +1,87 @@
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from mysql.connector import Error
+from .pool_conexiones import PoolAgotado
+
+# Coste de bcrypt (2^coste rondas) de los hashes nuevos; cada +1 duplica lo que tarda un login
+BCRYPT_COSTE = int(os.environ.get("BCRYPT_COSTE", 12))
+# Hilos que calculan bcrypt a la vez: bcrypt suelta el GIL, asi que con tantos hilos como nucleos van en paralelo
+BCRYPT_WORKERS = int(os.environ.get("BCRYPT_WORKERS", os.cpu_count() or 1))
+COSTE_HASH = re.compile(r"^\$2[abxy]?\$(\d{2})\$") # El coste va en el propio hash: $2b$12$...
+
+
+class ServicioAutenticacion():
+    # Logins y registros sobre DAO_Logins:
+    # - El login es una sola consulta (el hash del usuario); si no existe el usuario no hay segunda consulta
+    # - La consulta y bcrypt se hacen en un pool acotado de hilos (BCRYPT_WORKERS), no en el hilo que llama
+    # - Si un login correcto trae un hash con otro coste distinto del configurado se vuelve a calcular
+    #   con el coste actual y se guarda, en segundo plano (al subir BCRYPT_COSTE los usuarios se migran solos)
+    def __init__(self, dao, coste=BCRYPT_COSTE, workers=BCRYPT_WORKERS):
+        if not 4 <= coste <= 31:
+            raise ValueError("El coste de bcrypt debe estar entre 4 y 31")
+        self.__dao = dao
+        self.coste = coste
+        self.__pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bcrypt")
+        # Para que un usuario inexistente tarde lo mismo que una contraseña incorrecta (mismo coste)
+        self.__hash_falso = self.__hashear(b"usuario inexistente").encode()
+        self.__lock = threading.Lock()
+        self.rehashes = 0
+
+    def iniciar_sesion(self, login):
+        # True si el usuario existe y la contraseña es la suya
+        return self.iniciar_sesion_async(login).result()
+
+    def iniciar_sesion_async(self, login):
+        # Igual que iniciar_sesion pero devuelve un Future (para no bloquear al que llama ni con la consulta ni con bcrypt)
+        return self.__pool.submit(self.__iniciar_sesion, login.get_usuario(), login.get_contrasenya().encode())
+
+    def registrar(self, login):
+        password_hash = self.__pool.submit(self.__hashear, login.get_contrasenya().encode()).result()
+        self.__dao.insertar_usuario(login.get_usuario(), password_hash)
+
+    def cambiar_contrasenya(self, login):
+        password_hash = self.__pool.submit(self.__hashear, login.get_contrasenya().encode()).result()
+        self.__dao.guardar_hash(login.get_usuario(), password_hash)
+
+    def cerrar(self):
+        self.__pool.shutdown(wait=True)
+
+    def __hashear(self, contrasenya):
+        return bcrypt.hashpw(contrasenya, bcrypt.gensalt(self.coste)).decode()
+
+    def __iniciar_sesion(self, usuario, contrasenya):
+        try:
+            password_hash = self.__dao.obtener_hash(usuario)
+        except (Error, PoolAgotado) as err: # Como comprobar_login de DAO_Logins: sin base de datos no hay login
+            print(f"Error al comprobar login: {err}")
+            return False
+        if password_hash is None:
+            return self.__comprobar_falso(contrasenya)
+        return self.__comprobar(usuario, contrasenya, password_hash)
+
+    def __comprobar(self, usuario, contrasenya, password_hash):
+        if not bcrypt.checkpw(contrasenya, password_hash.encode()):
+            return False
+        coste = COSTE_HASH.match(password_hash)
+        if coste is None or int(coste.group(1)) != self.coste:
+            # Ya se sabe la contraseña en claro: es el unico momento en que se puede rehacer el hash
+            self.__pool.submit(self.__rehashear, usuario, contrasenya)
+        return True
+
+    def __rehashear(self, usuario, contrasenya):
+        try:
+            self.__dao.guardar_hash(usuario, self.__hashear(contrasenya))
+            with self.__lock:
+                self.rehashes += 1
+        except Exception as err: # El login ya fue correcto; se reintentara en el siguiente
+            print(f"Error al actualizar el hash de {usuario}: {err}")
+
+    def __comprobar_falso(self, contrasenya):
+        bcrypt.checkpw(contrasenya, self.__hash_falso)
+        return False
+
+    def __str__(self):
+        return f"Servicio de autenticacion (bcrypt coste {self.coste})"
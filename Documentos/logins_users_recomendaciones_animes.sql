@@ -41,6 +41,24 @@ LOCK TABLES `usuario_contrasenyas` WRITE;
 INSERT INTO `usuario_contrasenyas` VALUES (1,'admin','$2b$12$cfsazJ2NDcqyLYae0ZXsRe7hmPdwVOfbuoM4HICclJTIjLMdSJHC.');
 /*!40000 ALTER TABLE `usuario_contrasenyas` ENABLE KEYS */;
 UNLOCK TABLES;
+
+--
+-- Table structure for table `calificaciones_usuarios`
+--
+
+DROP TABLE IF EXISTS `calificaciones_usuarios`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `calificaciones_usuarios` (
+  `usuario` varchar(45) NOT NULL,
+  `anime_id` int NOT NULL,
+  `calificacion` tinyint NOT NULL,
+  `actualizado` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`usuario`,`anime_id`),
+  KEY `idx_anime_id` (`anime_id`),
+  CONSTRAINT `chk_calificacion` CHECK ((`calificacion` between 1 and 10))
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
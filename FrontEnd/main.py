@@ -1,14 +1,20 @@
 import requests as req
 import re
 import os
+import sys
 import time
-from DAO_Logins import DAO_Logins
-from Usuario_Contrasenya import Usuario_Contrasenya
+
+# DAO de logins, pool de conexiones y servicio de autenticacion: paquete Comun de la raiz (compartido con la API)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Comun.DAO_Logins import DAO_Logins
+from Comun.servicio_autenticacion import ServicioAutenticacion, BCRYPT_COSTE
+from Comun.Usuario_Contrasenya import Usuario_Contrasenya
 
 CANTIDAD_ERRORES = 2
 LARGO_OPCIONES_LOGIN = 2
 LARGO_OPCIONES_ANIME = 4
-BASE_URL = "http://localhost:5000"
+LARGO_OPCIONES_RECOMENDAR = 3
+BASE_URL = os.environ.get("API_URL", "http://localhost:5000") # Direccion de la API (la misma que API_HOST/API_PORT de servidor.py)
 
 goku = """⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠸⣶⣦⡄⡀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
 ⠀⠀⠀⠀⠀⢀⣀⣀⣀⡀⢀⠀⢹⣿⣿⣆⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀
@@ -28,6 +34,8 @@ goku = """⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠀⠸⣶⣦⡄⡀⠀⠀⠀⠀⠀⠀⠀
 ⣾⡇⠈⠛⠛⠿⣿⣿⣦⠁⠘⢷⣶⣶⡶⠟⢋⣠⣾⡿⠃⠀⠀⠀⠰⠛⠉⠉⠀⠀"""
 
 user_test_ratings = {}
+perfil_en_servidor = False # True si la API guarda el perfil (POST /perfiles/<usuario>); si no, se envia entero cada vez
+token_sesion = None # Token de POST /sesiones para los perfiles guardados en la API
 
 user_ratings_hardcore = {
     "136": 10,
@@ -46,6 +54,7 @@ contrasenya_BD = None
 
 usuario_AN = None
 contrasenya_AN = None
+usuario_sesion = None
 
 conexion_establecida = False
 login_hecho = False
@@ -122,6 +131,7 @@ def mostrar_menu_acciones_animes():
 def mostrar_menu_acciones_recomendar():
     menu = ("\033[33m1.- Introducir anime\n"
         "2.- Recomendar\n"
+        "3.- Buscar anime por nombre\n"
         "0.- Salir\033[0m\n"
     )
     return menu
@@ -169,6 +179,22 @@ def mostrar_lista_recomendaciones(data):
 
     return "\n".join(out)
 
+def esperar_entrenamiento(resp, espera=1):
+    # /entrenar devuelve enseguida un job_id, se consulta su estado hasta que termine
+    if resp.status_code != 202:
+        print("Error:", resp.text)
+        return False
+
+    job_id = resp.json()["job_id"]
+    while True:
+        estado = req.get(f"{BASE_URL}/entrenar/{job_id}").json()
+        if estado["estado"] == "terminado":
+            return True
+        if estado["estado"] == "error":
+            print("\033[31mError en el entrenamiento:", estado.get("error"), "\033[0m")
+            return False
+        time.sleep(espera)
+
 def validar_password(password):
     # Al menos 8 caracteres
     # Al menos una mayuscula
@@ -177,17 +203,27 @@ def validar_password(password):
     
     return re.match(regex, password) is not None
 
-def verificar_usuario_correcta(login):
-    if DAO_logins.comprobar_usuario(login):
-        return True
-    else:
+def verificar_login(login):
+    # Una sola consulta (el hash del usuario) y bcrypt en el pool del servicio
+    try:
+        return servicio_autenticacion.iniciar_sesion(login)
+    except Exception as err:
+        print(f"Error al comprobar login: {err}")
         return False
 
-def verificar_contrasenya_correcta(login):
-    if DAO_logins.comprobar_login(login):
-        return True
-    else:
-        return False
+def pedir_token(usuario, contrasenya):
+    # Token de sesion de la API para /perfiles y /recomendar/<usuario> (None si la API no tiene perfiles)
+    resp = req.post(f"{BASE_URL}/sesiones", json={"usuario": usuario, "contrasenya": contrasenya})
+    return resp.json()["token"] if resp.status_code == 200 else None
+
+def peticion_con_sesion(metodo, url, **kwargs):
+    # Peticion con el token de la sesion; si ha caducado (401) se pide otro y se repite una vez
+    global token_sesion
+    resp = req.request(metodo, url, headers={"Authorization": f"Bearer {token_sesion}"}, **kwargs)
+    if resp.status_code == 401:
+        token_sesion = pedir_token(usuario_sesion, contrasenya_sesion)
+        resp = req.request(metodo, url, headers={"Authorization": f"Bearer {token_sesion}"}, **kwargs)
+    return resp
 
 ###     Sección base de datos
 print("\033[36mBienvenid@ al recomendador de animes 2000\n")
@@ -197,8 +233,9 @@ print("Por favor inicia sesion en la base de datos")
 usuario_BD = pedir_texto("Introduce el usuario por favor: ")
 contrasenya_BD = pedir_contrasenya("Introduce la contraseña por favor: ")
 
-DAO_logins = DAO_Logins(usuario_BD, contrasenya_BD)
+DAO_logins = DAO_Logins(usuario_BD, contrasenya_BD, coste_bcrypt=BCRYPT_COSTE)
 DAO_logins.conectar()
+servicio_autenticacion = ServicioAutenticacion(DAO_logins)
 
 if DAO_logins.get_conexion() == True: 
     usuarios = DAO_logins.ver()
@@ -228,14 +265,13 @@ while accion_usuario != 0 and DAO_logins!= None and DAO_logins.get_conexion() ==
         
         usuario_API= Usuario_Contrasenya(usuario_AN,contrasenya_AN)
 
-        verif_u = verificar_usuario_correcta(usuario_API)
-        verif_c = verificar_contrasenya_correcta(usuario_API)
-
-        if verif_c == True and verif_u == True:
+        if verificar_login(usuario_API) == True:
             print ("\n\033[36mBienvenid@ al recomendador de animes 2000\033[0m")
             accion_usuario = 0
             accion_usuario_anime = 1
             login_hecho = True
+            usuario_sesion = usuario_AN
+            contrasenya_sesion = contrasenya_AN
             
         else:
             print ("\n\033[31mHubo algun problema con los datos o no estas registrad@.\033[0m\n")
@@ -276,7 +312,7 @@ while accion_usuario != 0 and DAO_logins!= None and DAO_logins.get_conexion() ==
             continue
 
         nuevo_usuario = Usuario_Contrasenya(accion_nombre_registro, accion_contrasenya_registro)
-        DAO_logins.anyadir(nuevo_usuario)
+        servicio_autenticacion.registrar(nuevo_usuario)
         
         print(f"\n\033[32mNuevo usuario creado\033[0m")
 
@@ -284,12 +320,24 @@ while accion_usuario != 0 and DAO_logins!= None and DAO_logins.get_conexion() ==
         accion_usuario = 0
         accion_usuario_anime = 1
         login_hecho = True
+        usuario_sesion = accion_nombre_registro
+        contrasenya_sesion = accion_contrasenya_registro
 
 if DAO_logins.get_conexion() == True and login_hecho == True:
     # Entrenar (solo la primera vez)
     resp = req.post(f"{BASE_URL}/entrenar")
     print(f"\n\033[32mCargando algoritmo...\033[0m")
     print(goku)
+    esperar_entrenamiento(resp)
+
+    # Calificaciones de otras sesiones (si la API tiene configurados los perfiles)
+    token_sesion = pedir_token(usuario_sesion, contrasenya_sesion)
+    resp = peticion_con_sesion("GET", f"{BASE_URL}/perfiles/{usuario_sesion}") if token_sesion else None
+    if resp is not None and resp.status_code == 200:
+        perfil_en_servidor = True
+        user_test_ratings = resp.json()["calificaciones"]
+        if user_test_ratings:
+            print(f"\n\033[32mTienes {len(user_test_ratings)} calificaciones guardadas\033[0m")
 
 ###     Seccion Recomendaciones
 while accion_usuario_anime != 0 and DAO_logins!= None and DAO_logins.get_conexion() == True:
@@ -324,27 +372,44 @@ while accion_usuario_anime != 0 and DAO_logins!= None and DAO_logins.get_conexio
                 print("\033[31mOpción inválida, escribe un número.\033[0m")
                 continue
 
-            if accion_usuario_recomendacion > LARGO_OPCIONES_LOGIN or accion_usuario_recomendacion < 0:
+            if accion_usuario_recomendacion > LARGO_OPCIONES_RECOMENDAR or accion_usuario_recomendacion < 0:
                 print("\033[31mOpción inválida, seleccione un número del menu.\033[0m")
                 continue
 
-            if accion_usuario_recomendacion == 1: 
-                print("\n\033[95m╔═══════════════════════════════════════╗")
-                print("║       Recomendaciones Aleatorias      ║")
-                print("╚═══════════════════════════════════════╝\033[0m")
-                resp = req.get(f"{BASE_URL}/animes")
-                animes = resp.json()["animes"]
+            if accion_usuario_recomendacion in (1, 3):
+                if accion_usuario_recomendacion == 1:
+                    print("\n\033[95m╔═══════════════════════════════════════╗")
+                    print("║       Recomendaciones Aleatorias      ║")
+                    print("╚═══════════════════════════════════════╝\033[0m")
+                    resp = req.get(f"{BASE_URL}/animes")
+                    animes = resp.json()["animes"]
+                else:
+                    # Busqueda por nombre (vale con el principio del nombre o de una palabra, y con erratas)
+                    busqueda = pedir_texto("\nEscribe el nombre del anime: ")
+                    resp = req.get(f"{BASE_URL}/animes/buscar", params={"q": busqueda})
+                    animes = resp.json().get("resultados", []) if resp.status_code == 200 else []
+                    if not animes:
+                        print("\033[31mNo se encontro ningun anime con ese nombre\033[0m")
+                        continue
                 print(mostrar_lista_animes(animes))
 
                 anime_entrante = pedir_anime("\nIntroduce el número/ID del anime: ")
                 calificacion_entrante = pedir_calificacion("Introduce la calificación por favor (del 1 al 10): ")
 
                 user_test_ratings[anime_entrante] = calificacion_entrante
+                if perfil_en_servidor:
+                    # Solo se envia la calificacion nueva, el resto ya esta guardado
+                    resp = peticion_con_sesion("POST", f"{BASE_URL}/perfiles/{usuario_sesion}", json={anime_entrante: calificacion_entrante})
+                    if resp.status_code != 200:
+                        print("Error:", resp.text)
 
                 print(f"\n\033[32mCalificación de Anime agregada\033[0m")
 
             if accion_usuario_recomendacion == 2 and len(user_test_ratings) > 0:
-                resp_recom = req.post(f"{BASE_URL}/recomendar", json=user_test_ratings)
+                if perfil_en_servidor:
+                    resp_recom = peticion_con_sesion("GET", f"{BASE_URL}/recomendar/{usuario_sesion}")
+                else:
+                    resp_recom = req.post(f"{BASE_URL}/recomendar", json=user_test_ratings)
 
                 if resp_recom.status_code == 200:
                     print("\n\033[95m╔═════════════════════════════════════════════╗")
@@ -361,7 +426,8 @@ while accion_usuario_anime != 0 and DAO_logins!= None and DAO_logins.get_conexio
     # Entrenar otra vez
     if accion_usuario_anime == 2:
         resp = req.post(f"{BASE_URL}/entrenar?force=true")
-        print(f"\n\033[32mEntrenamiento completado, modelo actualizado\033[0m")
+        if esperar_entrenamiento(resp):
+            print(f"\n\033[32mEntrenamiento completado, modelo actualizado\033[0m")
 
     # Version
     if accion_usuario_anime == 3:
@@ -381,5 +447,6 @@ while accion_usuario_anime != 0 and DAO_logins!= None and DAO_logins.get_conexio
             print("Error:", resp.text)
 
 print("\n\033[36m Hazta luego...\n\033[0m")
+servicio_autenticacion.cerrar()
 DAO_logins.close()
 clear(2)
\ No newline at end of file